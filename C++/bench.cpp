@@ -0,0 +1,121 @@
+// Program to time the operations of the Matrix class, as a reference for the
+// benchmarks of the Python version (see python/bench.py)
+// Prints one line of JSON for each operation and size, giving the time each
+// call takes in seconds
+// Usage: ./bench [size] [size] ...
+
+#include <chrono>
+#include <cstdlib>
+#include <iostream>
+#include "matrix.h"
+
+using namespace std;
+
+// Stop repeating an operation after this many seconds, or this many calls,
+// whichever comes first (results are never freed, so calls are limited)
+const double TIME_BUDGET = 0.05;
+const int MOST_CALLS = 200;
+
+volatile float sink;    // keeps results in use, so they are not optimized out
+
+/*
+    Times an operation by calling it repeatedly, taking the best of three
+    rounds to leave out noise from the rest of the system.
+
+    Arguments:
+        operation (Function):
+            the operation to time, taking no arguments
+        per_call (int):
+            the number of operations done in each call, to divide by
+
+    Returns:
+        seconds (double):
+            the time of a single operation, in seconds
+*/
+template <typename Function>
+double best_time(Function operation, int per_call) {
+    double best = -1;
+    for (int round = 0; round < 3; round++) {
+        int calls = 0;
+        double elapsed = 0;
+        auto start = chrono::steady_clock::now();
+        while (calls < MOST_CALLS && elapsed < TIME_BUDGET) {
+            operation();
+            calls++;
+            elapsed = chrono::duration<double>(
+                chrono::steady_clock::now() - start).count();
+        }
+        double seconds = elapsed / calls / per_call;
+        if (best < 0 || seconds < best) {
+            best = seconds;    // keep the fastest round
+        }
+    }
+    return best;
+}
+
+/*
+    Prints the result of one benchmark as a line of JSON.
+
+    Arguments:
+        name (const char*):
+            the name of the operation, as used by python/bench.py
+        size (int):
+            the number of rows and columns of the matrices
+        seconds (double):
+            the time of a single operation, in seconds
+
+    Returns:
+        None, but prints the result
+*/
+void report(const char* name, int size, double seconds) {
+    cout << "{\"name\": \"" << name << "\", \"size\": " << size
+         << ", \"dtype\": \"float32\", \"seconds\": " << seconds << "}"
+         << endl;
+}
+
+int main(int argc, char* argv[]) {
+    for (int k = 1; k < argc; k++) {
+        int n = atoi(argv[k]);
+        // fill the matrices with the same pattern of values as bench.py
+        float* values = new float[n * n];
+        for (int i = 0; i < n * n; i++) {
+            values[i] = (float) ((i * 7) % 11);
+        }
+        Matrix A = Matrix(n, n, values);
+        Matrix B = Matrix(n, n, values);
+
+        report("construct", n, best_time([&]() {
+            Matrix C = Matrix(n, n, values);
+            sink = C[0][0];
+        }, 1));
+        // element access is timed over every element, since one is too fast
+        report("get_value", n, best_time([&]() {
+            float total = 0;
+            for (int i = 0; i < n; i++) {
+                for (int j = 0; j < n; j++) {
+                    total += A[i][j];
+                }
+            }
+            sink = total;
+        }, n * n));
+        report("set_value", n, best_time([&]() {
+            for (int i = 0; i < n; i++) {
+                for (int j = 0; j < n; j++) {
+                    A[i][j] = (float) j;
+                }
+            }
+            sink = A[0][0];
+        }, n * n));
+        report("matrix_add", n, best_time([&]() {
+            sink = (A + B)[0][0];
+        }, 1));
+        report("matrix_multiply", n, best_time([&]() {
+            sink = (A * B)[0][0];
+        }, 1));
+        report("transpose", n, best_time([&]() {
+            sink = A.transpose()[0][0];
+        }, 1));
+        delete[] values;
+    }
+    return 0;
+}
@@ -0,0 +1,238 @@
+# This is a script to benchmark the operations of the Matrix() object defined
+# in matrix.py over a range of sizes and element types, alongside the same
+# workloads run through the C++ Matrix class (C++/bench.cpp) for reference.
+# Results are written as JSON, and compared against a saved baseline, with
+# any operation slower than the baseline by more than the threshold reported
+# as a regression (and a nonzero exit status)
+# Usage: python3 bench.py [--sizes 16 64 128] [--output results.json]
+#                         [--baseline baseline.json] [--threshold 0.25]
+#                         [--quick] [--no-cpp] [--no-numpy]
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import matrix
+from matrix import Matrix, numpy
+
+SIZES = (16, 64, 128)
+QUICK_SIZES = (8, 32)
+THRESHOLD = 0.25
+TIME_BUDGET = 0.02    # Seconds to spend on each round of calls
+ROUNDS = 5
+
+# Element types: how the values are made, and the arguments giving the
+# storage of the matrices
+DTYPES = {
+    "int": (int, {}),
+    "float": (float, {}),
+    "int64": (int, {"compact": True}),
+    "float64": (float, {"compact": True}),
+    "float32": (float, {"dtype": "float32"}),
+}
+
+CPP_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "C++")
+
+
+def best_time(function):
+    # Best of several rounds of as many calls as fit in the time budget, to
+    # leave out noise from the rest of the system, as seconds per call (with
+    # garbage collection off while timing, as timeit does)
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        calls = 1
+        while True:
+            start = time.perf_counter()
+            for i in range(calls):
+                function()
+            elapsed = time.perf_counter() - start
+            if elapsed >= TIME_BUDGET:
+                break
+            calls *= 2
+        best = elapsed/calls
+        for i in range(ROUNDS - 1):
+            start = time.perf_counter()
+            for i in range(calls):
+                function()
+            best = min(best, (time.perf_counter() - start)/calls)
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+def make_rows(n, kind):
+    # The same pattern of small values as C++/bench.cpp, so that nothing
+    # overflows or grows out of range while being timed
+    return [[kind((i*n + j)*7 % 11) for j in range(n)] for i in range(n)]
+
+
+def workloads(n, kind, storage):
+    # The operations to time, each as a function taking no arguments; the
+    # mutators leave the matrix as they found it (or close to it)
+    rows = make_rows(n, kind)
+    A = Matrix(rows, **storage)
+    B = Matrix(rows, **storage)
+    row, column = rows[0], [i[0] for i in rows]
+
+    def row_edit():
+        A.add_row(row)
+        A.delete_row(n+1)
+
+    def column_edit():
+        A.add_column(column)
+        A.delete_column(n+1)
+
+    def transpose():
+        A.clear_cache()    # Time the work, rather than the cache
+        A.transpose()
+
+    def determinant():
+        A.clear_cache()
+        A.determinant()
+
+    def lu():
+        A.clear_cache()
+        A.lu()
+
+    # Pattern with a nonsingular matrix of the same size, to solve with
+    F = Matrix([[kind(7*(i == j) + (i*n + j) % 3) for j in range(n)]
+                for i in range(n)], **storage)
+    F.lu()
+    b = [kind(1)]*n
+
+    return [
+        ("construct", lambda: Matrix(rows, **storage)),
+        ("get_value", lambda: A.get_value(n, n)),
+        ("set_value", lambda: A.set_value(n, n, kind(1))),
+        ("row_edit", row_edit),
+        ("column_edit", column_edit),
+        ("scalar_add", lambda: A.scalar_add(kind(0))),
+        ("scalar_multiply", lambda: A.scalar_multiply(kind(1))),
+        ("matrix_add", lambda: A.matrix_add(B)),
+        ("matrix_multiply", lambda: A.matrix_multiply(B)),
+        ("transpose", transpose),
+        ("determinant", determinant),
+        ("lu", lu),
+        ("solve", lambda: F.solve(b)),
+    ]
+
+
+def run_python(sizes):
+    results = []
+    for n in sizes:
+        for dtype, (kind, storage) in DTYPES.items():
+            for name, function in workloads(n, kind, storage):
+                results.append({"implementation": "python", "name": name,
+                                "size": n, "dtype": dtype,
+                                "seconds": best_time(function)})
+                print("python  {:16s}{:6d}  {:8s}{:12.3e}".format(
+                    name, n, dtype, results[-1]["seconds"]))
+    return results
+
+
+def run_cpp(sizes):
+    # Build and run the C++ benchmark, giving no results if it cannot be
+    # built (such as when there is no compiler)
+    try:
+        subprocess.run(["make", "-C", CPP_DIRECTORY, "bench"], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        output = subprocess.run(
+            [os.path.join(CPP_DIRECTORY, "bench")] + [str(n) for n in sizes],
+            check=True, stdout=subprocess.PIPE, text=True).stdout
+    except (OSError, subprocess.CalledProcessError) as error:
+        print("C++ reference skipped: {}".format(error))
+        return []
+    results = []
+    for line in output.splitlines():
+        result = json.loads(line)
+        result["implementation"] = "cpp"
+        results.append(result)
+        print("cpp     {:16s}{:6d}  {:8s}{:12.3e}".format(
+            result["name"], result["size"], result["dtype"],
+            result["seconds"]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Compare each result with the same benchmark in the baseline, giving
+    # the benchmarks slower than the baseline by more than the threshold
+    def key(result):
+        return (result["implementation"], result["name"], result["size"],
+                result["dtype"])
+    previous = {key(i): i["seconds"] for i in baseline["results"]}
+    regressions = []
+    print("\n{:8s}{:16s}{:>6s}  {:8s}{:>12s}{:>12s}{:>8s}".format(
+        "", "operation", "size", "dtype", "baseline", "current", "ratio"))
+    for result in results:
+        if key(result) not in previous:
+            continue
+        ratio = result["seconds"]/previous[key(result)]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(result)
+            flag = "  REGRESSION"
+        print("{:8s}{:16s}{:6d}  {:8s}{:12.3e}{:12.3e}{:8.2f}{}".format(
+            *key(result), previous[key(result)], result["seconds"], ratio,
+            flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Matrix.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--quick", action="store_true",
+                        help="use small sizes, for a fast check")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", help="results to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="slowdown counted as a regression (0.25 = 25%%)")
+    parser.add_argument("--no-cpp", action="store_true",
+                        help="skip the C++ reference")
+    parser.add_argument("--no-numpy", action="store_true",
+                        help="time the pure Python kernels only")
+    options = parser.parse_args()
+    sizes = QUICK_SIZES if options.quick else options.sizes
+    if options.no_numpy:
+        matrix.USE_NUMPY = False
+
+    results = run_python(sizes)
+    if not options.no_cpp:
+        results += run_cpp(sizes)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": numpy.__version__ if numpy is not None else None,
+            "use_numpy": matrix.USE_NUMPY,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(report, file, indent=1)
+
+    if options.baseline:
+        if not os.path.exists(options.baseline):
+            print("\nNo baseline at {}; save one with make bench-baseline"
+                  .format(options.baseline))
+            return 0
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, options.threshold)
+        if regressions:
+            print("\n{} regression(s) over {:.0%}".format(
+                len(regressions), options.threshold))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
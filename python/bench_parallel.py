@@ -0,0 +1,46 @@
+# This is a script to benchmark how matrix_multiply() of the Matrix() object
+# defined in matrix.py scales with the number of worker processes, printing
+# the time and speedup over serial work for each number of workers
+# Usage: python3 bench_parallel.py [size] [most workers]
+
+import os
+import random
+import sys
+import time
+import matrix
+from matrix import Matrix
+
+
+def best_time(function, repeats=3):
+    # Best of a few runs, to leave out noise from the rest of the system
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    mostWorkers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    matrix.USE_NUMPY = False    # Time the pure Python kernels
+    rng = random.Random(0)
+    A = Matrix([[rng.random() for j in range(size)] for i in range(size)])
+    B = Matrix([[rng.random() for j in range(size)] for i in range(size)])
+
+    serial = best_time(lambda: A.matrix_multiply(B))
+    print("{} x {} product, {} cores".format(size, size, os.cpu_count()))
+    print("workers    time (s)    speedup")
+    print("{:7d}    {:8.3f}    {:7.2f}".format(1, serial, 1))
+    workers = 2
+    while workers <= mostWorkers:
+        elapsed = best_time(lambda: A.matrix_multiply(B, workers=workers))
+        print("{:7d}    {:8.3f}    {:7.2f}".format(
+            workers, elapsed, serial/elapsed))
+        workers *= 2
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,184 @@
 # Made by Isaac Joffe
-from copy import deepcopy
+import csv
+import inspect
+import math
+import mmap
+import numbers
+import pickle
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from fractions import Fraction
+from functools import wraps
+from itertools import chain, islice, repeat
+from multiprocessing import shared_memory
+from operator import add, contains, eq, ge, gt, le, lt, mul, ne, sub, \
+    truediv
+try:
+    import numpy
+except ImportError:    # NumPy is optional, everything also runs without it
+    numpy = None
+
+
+# Bounds of the signed 64-bit integers that compact storage can hold
+INT64_MIN = -2**63
+INT64_MAX = 2**63 - 1
+
+# Tuning for matrix_multiply: the side length of the square tiles of the
+# result computed together, and the size above which (in every dimension)
+# the product is split up by Strassen-Winograd recursion
+MULTIPLY_BLOCK_SIZE = 64
+STRASSEN_THRESHOLD = 256
+
+# Number of multiplications (m*n*p) below which matrix_multiply(workers=N)
+# works serially, since starting worker processes takes longer than that
+PARALLEL_THRESHOLD = 2**22
+
+# How much checking mutators do, for matrices without a policy of their own:
+# "strict" re-checks the whole matrix after every change, "incremental" only
+# checks the elements being written, and "trusted" skips element checks
+VALIDATION_POLICIES = ("strict", "incremental", "trusted")
+VALIDATION_POLICY = "strict"
+
+# Element types a matrix can be fixed to when it is made, with the typecode
+# of the array storing them (None for a list of Python numbers, which for
+# "object" may be any real numbers, such as exact Fractions, Decimals or
+# integers too large for 64 bits). A fixed dtype never changes: values that
+# do not fit
+# in it are refused, rather than the storage being widened. Matrices made
+# without a dtype keep the flexible storage described in Matrix. Results of
+# operations on two matrices with dtypes have the promoted dtype: the same
+# dtype for both, "object" if either is, and "float64" for any other mix
+# (and for "int64" results that are not integers)
+DTYPES = {"int64": "q", "float64": "d", "float32": "f", "object": None}
+
+# Types of the elements of matrices of the "object" dtype
+_OBJECT_TYPES = (numbers.Real, Decimal)
+
+# Relations Matrix.compare() can test elements for, with their functions
+RELATIONS = {"<": lt, "<=": le, ">": gt, ">=": ge, "==": eq, "!=": ne}
+
+# Whether to hand arithmetic over to NumPy (and so BLAS/LAPACK) when it is
+# installed, and the number of elements below which it is not worth doing.
+# NumPy is used for compact matrices, and for matrices holding only floating
+# point numbers in matrix_multiply and determinant. Integer results are
+# identical to those of the pure Python kernels (NumPy is only used when no
+# 64-bit overflow is possible); floating point results may differ in the
+# order of rounding, by a relative error of at most about k*2**-52 for sums
+# of k terms (k = n for products, and up to n**3 for determinants)
+USE_NUMPY = True
+NUMPY_THRESHOLD = 4096
+
+# Start of the binary format of Matrix.to_bytes() and Matrix.save_mmap(),
+# the version of the format written, and the size of its header
+BINARY_MAGIC = b"PYMATRIX"
+BINARY_VERSION = 1
+BINARY_HEADER_SIZE = 32
+
+# Number of rows handled at a time by the streaming methods iter_rows(),
+# load_csv() and save_csv()
+CHUNK_SIZE = 1024
+
+# Default memory budget, in bytes, for the tiles of the out-of-core
+# operations Matrix.tiled_multiply() and Matrix.tiled_transpose()
+OUT_OF_CORE_MEMORY = 2**26
+
+# Density (fraction of nonzero elements) above which the results of
+# operations on sparse matrices are given as dense matrices instead
+SPARSE_THRESHOLD = 0.25
+
+# Methods timed and counted while profiling (see profile()), by class. They
+# are only wrapped while a profile or profile hook is active, so profiling
+# costs nothing otherwise
+PROFILED_METHODS = {
+    "Matrix": (
+        "__init__", "__getitem__", "__setitem__", "copy", "zeros", "full",
+        "identity", "from_flat", "from_columns", "from_rows", "from_buffer",
+        "from_numpy", "open_mmap", "save_mmap", "load_csv", "save_csv",
+        "to_bytes", "from_bytes", "get_value", "get_row", "get_column",
+        "set_value", "check_validity", "add_row", "add_rows", "delete_row",
+        "delete_rows", "insert_rows", "add_column", "add_columns",
+        "insert_columns", "delete_column", "delete_columns", "select",
+        "scalar_add", "scalar_multiply", "matrix_add", "add_scaled",
+        "subtract", "multiply", "divide", "power", "compare", "apply",
+        "linear_combination", "matrix_multiply", "chain_multiply",
+        "transpose", "tiled_multiply", "tiled_transpose", "determinant",
+        "lu", "solve", "inverse", "sum", "mean", "min", "max", "argmax",
+        "trace", "norm", "stats", "__iadd__", "__isub__", "__imatmul__",
+    ),
+    "MatrixExpression": ("evaluate",),
+    "LUFactorization": ("solve", "solve_many", "inverse"),
+    "MatrixBatch": ("__init__", "from_flat", "matrix_add", "matrix_multiply",
+                    "transpose", "determinant"),
+}
+
+# State of profiling: the active profiles and hooks, the original methods
+# replaced while they are active, and running totals of the matrices made,
+# their bytes, the floating point operations done and the depth of calls,
+# with a lock held while profiles and hooks start and stop
+_PROFILING = False
+_PROFILES = []
+_PROFILE_HOOKS = []
+_PROFILE_ORIGINALS = {}
+_PROFILE_COUNTS = {"matrices": 0, "bytes": 0, "flops": 0, "depth": 0}
+_PROFILE_LOCK = threading.Lock()
 
 
 class Matrix:
     """
     A class to represent a matrix, a two-dimensional array of numbers.
 
+    The elements are kept in a single flat buffer in row-major order, along
+    with the offset and strides needed to find each element in it. By default
+    the buffer is a list, which can hold any mix of integers and floating
+    point numbers. In compact mode, the buffer is instead an array of
+    machine integers ('q') or doubles ('d'), which stores each element in 8
+    bytes rather than as a separate Python object, and widens (from integers
+    to doubles, or to a list) when a value does not fit. A matrix can
+    instead be given a fixed dtype (see DTYPES), such as "float32" for 4
+    byte floating point numbers, which its storage keeps for good.
+
+    Indexing with zero-based integers and slices, as in A[1:3, ::2], gives
+    views: matrices sharing the storage of the matrix they come from, with
+    their own offset and strides, so that changes to one show in the other.
+    copy() gives a view storage of its own.
+
+    The elementwise operations (subtract(), multiply(), divide(), power(),
+    compare() and apply()) broadcast their operands as NumPy does: numbers,
+    and matrices with a single row or column, are repeated to the size of
+    the result, so that a 1 x n row can be taken from every row of an m x n
+    matrix in one pass, without building the repeated matrix. Any real
+    number can be an operand: exact ones, such as Fractions, give results
+    of the "object" dtype (see DTYPES). Sparse matrices are not broadcast,
+    and are refused as operands.
+
+    The operators @, +, -, * (by a number) and .T give MatrixExpression
+    objects, which evaluate whole formulas at once with fewer intermediate
+    matrices than the equivalent chain of method calls. The operators +=,
+    -= and @= instead update the matrix in place, as do the methods given
+    an existing matrix to write their result into (out), so that loops can
+    run without making new matrices.
+
+    When NumPy is installed, large operations are handed over to it (see
+    USE_NUMPY), and matrices convert to and from NumPy arrays through
+    numpy.asarray() and Matrix.from_numpy(), sharing memory when compact.
+
     Attributes
     ----------
-        values : list of lists of integer/floating point numbers
-            all the elements of the matrix, where each list inside the list
-            contains all the elements of a row of the matrix
+        values : view of the rows of the matrix
+            all the elements of the matrix, indexed as values[i][j] like a
+            list of lists; reads and writes go straight to the storage
         m : integer
             numbers of rows in the matrix (for an m x n matrix)
         n : integer
             number of columns in the matrix (for an m x n matrix)
+        T : lazy expression
+            the transpose of the matrix, as a MatrixExpression
 
     Methods
     -------
@@ -22,11 +186,34 @@ class Matrix:
             gives the size of the matrix (for an m x n matrix)
         get_value() :
             gives the value of a specified element of the matrix
+        get_row(row) :
+            gives the elements of a specified row of the matrix
+        get_column(column) :
+            gives the elements of a specified column of the matrix
+        iter_rows(chunkSize) :
+            iterates over the rows of the matrix, a chunk at a time
         set_value() :
             changes the value of a specified element of the matrix
+        copy() :
+            copies the matrix (or a view) into storage of its own
+        is_compact() :
+            determines if the matrix is stored as a compact array
+        get_dtype() :
+            gives the fixed element type of the matrix, if any
+        astype(dtype) :
+            converts the matrix to a fixed element type
+        get_validation_policy() :
+            gives how much checking the mutators of the matrix do
+        set_validation_policy(policy) :
+            changes how much checking the mutators of the matrix do
         check_validity() :
             determines if the matrix's elements are numbers and if each row
             has the same number of elements (number of columns is constant)
+        cache_info() :
+            gives the version of the matrix and the state of its cache of
+            derived results
+        clear_cache() :
+            empties the cache of derived results of the matrix
         add_row(row) :
             adds a row of numbers to the matrix
         add_rows(rows) :
@@ -39,27 +226,131 @@ class Matrix:
             adds a list of columns to the matrix
         delete_column(column) :
             deletes a specified column of the matrix
+        delete_rows(rows) :
+            deletes several rows of the matrix at once
+        delete_columns(columns) :
+            deletes several columns of the matrix at once
+        insert_rows(at, rows) :
+            inserts a list of rows into the matrix at a given position
+        insert_columns(at, columns) :
+            inserts a list of columns into the matrix at a given position
+        select(rows, columns) :
+            gathers given rows and columns into a new matrix, in any order
         scalar_add(number) :
             adds a specified number to every element of the matrix
         scalar_multiply(number) :
             multiplies each element of the matrix by a specified number
-        matrix_add(otherMatrix) :
-            adds two matrices together, producing a new matrix
-        matrix_multiply(otherMatrix) :
-            multiplies two matrices together, producing a new matrix
+        matrix_add(otherMatrix, out) :
+            adds two matrices together, producing a new matrix (or writing
+            into out)
+        add_scaled(otherMatrix, alpha) :
+            adds a multiple of another matrix to the matrix, in place
+        subtract(other) :
+            subtracts a matrix or number elementwise, producing a new matrix
+        multiply(other) :
+            multiplies by a matrix or number elementwise (the Hadamard
+            product), producing a new matrix
+        divide(other) :
+            divides by a matrix or number elementwise, producing a new matrix
+        power(other) :
+            raises to the powers in a matrix, or to a number, elementwise
+        compare(other, relation) :
+            compares with a matrix or number elementwise, giving 1 where the
+            relation holds and 0 elsewhere
+        apply(function, *others) :
+            applies a function elementwise to the matrix and other operands,
+            in one pass
+        matrix_multiply(otherMatrix, out) :
+            multiplies two matrices together, producing a new matrix (or
+            writing into out)
+        linear_combination(coefficients, matrices) :
+            adds up multiples of matrices in one pass, producing a new matrix
+        chain_multiply(*matrices) :
+            multiplies a sequence of matrices in the cheapest order
+        chain_order(*matrices) :
+            gives the cheapest order to multiply a sequence of matrices in
         transpose() :
             transposes the matrix, producing a new matrix
+        tiled_multiply(otherMatrix, path, memory) :
+            multiplies two matrices out of core, into a new file
+        tiled_transpose(path, memory) :
+            transposes the matrix out of core, into a new file
         determinant() :
             gives the value of the determinant of the matrix
+        lu() :
+            factorizes the matrix, for solving systems of linear equations
+        solve(b) :
+            solves the system of linear equations A x = b
+        inverse() :
+            gives the inverse of the matrix
+        sum(axis, compensated) :
+            adds up the elements of the matrix, or of each column or row
+        mean(axis, compensated) :
+            gives the mean of the elements, or of each column or row
+        min(axis), max(axis) :
+            gives the smallest or largest element, or that of each column or
+            row
+        argmax(axis) :
+            gives the position of the largest element, or that in each
+            column or row
+        trace() :
+            gives the sum of the diagonal of the matrix
+        norm(ord) :
+            gives the Frobenius, 1 or infinity norm of the matrix
+        stats(compensated) :
+            gives the count, sum, mean, smallest and largest element and
+            Frobenius norm of the matrix, in one pass
+        zeros(m, n) :
+            creates an m x n matrix of zeros
+        full(m, n, value) :
+            creates an m x n matrix with every element set to a value
+        identity(n) :
+            creates the n x n identity matrix
+        from_flat(values, m, n) :
+            creates an m x n matrix from its elements in row-major order
+        from_columns(columns) :
+            creates a matrix from a list of its columns
+        from_rows(rows) :
+            creates a matrix from any iterable of its rows
+        from_buffer(buffer, m, n) :
+            creates a compact m x n matrix sharing memory with a buffer
+        from_numpy(arr, copy) :
+            creates a matrix from a two-dimensional NumPy array
+        open_mmap(path, mode) :
+            opens a matrix stored in a file, mapped into memory
+        save_mmap(path) :
+            writes the matrix to a file that open_mmap() can open
+        to_bytes() :
+            gives the matrix in a compact binary form
+        from_bytes(data) :
+            creates a matrix from the binary form given by to_bytes()
+        flush() :
+            writes any changes to a memory-mapped matrix to its file
+        load_csv(path) :
+            creates a matrix from a CSV file, reading it a chunk at a time
+        save_csv(path) :
+            writes the matrix to a CSV file, a chunk at a time
 
     Example Usage
     -------------
         A = Matrix([[1,2,3],[4,5,6],[7,8,9]])    # 3 x 3 matrix
         B = Matrix([[1,2,3]])    # Row vector
         C = Matrix([[1],[2],[3]])    # Column vector
+        D = Matrix([[1.5,2],[3,4]], compact=True)    # Array-backed matrix
+        E = Matrix([[1,2],[3,4]], validation="trusted")    # Unchecked edits
+        K = Matrix([[1,2],[3,4]], dtype="float32")    # 4 byte floats
+        F = Matrix.zeros(3, 4)    # 3 x 4 matrix of zeros
+        G = Matrix.identity(3)    # 3 x 3 identity matrix
+        H = Matrix.from_flat([1,2,3,4,5,6], 2, 3)    # 2 x 3 matrix
+        I = (2 * (A @ A) - A.T).evaluate()    # Operators build expressions
+        J = A[1:, ::2]    # View of rows 2 and 3, columns 1 and 3 of A
     """
 
-    def __init__(self, values):
+    __slots__ = ("__data", "__m", "__n", "__offset", "__rowStride",
+                 "__columnStride", "__validation", "__view", "__version",
+                 "__cache", "__hits", "__misses", "__dtype")
+
+    def __init__(self, values, compact=False, validation=None, dtype=None):
         """
         Instantiates the matrix, assigning all the attributes of the matrix
         either as an empty matrix or based on the inputted values.
@@ -68,28 +359,52 @@ class Matrix:
         ----------
         values : list of lists of integer/floating point numbers
             elements to be placed in the matrix in the form of row vectors
+        compact : boolean
+            whether to store the elements in a compact array, as 64-bit
+            integers if they all are integers and as doubles otherwise
+        validation : string/None
+            validation policy of the matrix, one of VALIDATION_POLICIES, or
+            None to follow the module-wide VALIDATION_POLICY
+        dtype : string/None
+            fixed type of the elements, one of DTYPES (which decides the
+            storage, whatever compact is), or None for flexible storage
 
         Returns
         -------
             None, but creates the matrix
         """
 
-        # Ensure argument passed in is valid
+        # Ensure arguments passed in are valid (add_rows checks the rows)
         assert values and isinstance(values, list), \
             "Argument must be a list of lists of numbers."
-        for i in values:
-            assert i and isinstance(i, list), \
-                "Argument must be a list of lists of numbers."
-            for j in i:
-                assert isinstance(j, int) or isinstance(j, float), \
-                    "Argument must be a list of lists of numbers."
+        assert validation is None or validation in VALIDATION_POLICIES, \
+            "Validation policy must be one of {}.".format(VALIDATION_POLICIES)
+        _check_dtype(dtype)
 
         # Instantiate an empty matrix
-        self.values = []
+        if dtype is not None:
+            self.__data = _dtype_storage([], dtype)
+        elif compact:
+            self.__data = array(_compact_typecode(values))
+        else:
+            self.__data = []
         self.__m = 0
         self.__n = 0
-        self.add_rows(values)    # Add rows
-        self.check_validity()    # Ensure matrix is valid
+        self.__offset = 0
+        self.__rowStride = 0
+        self.__columnStride = 1
+        self.__validation = validation
+        self.__view = False
+        # Version of the storage, shared with views of it, and whether the
+        # storage has been handed to NumPy (see __cached())
+        self.__version = [0, False]
+        self.__cache = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__dtype = dtype
+        self.add_rows(values)    # Add rows, validating them once
+        if _PROFILING:    # Count the matrix towards the profiled operations
+            _count_matrix(self.__data)
 
         return
 
@@ -110,14 +425,14 @@ class Matrix:
 
         # Determine the largest number of characters among all the elements
         maxLength = 0
-        for i in self.values:
+        for i in self.__rows():
             for j in i:
                 if len(str(j)) > maxLength:    # Check if longest number
                     maxLength = len(str(j))    # Mark a new maximum length
 
         # Pad each element with necessary whitespace for readablity
         stringValues = []
-        for i in self.values:
+        for i in self.__rows():
             rowValues = []
             for j in i:
                 # Create a right-justified string representation of element
@@ -156,441 +471,663 @@ class Matrix:
 
         return(matrixString)
 
-    def get_size(self):
+    def __reduce_ex__(self, protocol):
         """
-        Gives the size of the matrix.
+        Gives what pickle needs to rebuild the matrix: the elements of a
+        compact matrix as a single buffer of machine numbers (see
+        to_bytes()), rather than a Python object for every element, and
+        those of any other matrix as a single flat list. With pickle
+        protocol 5, the buffer is given as a PickleBuffer, which can be sent
+        out-of-band (see the buffer_callback of pickle.dumps()) so that it
+        is never copied into the pickle; a matrix unpickled from a writable
+        out-of-band buffer uses it in place.
 
         Parameters
         ----------
-            None
+            protocol : integer
+                the pickle protocol in use
 
         Returns
         -------
-            m : integer
-                number of rows in the matrix
-            n : integer
-                number of columns in the matrix
+            reduction : tuple
+                the function rebuilding the matrix, and its arguments
         """
 
-        m, n = self.__m, self.__n    # Get info from private attributes
+        m, n = self.get_size()
+        if not self.is_compact():    # Pickle handles lists of numbers well
+            typecode, payload = None, self.__deepcopy__({}).__data
+        else:
+            typecode, payload = self.__packed()
+            if protocol >= 5:
+                payload = pickle.PickleBuffer(payload)
+            else:
+                payload = bytes(payload)
+        reduction = (Matrix._unpickle, (payload, typecode, m, n,
+                                        self.is_compact(), self.__validation,
+                                        sys.byteorder, False, self.__dtype))
 
-        return(m, n)
+        return(reduction)
 
-    def get_value(self, row, column):
+    @classmethod
+    def _unpickle(cls, payload, typecode, m, n, compact, validation,
+                  byteorder, copy=False, dtype=None):
         """
-        Gives the value of a specified element of the matrix.
+        Rebuilds a matrix from its elements as a single buffer, for pickle
+        and from_bytes(). A writable buffer of machine numbers in the byte
+        order of this machine is used in place by compact matrices, unless
+        a copy is asked for.
 
         Parameters
         ----------
-            row : integer
-                row number of desired element
-            column : integer
-                column number of desired element
+            payload : bytes-like object/list
+                the elements of the matrix (see to_bytes()), or a list of
+                them
+            typecode : string/None
+                'd', 'f' or 'q' for machine numbers, 'O' for text, or None
+                for a list
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            compact : boolean
+                whether the matrix is stored as a compact array
+            validation : string/None
+                validation policy of the matrix
+            byteorder : string
+                "little" or "big", the byte order of the machine numbers
+            copy : boolean
+                whether to always copy the buffer
+            dtype : string/None
+                the fixed dtype of the matrix, if any
 
         Returns
         -------
-            value : integer/floating point number
-                value of the element at the given location
+            newMatrix : object of class Matrix
+                the matrix
         """
 
-        # Ensure arguments passed in are valid
-        assert isinstance(row, int) and isinstance(column, int), \
-            "Location must be an integer value."
-        m, n = self.get_size()
-        assert row > 0 and column > 0 and row <= m and column <= n, \
-            "Matrix must be defined at the given location."
+        if typecode is None:    # A flat list of the elements
+            newMatrix = cls.__from_storage(payload, m, n)
+            newMatrix.__dtype = dtype
+            newMatrix.set_validation_policy(validation)
+            return(newMatrix)
 
-        value = self.values[row-1][column-1]    # Index into matrix
+        view = memoryview(payload).cast("B")
+        if typecode == 'O':
+            fields = bytes(view).decode().split(",")
+            if any(map(contains, fields, repeat("/"))):    # Fractions
+                values = [Fraction(i) if "/" in i else _parse_row([i])[0]
+                          for i in fields]
+            else:
+                values = _parse_row(fields)
+            assert len(values) == m*n, "Number of values must be m*n."
+            newMatrix = cls.from_flat(values, m, n, compact, dtype)
+        else:
+            assert len(view) == array(typecode).itemsize*m*n, \
+                "Number of values must be m*n."
+            if compact and not copy and not view.readonly and \
+                    byteorder == sys.byteorder:
+                newMatrix = cls.from_buffer(view.cast(typecode), m, n)
+            else:
+                data = array(typecode)
+                data.frombytes(view)
+                if byteorder != sys.byteorder:
+                    data.byteswap()
+                if not compact:
+                    data = data.tolist()
+                # Wrap the elements directly, since they are numbers
+                newMatrix = cls.__from_storage(data, m, n)
+        newMatrix.__as_dtype(dtype)
+        newMatrix.set_validation_policy(validation)
 
-        return(value)
+        return(newMatrix)
 
-    def set_value(self, row, column, value):
+    def __deepcopy__(self, memo):
         """
-        Changes the value of a specified element of the matrix.
+        Copies the matrix for copy.deepcopy(), by copying its storage buffer
+        as a whole (the elements are numbers, which need no copying).
 
         Parameters
         ----------
-            row : integer
-                row number of element to be changed
-            column : integer
-                column number of element to be changed
-            value : integer/floating point number
-                new value for the specified element to take
+            memo : dictionary
+                the objects already copied, by id
 
         Returns
         -------
-            None, but updates the matrix elements
+            newMatrix : object of class Matrix
+                the copy of the matrix
         """
 
-        # Ensure arguments passed in are valid
-        assert isinstance(row, int) and isinstance(column, int), \
-            "Location must be an integer value."
-        assert isinstance(value, int) or isinstance(value, float), \
-            "Value must be a number."
         m, n = self.get_size()
-        assert row > 0 and column > 0 and row <= m and column <= n, \
-            "Matrix must be defined at the given location."
+        data = self.__data
+        if self.__rowStride == n and self.__columnStride == 1:
+            data = data[self.__offset:self.__offset+m*n]    # Slices copy
+        else:
+            data = _storage([j for i in self.__rows() for j in i],
+                            _typecode(data))
+        if isinstance(data, memoryview):    # Except for memoryviews
+            data = array(data.format, data.tobytes())
+        newMatrix = Matrix.__from_storage(data, m, n)
+        newMatrix.__validation = self.__validation
+        newMatrix.__dtype = self.__dtype
+        memo[id(self)] = newMatrix
 
-        self.values[row-1][column-1] = value    # Update value in matrix
-        self.check_validity()    # Double check that matrix is still valid
-
-        return
+        return(newMatrix)
 
-    def check_validity(self):
+    def copy(self):
         """
-        Checks if the existing matrix is valid, meaning the matrix has
-        elements which are exclusively integer/floating point numbers and has
-        all its rows of the same length.
+        Copies the matrix into a new storage buffer of its own, with the same
+        validation policy. This is how a view is turned into a matrix that no
+        longer shares memory with the matrix it was taken from.
 
-        Paramters
-        ---------
+        Parameters
+        ----------
             None
 
         Returns
         -------
-            None, but terminates if the matrix is invalid
+            newMatrix : object of class Matrix
+                the copy of the matrix
         """
 
-        m, n = self.get_size()
-        for i in self.values:
-            assert i, "Matrix must not be empty."
-            # Terminate if the rows are of different length
-            assert len(i) == n, "Rows must be of same length."
-            for j in i:
-                # Terminate if any element is not a number
-                assert isinstance(j, float) or isinstance(j, int), \
-                    "Elements must be numbers."
+        newMatrix = self.__deepcopy__({})
 
-        return
+        return(newMatrix)
 
-    def add_row(self, row):
+    @classmethod
+    def zeros(cls, m, n, compact=False, dtype=None):
         """
-        Appends a single row to the bottom of the existing matrix.
+        Creates a matrix with every element equal to zero.
 
         Parameters
         ----------
-            row : list of integer/floating point numbers
-                elements of the row to be added to the matrix
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            compact : boolean
+                whether to store the elements in a compact integer array
+            dtype : string/None
+                fixed type of the elements, one of DTYPES, or None
 
         Returns
         -------
-            None, but updates the existing matrix
-
-        See Also
-        --------
-            add_rows(rows) :
-                wrapper function that appends multiple rows at once by calling
-                this function repeatedly
+            newMatrix : object of class Matrix
+                the m x n zero matrix
         """
 
-        # Ensure argument passed in is valid
-        assert row and isinstance(row, list), \
-            "Argument must be a list of numbers."
-        for i in row:
-            assert isinstance(i, int) or isinstance(i, float), \
-                "Argument must be a list of numbers."
-        m, n = self.get_size()
-        if self.values:    # Since it may be the first row
-            assert len(row) == n, "Rows must be of same length."
+        newMatrix = cls.full(m, n, 0, compact, dtype)
 
-        self.values.append(row)    # Add the new row
-        self.__m += 1    # Update number of rows
-        self.__n = len(row)    # Update number of columns
-        self.check_validity()    # Double check that matrix is still valid
-
-        return
+        return(newMatrix)
 
-    def add_rows(self, rows):
+    @classmethod
+    def full(cls, m, n, value, compact=False, dtype=None):
         """
-        Appends multiple rows to the bottom of the existing matrix.
+        Creates a matrix with every element equal to the same number.
 
         Parameters
         ----------
-            rows : list of lists of integer/floating point numbers
-                elements of the rows to be added to the matrix
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            value : integer/floating point number
+                the value of every element
+            compact : boolean
+                whether to store the elements in a compact array
+            dtype : string/None
+                fixed type of the elements, one of DTYPES, or None
 
         Returns
         -------
-            None, but updates the existing matrix
-
-        See Also
-        --------
-            add_row(row) :
-                adds each individual row from the rows variable
+            newMatrix : object of class Matrix
+                the m x n matrix filled with the value
         """
 
-        # Ensure argument is valid
-        assert rows and isinstance(rows, list), \
-            "Argument must be a list of lists of numbers."
-        for i in rows:
-            assert i and isinstance(i, list), \
-                "Argument must be a list of lists of numbers."
-            for j in i:
-                assert isinstance(j, int) or isinstance(j, float), \
-                    "Argument must be a list of lists of numbers."
+        # Ensure arguments are valid
+        _check_size(m, n)
+        _check_dtype(dtype)
+        assert isinstance(value, _OBJECT_TYPES if dtype == "object" else
+                          (int, float)), "Value must be a number."
 
-        for i in rows:
-            self.add_row(i)    # Add row by row
-        self.check_validity()    # Double check that matrix is still valid
+        # Repeat a one element buffer, which copies memory rather than objects
+        if dtype is not None:
+            data = _dtype_storage([value], dtype)*(m*n)
+        elif compact:
+            data = _storage([value], _compact_typecode([[value]]))*(m*n)
+        else:
+            data = [value]*(m*n)
+        newMatrix = cls.__from_storage(data, m, n)
+        newMatrix.__dtype = dtype
 
-        return
+        return(newMatrix)
 
-    def delete_row(self, row):
+    @classmethod
+    def identity(cls, n, compact=False, dtype=None):
         """
-        Removes a specified row of the matrix, moving all rows below up one.
+        Creates the identity matrix, with ones on the main diagonal and zeros
+        everywhere else.
 
         Parameters
         ----------
-            row : integer
-                the number of the row to be removed
+            n : integer
+                number of rows and columns in the matrix
+            compact : boolean
+                whether to store the elements in a compact integer array
+            dtype : string/None
+                fixed type of the elements, one of DTYPES, or None
 
         Returns
         -------
-            None, but updates the existing matrix
+            newMatrix : object of class Matrix
+                the n x n identity matrix
         """
 
-        # Ensure argument is valid
-        assert isinstance(row, int), "Row index must be an integer."
-        m, n = self.get_size()
-        assert row > 0 and row <= m, \
-            "Matrix must be defined at the given location."
-        assert m != 1, "Matrix must have more than one row."
-
-        del self.values[row-1]    # Remove the list for that row
-        self.__m -= 1
-        self.check_validity()    # Double check that matrix is still valid
+        newMatrix = cls.zeros(n, n, compact, dtype)
+        # The diagonal is every (n+1)-th element of the storage
+        newMatrix.__data[::n+1] = _storage([1]*n, _typecode(newMatrix.__data))
 
-        return
+        return(newMatrix)
 
-    def add_column(self, column):
+    @classmethod
+    def from_flat(cls, values, m, n, compact=False, dtype=None):
         """
-        Appends a single column to the end of the matrix.
+        Creates a matrix from a flat sequence of its elements, given in
+        row-major order (the whole first row, then the second row, etc.).
 
         Parameters
         ----------
-            column : list of integer/floating point numbers
-                elements of the column to be added to the matrix
+            values : iterable of integer/floating point numbers
+                the m*n elements of the matrix
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            compact : boolean
+                whether to store the elements in a compact array
+            dtype : string/None
+                fixed type of the elements, one of DTYPES, or None
 
         Returns
         -------
-            None, but updates the existing matrix
-
-        See Also
-        --------
-            add_columns(columns) :
-                wrapper function that appends multiple columns at once by
-                calling this function repeatedly
+            newMatrix : object of class Matrix
+                the m x n matrix of the values
         """
 
-        # Ensure argument passed in is valid
-        assert column and isinstance(column, list), \
-            "Argument must be a list of numbers."
-        for i in column:
-            assert isinstance(i, int) or isinstance(i, float), \
-                "Argument must be a list of numbers."
-        m, n = self.get_size()
-        assert len(column) == m, "Columns must be of same length."
+        # Ensure arguments are valid
+        _check_size(m, n)
+        _check_dtype(dtype)
+        values = list(values)
+        assert len(values) == m*n, "Number of values must be m*n."
 
-        for i in range(len(self.values)):
-            self.values[i].append(column[i])    # Add the new column
-        self.__m = len(column)    # Update number of rows
-        self.__n += 1    # Update number of columns
-        self.check_validity()    # Double check that matrix is still valid
+        newMatrix = cls.__from_values(values, m, n, compact, dtype)
 
-        return
+        return(newMatrix)
 
-    def add_columns(self, columns):
+    @classmethod
+    def from_columns(cls, columns, compact=False, dtype=None):
         """
-        Appends multiple columns to the end of the matrix.
+        Creates a matrix from a list of its columns.
 
         Parameters
         ----------
             columns : list of lists of integer/floating point numbers
-                elements of the columnss to be added to the matrix
+                elements of the matrix in the form of column vectors
+            compact : boolean
+                whether to store the elements in a compact array
+            dtype : string/None
+                fixed type of the elements, one of DTYPES, or None
 
         Returns
         -------
-            None, but updates the existing matrix
-
-        See Also
-        --------
-            add_column(column) :
-                adds each individual column from the columns variable
+            newMatrix : object of class Matrix
+                the matrix with the given columns
         """
 
-        # Ensure argument is valid
+        # Ensure arguments are valid
         assert columns and isinstance(columns, list), \
             "Argument must be a list of lists of numbers."
         for i in columns:
             assert i and isinstance(i, list), \
                 "Argument must be a list of lists of numbers."
-            for j in i:
-                assert isinstance(j, int) or isinstance(j, float), \
-                    "Argument must be a list of lists of numbers."
+            assert len(i) == len(columns[0]), "Columns must be of same length."
+        _check_dtype(dtype)
 
-        for i in columns:
-            self.add_column(i)    # Add column by column
-        self.check_validity()    # Double check that matrix is still valid
+        # Interleave the columns into rows in a single pass
+        values = [j for i in zip(*columns) for j in i]
+        newMatrix = cls.__from_values(values, len(columns[0]), len(columns),
+                                      compact, dtype)
 
-        return
+        return(newMatrix)
 
-    def delete_column(self, column):
+    @classmethod
+    def from_rows(cls, rows, compact=False, validation=None):
         """
-        Removes a specified column of the matrix, moving all columns to the
-        right to the left by one.
+        Creates a matrix from any iterable of its rows, such as a generator,
+        adding them one at a time (see add_rows()) instead of needing them
+        all in a list first.
 
         Parameters
         ----------
-            column : integer
-                the number of the column to be removed
+            rows : iterable of iterables of integer/floating point numbers
+                elements of the matrix in the form of row vectors
+            compact : boolean
+                whether to store the elements in a compact array, starting
+                out as 64-bit integers and widening as for set_value()
+            validation : string/None
+                validation policy of the matrix, one of VALIDATION_POLICIES,
+                or None to follow the module-wide VALIDATION_POLICY
 
         Returns
         -------
-            None, but updates the existing matrix
+            newMatrix : object of class Matrix
+                the matrix with the given rows
         """
 
-        # Ensure argument is valid
-        assert isinstance(column, int), "Column index must be an integer."
-        m, n = self.get_size()
-        assert column > 0 and column <= n, \
-            "Matrix must be defined at the given location."
-        assert n != 1, "Matrix must have more than one column."
+        # Ensure argument is valid (add_rows checks the rows)
+        assert validation is None or validation in VALIDATION_POLICIES, \
+            "Validation policy must be one of {}.".format(VALIDATION_POLICIES)
 
-        for i in range(len(self.values)):
-            del self.values[i][column-1]
-        self.__n -= 1
-        self.check_validity()    # Double check that matrix is still valid
+        # Start from an empty matrix
+        newMatrix = cls.__from_storage(array("q") if compact else [], 0, 0)
+        newMatrix.__validation = validation
+        newMatrix.add_rows(rows)
 
-        return
+        return(newMatrix)
 
-    def scalar_add(self, number):
+    @classmethod
+    def from_buffer(cls, buffer, m, n):
         """
-        Adds a scalar number to each element of the matrix.
+        Creates a compact matrix from any object supporting the buffer
+        protocol (such as an array, a bytearray or an mmap), holding the m*n
+        elements in row-major order. Contiguous buffers of doubles, of 4
+        byte floats (giving a matrix of the "float32" dtype) or of 64-bit
+        integers are used in place, so the matrix and the buffer share memory
+        and changes to one show in the other; anything else is copied into a
+        compact array. Read-only buffers give read-only matrices.
 
         Parameters
         ----------
-            number : integer/floating point number
-                the scalar number to be added to the matrix
+            buffer : object supporting the buffer protocol
+                the elements of the matrix
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
 
         Returns
         -------
-            None, but updates the existing matrix
+            newMatrix : object of class Matrix
+                the m x n matrix of the values in the buffer
         """
 
-        assert isinstance(number, int) or isinstance(number, float), \
-            "Argument must be a number."
+        # Ensure arguments are valid
+        _check_size(m, n)
+        view = memoryview(buffer)
+        # Strip the byte order from the format, which must be native
+        fmt = view.format
+        if fmt[:1] in ("@", "=", "<" if sys.byteorder == "little" else ">"):
+            fmt = fmt[1:]
+        assert len(fmt) == 1 and fmt in "bBhHiIlLqQnN?efd", \
+            "Buffer must hold numbers in native byte order."
+        assert view.nbytes == m*n*view.itemsize, \
+            "Number of values must be m*n."
 
-        for i in range(len(self.values)):
-            for j in range(len(self.values[i])):
-                self.values[i][j] += number    # Increase each value by number
-        self.check_validity()
+        if not view.c_contiguous:    # Gather the values into a new buffer
+            view = memoryview(view.tobytes())
+        if fmt in "lnq" and view.itemsize == 8:    # Same as a 64-bit integer
+            fmt = "q"
+        flat = view.cast("B").cast(fmt)
+        if fmt in ("d", "f", "q"):    # Use the buffer in place
+            data = flat
+        elif fmt == "e":
+            data = array("d", flat.tolist())
+        else:
+            data = _storage(flat.tolist(), "q")
+        newMatrix = cls.__from_storage(data, m, n)
 
-        return
+        return(newMatrix)
 
-    def scalar_multiply(self, number):
+    @classmethod
+    def from_numpy(cls, arr, copy=False):
         """
-        Multiplies each element of the matrix by some scalar number.
+        Creates a matrix from a two-dimensional NumPy array. A C-contiguous
+        array of float64, float32 or int64 values is used in place unless a
+        copy is asked for, so the matrix and the array share memory; any
+        other array is copied into a compact matrix of doubles or 64-bit
+        integers (or a list, for unsigned integers too large for 64-bit
+        integers). Float32 arrays give matrices of the "float32" dtype.
 
         Parameters
         ----------
-            number : integer/floating point number
-                the scalar number for the matrix to be mutiplied by
+            arr : two-dimensional NumPy array of numbers
+                the elements of the matrix
+            copy : boolean
+                whether to always copy the elements
 
         Returns
         -------
-            None, but updates the existing matrix
+            newMatrix : object of class Matrix
+                the matrix of the values in the array
         """
 
-        # Ensure argument is valid
-        assert isinstance(number, int) or isinstance(number, float), \
-            "Argument must be a number."
+        # Ensure arguments are valid
+        assert numpy is not None, "NumPy must be installed."
+        arr = numpy.asarray(arr)
+        assert arr.ndim == 2, "Array must be two-dimensional."
+        assert arr.dtype.kind in "biuf", "Array must hold numbers."
 
-        for i in range(len(self.values)):
-            for j in range(len(self.values[i])):
-                self.values[i][j] *= number    # Multiply each value by number
-        self.check_validity()
+        dtype = numpy.float64 if arr.dtype.kind == "f" else numpy.int64
+        if arr.dtype == numpy.float32:
+            dtype = numpy.float32
+        elif arr.dtype.kind == "u" and arr.size and arr.max() > INT64_MAX:
+            dtype = arr.dtype    # Left to from_buffer() to widen
+        if copy or arr.dtype != dtype or not arr.flags.c_contiguous:
+            arr = numpy.array(arr, dtype=dtype, order="C")
+        m, n = arr.shape
+        newMatrix = cls.from_buffer(arr, m, n)
 
-        return
+        return(newMatrix)
 
-    def matrix_add(self, otherMatrix):
+    @classmethod
+    def open_mmap(cls, path, mode="r", m=None, n=None, typecode="d"):
         """
-        Produces the resultant matrix from adding two matrices together.
+        Opens a matrix stored in a binary file, mapping the file into memory
+        rather than reading it. Opening takes the same time for any size of
+        matrix, elements are only read from disk (a page at a time) when
+        they are used, and changes are written straight back to the file.
+
+        The file is in the binary format of to_bytes(), holding doubles,
+        4 byte floats or 64-bit integers in the byte order of this machine
+        (see save_mmap()).
 
         Parameters
         ----------
-            otherMatrix : object of class Matrix
-                the other matrix to be added to the active matrix
+            path : string
+                the path of the file
+            mode : string
+                "r" to open the matrix read-only, "r+" to open it for reading
+                and writing, "c" to open it copy-on-write (changes are kept
+                in memory and not saved), or "w+" to create a new file (or
+                overwrite an existing one) holding an m x n matrix of zeros
+            m : integer/None
+                number of rows in a new matrix, for "w+"
+            n : integer/None
+                number of columns in a new matrix, for "w+"
+            typecode : string
+                'd', 'f' or 'q', the type of the elements of a new matrix
 
         Returns
         -------
             newMatrix : object of class Matrix
-                the resultant matrix from the addition of the other matrices
+                the matrix in the file
         """
 
-        # Ensure argument is valid
-        assert isinstance(otherMatrix, Matrix), \
-            "Argument must be a matrix."
-        m1, n1 = self.get_size()
-        m2, n2 = otherMatrix.get_size()
-        assert m1 == m2 and n1 == n2, "Matrices must be the same size."
+        # Ensure arguments are valid
+        assert mode in ("r", "r+", "c", "w+"), \
+            "Mode must be one of 'r', 'r+', 'c' and 'w+'."
+        byteorder = "<" if sys.byteorder == "little" else ">"
+        if mode == "w+":
+            _check_size(m, n)
+            assert typecode in ("d", "f", "q"), \
+                "Typecode must be 'd', 'f' or 'q'."
+            with open(path, "wb") as file:
+                file.write(_binary_header(m, n, typecode, True))
+                # Extend the file without writing the zeros, which most
+                # file systems then store as a sparse file
+                file.truncate(BINARY_HEADER_SIZE +
+                              array(typecode).itemsize*m*n)
+            mode = "r+"
 
-        # Instantiate the zero matrix of the right size as a placeholder
-        newMatrix = Matrix([[0 for i in range(n1)] for j in range(m1)])
-
-        for i in range(m1):
-            for j in range(n1):
-                # New element value is sum of the value of the elements in the
-                # same location in each input matrix
-                newMatrix.values[i][j] = self.values[i][j] + \
-                    otherMatrix.values[i][j]
+        with open(path, "rb" if mode == "r" else "r+b") as file:
+            order, typecode, compact, m, n, dtype = _read_binary_header(
+                file.read(BINARY_HEADER_SIZE))
+            assert order == byteorder, \
+                "File must be in the byte order of this machine."
+            assert typecode in ("d", "f", "q"), \
+                "File must hold machine numbers."
+            access = {"r": mmap.ACCESS_READ, "r+": mmap.ACCESS_WRITE,
+                      "c": mmap.ACCESS_COPY}[mode]
+            mapping = mmap.mmap(file.fileno(), 0, access=access)
+        # The mapping stays open for as long as the matrix uses it
+        end = BINARY_HEADER_SIZE + array(typecode).itemsize*m*n
+        assert len(mapping) >= end, "File must hold all m*n elements."
+        newMatrix = cls.from_buffer(
+            memoryview(mapping)[BINARY_HEADER_SIZE:end].cast(typecode), m, n)
+        if dtype is not None and DTYPES[dtype] == typecode:
+            newMatrix.__dtype = dtype
 
         return(newMatrix)
 
-    def matrix_multiply(self, otherMatrix):
+    def save_mmap(self, path):
         """
-        Produces the resultant matrix from multiplying two matrices together.
-        To be clear, this method outputs the result of (self * otherMatrix),
-        not (otherMatrix * self).
+        Writes the matrix to a new binary file, in the format read by
+        open_mmap(), one row at a time. Matrices stored as lists are saved
+        as 64-bit integers if every element fits, and as doubles otherwise,
+        so they must hold only integers and floating point numbers (not
+        the fractions or other numbers of object dtype).
 
         Parameters
         ----------
-            otherMatrix : object of class Matrix
-                the other matrix to be multiplied with the active matrix
+            path : string
+                the path of the file, which is overwritten if it exists
 
         Returns
         -------
-            newMatrix : object of class Matrix
-                the resultant matrix from the multiplication of the other
-                matrices
+            None, but creates the file
         """
 
-        # Ensure argument is valid
-        assert isinstance(otherMatrix, Matrix), \
-            "Argument must be a matrix."
-        m1, n1 = self.get_size()
-        m2, n2 = otherMatrix.get_size()
-        assert n1 == m2, "Matrices must be of compatible size."
+        m, n = self.get_size()
+        typecode = _typecode(self.__data)
+        if typecode is None:
+            for i in self.__rows():
+                assert all(map(isinstance, i, repeat((int, float)))), \
+                    "Elements must be integers or floating point numbers."
+            typecode = _compact_typecode(self.__rows())
+        with open(path, "wb") as file:
+            file.write(_binary_header(m, n, typecode, True, self.__dtype))
+            for i in self.__rows():
+                array(typecode, _as_list(i)).tofile(file)
+
+        return
+
+    @classmethod
+    def load_csv(cls, path, compact=False, validation=None, delimiter=",",
+                 chunkSize=None):
+        """
+        Creates a matrix from a CSV file with a row of numbers on each line,
+        in a single pass over the file. The lines are read and parsed in
+        chunks of a fixed number of rows, which are added to the matrix as
+        they are parsed, so no more than a chunk of text is held in memory.
+        Numbers written as integers are read as integers, and the rest as
+        floating point numbers. Blank lines are skipped.
+
+        Parameters
+        ----------
+            path : string
+                the path of the file
+            compact : boolean
+                whether to store the elements in a compact array
+            validation : string/None
+                validation policy of the matrix, one of VALIDATION_POLICIES,
+                or None to follow the module-wide VALIDATION_POLICY
+            delimiter : string
+                the character separating the numbers on each line
+            chunkSize : integer/None
+                the number of lines to parse at a time (by default,
+                CHUNK_SIZE)
 
-        # Instantiate the zero matrix of the right size as a placeholder
-        newMatrix = Matrix([[0 for i in range(n2)] for j in range(m1)])
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the numbers in the file
+        """
 
-        for i in range(m1):
-            for j in range(n2):
-                # New element value is sum of products of corresponding row
-                # and column vectors of the matrices
-                value = 0    # Initially set to zero
-                for k in range(n1):
-                    # Add the value of each relevant product to the cumulative
-                    # value of the new element
-                    value += self.values[i][k] * otherMatrix.values[k][j]
-                newMatrix.values[i][j] = value    # Assign final value
+        with open(path, newline="") as file:
+            reader = csv.reader(file, delimiter=delimiter)
+            newMatrix = cls.from_rows(_parse_rows(reader, chunkSize),
+                                      compact, validation)
 
         return(newMatrix)
 
-    def transpose(self):
+    def save_csv(self, path, delimiter=",", chunkSize=None):
         """
-        Produces the a matrix equivalent to the transpose of the existing
-        matrix.
+        Writes the matrix to a CSV file, with a row of numbers on each line,
+        which load_csv() reads back exactly. The rows are formatted and
+        written in chunks (see iter_rows()). The elements must be integers
+        or floating point numbers (booleans are written as 1 and 0), so the
+        fractions and other numbers of the object dtype cannot be written.
+
+        Parameters
+        ----------
+            path : string
+                the path of the file, which is overwritten if it exists
+            delimiter : string
+                the character separating the numbers on each line
+            chunkSize : integer/None
+                the number of rows to write at a time (by default,
+                CHUNK_SIZE)
+
+        Returns
+        -------
+            None, but creates the file
+        """
+
+        typed = _typecode(self.__data) is not None    # Machine numbers
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            for i in self.iter_rows(chunkSize):
+                if not typed:
+                    for row in i:
+                        assert all(map(isinstance, row,
+                                       repeat((int, float)))), \
+                            "Elements must be integers or floating point " \
+                            "numbers."
+                    i = [[int(k) if isinstance(k, bool) else k for k in row]
+                         for row in i]
+                writer.writerows(i)
+
+        return
+
+    def to_bytes(self):
+        """
+        Gives the matrix in a compact binary form, which from_bytes() turns
+        back into an identical matrix. Compact matrices, and matrices of
+        only integers or only floating point numbers, are written as an
+        array of machine numbers, without converting each element.
+
+        The binary form starts with a header of BINARY_HEADER_SIZE bytes:
+        the 8 bytes BINARY_MAGIC; the byte order ('<' or '>') and encoding
+        of the elements ('d' for doubles, 'f' for 4 byte floats, 'q' for
+        64-bit integers, or 'O' for text); the version of the format,
+        BINARY_VERSION; a byte of flags (1 for a compact matrix, plus twice
+        one more than the position of its dtype in DTYPES for a matrix with
+        a fixed dtype); 4 bytes of padding; and m and n as
+        little-endian 64-bit integers. The m*n elements follow in row-major
+        order, as text separated by commas for 'O' (used for matrices mixing
+        integers and floating point numbers, with integers too large for 64
+        bits, or with fractions). Other elements of object dtype (such as
+        decimals or complex numbers) cannot be written.
 
         Parameters
         ----------
@@ -598,52 +1135,8347 @@ class Matrix:
 
         Returns
         -------
-            newMatrix : object of class Matrix
-                the transpose of the original matrix
+            data : bytes
+                the matrix in binary form
         """
 
-        # Instantiate the zero matrix of the right size as a placeholder
         m, n = self.get_size()
-        newMatrix = Matrix([[0 for i in range(m)] for j in range(n)])
+        typecode, payload = self.__packed()
+        data = _binary_header(m, n, typecode, self.is_compact(),
+                              self.__dtype) + bytes(payload)
 
-        for i in range(m):
-            for j in range(n):
-                # Map each element from the existing matrix to the new location
-                # on the resultant matrix
-                newMatrix.values[j][i] = self.values[i][j]
+        return(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Creates a matrix from the binary form given by to_bytes(), which
+        may have been written on a machine of either byte order.
+
+        Parameters
+        ----------
+            data : bytes-like object
+                the matrix in binary form
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix
+        """
+
+        view = memoryview(data).cast("B")
+        byteorder, typecode, compact, m, n, dtype = _read_binary_header(
+            view[:BINARY_HEADER_SIZE])
+        newMatrix = cls._unpickle(view[BINARY_HEADER_SIZE:], typecode, m, n,
+                                  compact, None, "little" if byteorder == "<"
+                                  else "big", copy=True, dtype=dtype)
 
         return(newMatrix)
 
-    def determinant(self):
+    def flush(self):
         """
-        Computes the determinant of a square matrix.
+        Makes sure any changes to a matrix opened with open_mmap() have been
+        written to its file. Other matrices are unaffected.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+
+        data = self.__data
+        if isinstance(data, memoryview) and not data.readonly and \
+                isinstance(data.obj, mmap.mmap):
+            data.obj.flush()
+
+        return
+
+    def __array__(self, dtype=None, copy=None):
+        """
+        Gives the matrix as a NumPy array, for numpy.asarray() and friends.
+        The array shares memory with compact storage unless a copy is asked
+        for.
+
+        Parameters
+        ----------
+            dtype : NumPy data type/None
+                data type for the array, or None to keep that of the matrix
+            copy : boolean/None
+                True to always copy, False to never copy, None to copy only
+                when needed
+
+        Returns
+        -------
+            arr : two-dimensional NumPy array
+                the elements of the matrix
+        """
+
+        if copy is False and _typecode(self.__data) is None:
+            raise ValueError("Matrix must be compact to convert without copy.")
+
+        arr = self.__numpy_array()
+        if dtype is not None:
+            arr = arr.astype(dtype, copy=False)
+        if copy:
+            arr = arr.copy()
+        elif _typecode(self.__data) is not None and \
+                numpy.shares_memory(arr, self.__numpy_array()):
+            self.__export()
+
+        return(arr)
+
+    @property
+    def __array_interface__(self):
+        """
+        Describes the storage of a compact matrix in the form of the NumPy
+        array interface, so that NumPy can use it without copying. Matrices
+        stored as lists do not have it, and NumPy falls back to __array__().
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            interface : dictionary
+                the shape, strides, type and buffer of the matrix
+        """
+
+        typecode = _typecode(self.__data)
+        if typecode is None:
+            raise AttributeError("Matrix must be compact to share memory.")
+        self.__export()
+
+        m, n = self.get_size()
+        itemsize = self.__data.itemsize
+        byteorder = "<" if sys.byteorder == "little" else ">"
+        interface = {
+            "version": 3,
+            "shape": (m, n),
+            "typestr": byteorder + {"d": "f8", "f": "f4", "q": "i8"}[typecode],
+            "data": self.__data,
+            "offset": self.__offset*itemsize,
+            "strides": (self.__rowStride*itemsize,
+                        self.__columnStride*itemsize),
+        }
+
+        return(interface)
+
+    @property
+    def values(self):
+        """
+        Gives a view of the elements of the matrix that can be indexed like
+        a list of lists, for compatibility with code written against the
+        original list of lists storage. Each access goes through get_value()
+        and set_value(), so prefer those (or the matrix operations) in loops.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            view : object of class MatrixValues
+                a live view of the rows of the matrix
+        """
+
+        view = MatrixValues(self)
+
+        return(view)
+
+    def __getitem__(self, key):
+        """
+        Gives the element or block of elements of the matrix selected by a
+        zero-based index, as for lists: A[i, j] is a single element, while
+        any other index (such as A[i], A[:, j] or A[2:10, ::2]) gives a view,
+        a matrix sharing the storage of this one. Writes through the view
+        change this matrix too, and vice versa, until either of them changes
+        size or needs wider storage, which gives it a copy of its own.
+
+        Parameters
+        ----------
+            key : integer/slice, or tuple of two integers/slices
+                the rows, or the rows and the columns, to select
+
+        Returns
+        -------
+            value : integer/floating point number/object of class Matrix
+                the selected element, or a view of the selected block
+        """
+
+        rows, columns = _split_key(key)
+        m, n = self.get_size()
+        if isinstance(rows, int) and isinstance(columns, int):
+            i, j = _normalize_index(rows, m), _normalize_index(columns, n)
+            return(self.__data[self.__index(i, j)])
+
+        # Work out where the view starts in the storage, and its strides
+        rowStart, rowStep, rowCount = _view_range(rows, m)
+        columnStart, columnStep, columnCount = _view_range(columns, n)
+        view = Matrix.__from_storage(self.__data, rowCount, columnCount,
+                                     shared=True)
+        view.__offset = self.__index(rowStart, columnStart)
+        view.__rowStride = self.__rowStride*rowStep
+        view.__columnStride = self.__columnStride*columnStep
+        view.__validation = self.__validation
+        view.__view = True
+        view.__version = self.__version    # Changes to either show in both
+        view.__dtype = self.__dtype
+
+        return(view)
+
+    def __setitem__(self, key, value):
+        """
+        Changes the element or block of elements of the matrix selected by a
+        zero-based index, as for __getitem__(). A block is set from a single
+        number (given to every element of it), from a matrix or expression of
+        the same size as the block, or from a list of its rows.
+
+        Parameters
+        ----------
+            key : integer/slice, or tuple of two integers/slices
+                the rows, or the rows and the columns, to change
+            value : number/object of class Matrix/list of lists
+                the new values of the selected elements
+
+        Returns
+        -------
+            None, but updates the matrix elements
+        """
+
+        rows, columns = _split_key(key)
+        m, n = self.get_size()
+        if isinstance(rows, int) and isinstance(columns, int):
+            i, j = _normalize_index(rows, m), _normalize_index(columns, n)
+            self.set_value(i+1, j+1, value)
+            return
+
+        view = self[key]
+        m, n = view.get_size()
+        if isinstance(value, MatrixExpression):
+            value = value.evaluate()
+        if isinstance(value, Matrix):
+            assert value.get_size() == (m, n), "Matrices must be of same size."
+            # Read the values first, as the two may overlap in storage
+            values = [j for i in value.__rows() for j in _as_list(i)]
+        elif isinstance(value, list):
+            assert len(value) == m and \
+                all(isinstance(i, list) and len(i) == n for i in value), \
+                "Rows must be of the same size as the block."
+            values = [j for i in value for j in i]
+        else:
+            values = [value]*(m*n)
+        if self.__checks_elements():
+            assert all(map(isinstance, values,
+                           repeat(self.__element_types()))), \
+                "Values must be numbers."
+
+        # A matrix (but not a view) widens its storage to fit new values
+        typecode = _typecode(_storage(values, _typecode(self.__data)))
+        if typecode != _typecode(self.__data) and not self.__view:
+            self.__check_writable()
+            self.__widen(typecode)
+            view = self[key]
+        view.__overwrite(values)
+        self.__revalidate()
+
+        return
+
+    def get_size(self):
+        """
+        Gives the size of the matrix.
 
         Parameters
         ----------
             None
 
+        Returns
+        -------
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+        """
+
+        m, n = self.__m, self.__n    # Get info from private attributes
+
+        return(m, n)
+
+    def get_value(self, row, column):
+        """
+        Gives the value of a specified element of the matrix.
+
+        Parameters
+        ----------
+            row : integer
+                row number of desired element
+            column : integer
+                column number of desired element
+
         Returns
         -------
             value : integer/floating point number
-                the scalar number representing the value of the determinant
+                value of the element at the given location
         """
 
-        # Ensure matrix is valid for determinant operation
+        # Ensure arguments passed in are valid
+        assert isinstance(row, int) and isinstance(column, int), \
+            "Location must be an integer value."
         m, n = self.get_size()
-        assert m == n, "Matrix must be square."
+        assert row > 0 and column > 0 and row <= m and column <= n, \
+            "Matrix must be defined at the given location."
 
-        if m == 1:    # Base case of recursion
-            value = self.get_value(1, 1)    # Determinant is just only value
-        else:    # Apply method of cofactor expansion
-            value = 0
-            for i in range(m):
-                subMatrix = deepcopy(self)
-                # Consider the sub matrix without the row and column that the
-                # present element is in
-                subMatrix.delete_row(1)
-                subMatrix.delete_column(i+1)
-                # Formula applies negative as needed, includes factor of
-                # present element, and makes recursive call for the sub matrix
-                value += (-1)**i*self.get_value(1, i+1)*subMatrix.determinant()
+        value = self.__data[self.__index(row-1, column-1)]    # Index in
 
         return(value)
+
+    def get_row(self, row):
+        """
+        Gives the elements of a specified row of the matrix.
+
+        Parameters
+        ----------
+            row : integer
+                row number of desired row
+
+        Returns
+        -------
+            values : list of integer/floating point numbers
+                a copy of the elements of the row, from left to right
+        """
+
+        # Ensure argument passed in is valid
+        assert isinstance(row, int), "Row index must be an integer."
+        m, n = self.get_size()
+        assert row > 0 and row <= m, \
+            "Matrix must be defined at the given location."
+
+        values = list(self.__row(row-1))
+
+        return(values)
+
+    def get_column(self, column):
+        """
+        Gives the elements of a specified column of the matrix.
+
+        Parameters
+        ----------
+            column : integer
+                column number of desired column
+
+        Returns
+        -------
+            values : list of integer/floating point numbers
+                a copy of the elements of the column, from top to bottom
+        """
+
+        # Ensure argument passed in is valid
+        assert isinstance(column, int), "Column index must be an integer."
+        m, n = self.get_size()
+        assert column > 0 and column <= n, \
+            "Matrix must be defined at the given location."
+
+        values = list(self.__column(column-1))
+
+        return(values)
+
+    def iter_rows(self, chunkSize=None):
+        """
+        Iterates over the rows of the matrix in chunks of a fixed number of
+        rows, from top to bottom, copying only a chunk at a time. This keeps
+        memory use flat when streaming a large matrix, such as one opened
+        with open_mmap(), to somewhere else.
+
+        Parameters
+        ----------
+            chunkSize : integer/None
+                the number of rows in each chunk (by default, CHUNK_SIZE)
+
+        Returns
+        -------
+            chunks : generator of lists of lists of numbers
+                the rows of each chunk in turn, as lists of elements; the
+                last chunk may be shorter than the others
+        """
+
+        # Ensure argument is valid
+        if chunkSize is None:
+            chunkSize = CHUNK_SIZE
+        assert isinstance(chunkSize, int) and chunkSize > 0, \
+            "Chunk size must be a positive integer."
+
+        return(self.__chunks(chunkSize))
+
+    def set_value(self, row, column, value):
+        """
+        Changes the value of a specified element of the matrix.
+
+        Parameters
+        ----------
+            row : integer
+                row number of element to be changed
+            column : integer
+                column number of element to be changed
+            value : integer/floating point number
+                new value for the specified element to take
+
+        Returns
+        -------
+            None, but updates the matrix elements
+        """
+
+        # Ensure arguments passed in are valid
+        assert isinstance(row, int) and isinstance(column, int), \
+            "Location must be an integer value."
+        if self.__checks_elements():
+            assert isinstance(value, self.__element_types()), \
+                "Value must be a number."
+        m, n = self.get_size()
+        assert row > 0 and column > 0 and row <= m and column <= n, \
+            "Matrix must be defined at the given location."
+
+        self.__check_writable()
+        if _typecode(self.__data) == 'f':    # Which rounds to infinity
+            assert not _float32_overflows([value], array('f', [value])), \
+                "Values must be of the dtype of the matrix (float32)."
+
+        try:
+            # Update value in matrix
+            self.__data[self.__index(row-1, column-1)] = value
+        except (TypeError, OverflowError):
+            # Compact storage cannot hold the value, so widen it first
+            self.__widen(_widen(_typecode(self.__data), value))
+            self.__data[self.__index(row-1, column-1)] = value
+        self.__touch()
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def is_compact(self):
+        """
+        Determines if the elements of the matrix are stored in a compact
+        array rather than as a list of Python numbers.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            compact : boolean
+                whether the matrix uses compact storage
+        """
+
+        compact = _typecode(self.__data) is not None
+
+        return(compact)
+
+    def get_dtype(self):
+        """
+        Gives the fixed type of the elements of the matrix, if it has one
+        (see DTYPES).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            dtype : string/None
+                one of DTYPES, or None for a matrix with flexible storage
+        """
+
+        return(self.__dtype)
+
+    def astype(self, dtype):
+        """
+        Converts the matrix to a fixed type of element, or to flexible
+        storage, giving a new matrix. Conversion to "int64" truncates
+        floating point numbers towards zero (so infinities and NaN cannot be
+        converted), and conversion to "float64" or "float32" rounds to the
+        nearest number of that type.
+
+        Parameters
+        ----------
+            dtype : string/None
+                one of DTYPES, or None for flexible storage (a list, or a
+                compact array for a matrix of int64 or float64 elements)
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the converted matrix
+        """
+
+        # Ensure argument is valid
+        _check_dtype(dtype)
+
+        m, n = self.get_size()
+        values = [j for i in self.__rows() for j in i]
+        if dtype is None:
+            typecode = _typecode(self.__data)
+            data = _storage(values, None if typecode == 'f' else typecode)
+        else:
+            if dtype == "int64":
+                try:
+                    values = [int(i) for i in values]
+                except (ValueError, OverflowError):    # Infinities and NaN
+                    values = None
+                assert values is not None, \
+                    "Values must be finite to be converted to int64."
+            elif dtype != "object":
+                values = [float(i) for i in values]
+            data = _dtype_storage(values, dtype)
+        newMatrix = Matrix.__from_storage(data, m, n)
+        newMatrix.__validation = self.__validation
+        newMatrix.__dtype = dtype
+
+        return(newMatrix)
+
+    def get_validation_policy(self):
+        """
+        Gives the validation policy in effect for the matrix: its own policy
+        if one was set, or the module-wide VALIDATION_POLICY otherwise.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            policy : string
+                "strict", "incremental" or "trusted"
+        """
+
+        policy = self.__validation
+        if policy is None:    # Follow the module-wide setting
+            policy = VALIDATION_POLICY
+        assert policy in VALIDATION_POLICIES, \
+            "Validation policy must be one of {}.".format(VALIDATION_POLICIES)
+
+        return(policy)
+
+    def set_validation_policy(self, policy):
+        """
+        Changes how much checking the mutators of the matrix do. In "strict"
+        mode every change is followed by a full check_validity(), in
+        "incremental" mode only the elements being written are checked, and
+        in "trusted" mode elements are not checked at all. Sizes and
+        locations are always checked.
+
+        Parameters
+        ----------
+            policy : string/None
+                one of VALIDATION_POLICIES, or None to follow the module-wide
+                VALIDATION_POLICY
+
+        Returns
+        -------
+            None, but updates the policy of the matrix
+        """
+
+        assert policy is None or policy in VALIDATION_POLICIES, \
+            "Validation policy must be one of {}.".format(VALIDATION_POLICIES)
+
+        self.__validation = policy
+
+        return
+
+    def check_validity(self):
+        """
+        Checks if the existing matrix is valid, meaning the matrix has
+        elements which are exclusively integer/floating point numbers and has
+        all its rows of the same length.
+
+        Paramters
+        ---------
+            None
+
+        Returns
+        -------
+            None, but terminates if the matrix is invalid
+        """
+
+        m, n = self.get_size()
+        if m:
+            assert n, "Matrix must not be empty."
+            # Terminate if the storage is too short to hold every row in full
+            assert len(self.__data) > self.__index(m-1, n-1), \
+                "Rows must be of same length."
+        if _typecode(self.__data) is None:    # Compact arrays hold numbers
+            types = self.__element_types()
+            for i in self.__rows():
+                for j in i:
+                    # Terminate if any element is not a number
+                    assert isinstance(j, types), "Elements must be numbers."
+
+        return
+
+    def cache_info(self):
+        """
+        Gives the state of the cache of derived results of the matrix (such
+        as its determinant and transpose), which are kept until the matrix
+        next changes. Every change made through the methods of the matrix,
+        or of a view sharing its storage, counts as a new version.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            info : dictionary
+                "version", the number of changes made to the matrix so far;
+                "hits" and "misses", the number of derived results given
+                from the cache and worked out since it was last cleared;
+                and "entries", the names of the results in the cache
+        """
+
+        version = self.__version[0]
+        entries = sorted(key for key, (stamp, value) in self.__cache.items()
+                         if stamp == version)
+        info = {"version": version, "hits": self.__hits,
+                "misses": self.__misses, "entries": entries}
+
+        return(info)
+
+    def clear_cache(self):
+        """
+        Empties the cache of derived results of the matrix and resets its
+        hit and miss counts. Changes made to the elements from outside the
+        matrix, through a NumPy array or buffer sharing its memory, are not
+        seen by the cache, so it must be cleared after them. (Matrices made
+        around a buffer or file by from_buffer(), from_numpy() or
+        open_mmap() never cache their results.)
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but empties the cache
+        """
+
+        self.__cache.clear()
+        self.__hits = 0
+        self.__misses = 0
+
+        return
+
+    def add_row(self, row):
+        """
+        Appends a single row to the bottom of the existing matrix.
+
+        Parameters
+        ----------
+            row : list of integer/floating point numbers
+                elements of the row to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+
+        See Also
+        --------
+            add_rows(rows) :
+                wrapper function that appends multiple rows at once
+        """
+
+        # Ensure argument passed in is valid
+        assert row and isinstance(row, list), \
+            "Argument must be a list of numbers."
+        if self.__checks_elements():
+            for i in row:
+                assert isinstance(i, self.__element_types()), \
+                    "Argument must be a list of numbers."
+        m, n = self.get_size()
+        if m:    # Since it may be the first row
+            assert len(row) == n, "Rows must be of same length."
+
+        self.__append_row(row)    # Add the new row
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def add_rows(self, rows):
+        """
+        Appends multiple rows to the bottom of the existing matrix. The rows
+        can come from any iterable, such as a generator, and are checked and
+        added one at a time, so they never need to be held in memory all at
+        once. If any row is invalid, none of the rows are added.
+
+        Parameters
+        ----------
+            rows : iterable of iterables of integer/floating point numbers
+                elements of the rows to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+
+        See Also
+        --------
+            add_row(row) :
+                adds a single row
+        """
+
+        # Ensure argument is valid
+        try:
+            rows = iter(rows)
+        except TypeError:
+            rows = None
+        assert rows is not None, \
+            "Argument must be an iterable of lists of numbers."
+        checkElements = self.__checks_elements()
+        types = self.__element_types()
+        self.__check_resizable()
+        m, n = self.get_size()
+        data, length = self.__data, len(self.__data)
+
+        try:
+            for i in rows:
+                # Ensure each row is valid before adding it
+                if not isinstance(i, list):
+                    try:
+                        i = list(i)
+                    except TypeError:
+                        i = None
+                assert i, "Argument must be an iterable of lists of numbers."
+                if checkElements:
+                    assert all(map(isinstance, i, repeat(types))), \
+                        "Argument must be an iterable of lists of numbers."
+                if self.__m:    # Since it may be the first row
+                    assert len(i) == self.__n, "Rows must be of same length."
+                self.__append_row(i)
+            assert self.__m > m, \
+                "Argument must be an iterable of lists of numbers."
+        except BaseException:
+            # Take the rows added so far back out, leaving the matrix as it
+            # was (widening the storage makes a new buffer, so the original
+            # one is still there)
+            del data[length:]
+            self.__data = data
+            self.__m, self.__n, self.__rowStride = m, n, n
+            raise
+        self.__revalidate()    # Check the matrix once, after all the rows
+
+        return
+
+    def delete_row(self, row):
+        """
+        Removes a specified row of the matrix, moving all rows below up one.
+
+        Parameters
+        ----------
+            row : integer
+                the number of the row to be removed
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        assert isinstance(row, int), "Row index must be an integer."
+        m, n = self.get_size()
+        assert row > 0 and row <= m, \
+            "Matrix must be defined at the given location."
+        assert m != 1, "Matrix must have more than one row."
+
+        self.__check_resizable()
+        del self.__data[(row-1)*n:row*n]    # Remove the elements of that row
+        self.__m -= 1
+        self.__touch()
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def delete_rows(self, rows):
+        """
+        Removes several rows of the matrix at once, moving the remaining rows
+        up, in a single pass over the elements.
+
+        Parameters
+        ----------
+            rows : iterable of integers
+                the numbers of the rows to be removed, in any order
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        m, n = self.get_size()
+        rows = _check_indices(rows, m)
+        assert len(rows) < m, "Matrix must have a row left."
+
+        keep = [i for i in range(m) if i+1 not in rows]
+        self.__rebuild(self.__gather(keep, range(n)), len(keep), n)
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def insert_rows(self, at, rows):
+        """
+        Inserts several rows into the matrix at once, moving the rows from
+        the given position on down, in a single pass over the elements.
+
+        Parameters
+        ----------
+            at : integer
+                the number the first new row takes, from 1 (before the
+                first row) to m+1 (after the last row)
+            rows : list of lists of integer/floating point numbers
+                elements of the rows to be inserted into the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure arguments are valid
+        m, n = self.get_size()
+        assert isinstance(at, int) and 0 < at <= m+1, \
+            "Matrix must be defined at the given location."
+        assert rows and isinstance(rows, list), \
+            "Argument must be a list of lists of numbers."
+        for i in rows:
+            assert isinstance(i, list) and len(i) == n, \
+                "Rows must be of same length."
+        newValues = [j for i in rows for j in i]
+        if self.__checks_elements():
+            assert all(map(isinstance, newValues,
+                           repeat(self.__element_types()))), \
+                "Argument must be a list of lists of numbers."
+
+        newValues = self.__fitted(newValues)
+        data = self.__gather(range(at-1), range(n))
+        data.extend(newValues)
+        data.extend(self.__gather(range(at-1, m), range(n)))
+        self.__rebuild(data, m + len(rows), n)
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def add_column(self, column):
+        """
+        Appends a single column to the end of the matrix.
+
+        Parameters
+        ----------
+            column : list of integer/floating point numbers
+                elements of the column to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+
+        See Also
+        --------
+            add_columns(columns) :
+                wrapper function that appends multiple columns at once by
+                calling this function repeatedly
+        """
+
+        # Ensure argument passed in is valid
+        assert column and isinstance(column, list), \
+            "Argument must be a list of numbers."
+        if self.__checks_elements():
+            for i in column:
+                assert isinstance(i, self.__element_types()), \
+                    "Argument must be a list of numbers."
+        m, n = self.get_size()
+        assert len(column) == m, "Columns must be of same length."
+
+        # Rebuild the storage with the new element at the end of each row
+        self.__check_resizable()
+        newValues = []
+        for i, row in enumerate(self.__rows()):
+            newValues.extend(row)
+            newValues.append(column[i])    # Add the new column
+        newData = _storage(newValues, _typecode(self.__data))
+        self.__check_dtype(_typecode(newData))
+        self.__data = newData
+        self.__m = len(column)    # Update number of rows
+        self.__n += 1    # Update number of columns
+        self.__rowStride = self.__n
+        self.__touch()
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def add_columns(self, columns):
+        """
+        Appends multiple columns to the end of the matrix.
+
+        Parameters
+        ----------
+            columns : list of lists of integer/floating point numbers
+                elements of the columnss to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+
+        See Also
+        --------
+            add_column(column) :
+                adds a single column
+            insert_columns(at, columns) :
+                inserts columns anywhere, which this calls to add them all
+                in one pass
+        """
+
+        # Ensure argument is valid (insert_columns checks the elements)
+        assert columns and isinstance(columns, list), \
+            "Argument must be a list of lists of numbers."
+        for i in columns:
+            assert i and isinstance(i, list), \
+                "Argument must be a list of lists of numbers."
+
+        self.insert_columns(self.__n + 1, columns)
+
+        return
+
+    def insert_columns(self, at, columns):
+        """
+        Inserts several columns into the matrix at once, moving the columns
+        from the given position on to the right, in a single pass over the
+        elements.
+
+        Parameters
+        ----------
+            at : integer
+                the number the first new column takes, from 1 (before the
+                first column) to n+1 (after the last column)
+            columns : list of lists of integer/floating point numbers
+                elements of the columns to be inserted into the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure arguments are valid
+        m, n = self.get_size()
+        assert isinstance(at, int) and 0 < at <= n+1, \
+            "Matrix must be defined at the given location."
+        assert columns and isinstance(columns, list), \
+            "Argument must be a list of lists of numbers."
+        for i in columns:
+            assert isinstance(i, list) and len(i) == m, \
+                "Columns must be of same length."
+        # Gather the new elements of each row, row by row
+        newValues = [j for i in zip(*columns) for j in i]
+        if self.__checks_elements():
+            assert all(map(isinstance, newValues,
+                           repeat(self.__element_types()))), \
+                "Argument must be a list of lists of numbers."
+
+        newValues = self.__fitted(newValues)
+        k = len(columns)
+        data = _storage([], _typecode(self.__data))
+        for i in range(m):
+            row = self.__row(i)
+            data.extend(row[:at-1])
+            data.extend(newValues[i*k:(i+1)*k])
+            data.extend(row[at-1:])
+        self.__rebuild(data, m, n + k)
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def delete_column(self, column):
+        """
+        Removes a specified column of the matrix, moving all columns to the
+        right to the left by one.
+
+        Parameters
+        ----------
+            column : integer
+                the number of the column to be removed
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        assert isinstance(column, int), "Column index must be an integer."
+        m, n = self.get_size()
+        assert column > 0 and column <= n, \
+            "Matrix must be defined at the given location."
+        assert n != 1, "Matrix must have more than one column."
+
+        self.__check_resizable()
+        del self.__data[column-1::n]    # Every n-th element from the column
+        self.__n -= 1
+        self.__rowStride = self.__n
+        self.__touch()
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def delete_columns(self, columns):
+        """
+        Removes several columns of the matrix at once, moving the remaining
+        columns left, in a single pass over the elements.
+
+        Parameters
+        ----------
+            columns : iterable of integers
+                the numbers of the columns to be removed, in any order
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        m, n = self.get_size()
+        columns = _check_indices(columns, n)
+        assert len(columns) < n, "Matrix must have a column left."
+
+        keep = [j for j in range(n) if j+1 not in columns]
+        self.__rebuild(self.__gather(range(m), keep), m, len(keep))
+        self.__revalidate()    # Double check that matrix is still valid
+
+        return
+
+    def select(self, rows=None, columns=None):
+        """
+        Produces the matrix made of the given rows and columns of the matrix,
+        in the given order, in a single pass over the elements. Rows and
+        columns can be repeated, so this gathers, reorders and permutes.
+
+        Parameters
+        ----------
+            rows : list of integers/None
+                the numbers of the rows to take, or None for all of them
+            columns : list of integers/None
+                the numbers of the columns to take, or None for all of them
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the selected elements
+        """
+
+        # Ensure arguments are valid
+        m, n = self.get_size()
+        rows = range(1, m+1) if rows is None else list(rows)
+        columns = range(1, n+1) if columns is None else list(columns)
+        for i, length in ((rows, m), (columns, n)):
+            assert i, "Matrix must not be empty."
+            for j in i:
+                assert isinstance(j, int) and 0 < j <= length, \
+                    "Matrix must be defined at the given location."
+
+        data = self.__gather([i-1 for i in rows], [j-1 for j in columns])
+        # Wrap the result directly, since it is valid by construction
+        newMatrix = Matrix.__from_storage(data, len(rows), len(columns))
+        newMatrix.__dtype = self.__dtype
+
+        return(newMatrix)
+
+    def scalar_add(self, number):
+        """
+        Adds a scalar number to each element of the matrix.
+
+        Parameters
+        ----------
+            number : integer/floating point number
+                the scalar number to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        if self.__checks_elements():
+            assert isinstance(number, int) or isinstance(number, float), \
+                "Argument must be a number."
+
+        if self.__numpy_scalar(number, number):
+            arr = self.__numpy_array()
+            arr += number    # Increase each value by number, in place
+            self.__touch()
+        else:
+            # Increase each value by number
+            self.__overwrite([i + number for i in self.__flat()])
+        self.__revalidate()
+
+        return
+
+    def scalar_multiply(self, number):
+        """
+        Multiplies each element of the matrix by some scalar number.
+
+        Parameters
+        ----------
+            number : integer/floating point number
+                the scalar number for the matrix to be mutiplied by
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        if self.__checks_elements():
+            assert isinstance(number, int) or isinstance(number, float), \
+                "Argument must be a number."
+
+        if self.__numpy_scalar(None, number):
+            arr = self.__numpy_array()
+            arr *= number    # Multiply each value by number, in place
+            self.__touch()
+        else:
+            # Multiply each value by number
+            self.__overwrite([i*number for i in self.__flat()])
+        self.__revalidate()
+
+        return
+
+    def matrix_add(self, otherMatrix, out=None):
+        """
+        Produces the resultant matrix from adding two matrices together.
+        Adding a SparseMatrix gives a sparse or dense result depending on its
+        density (see SparseMatrix).
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/SparseMatrix
+                the other matrix to be added to the active matrix
+            out : object of class Matrix/None
+                a matrix of the same size to write the result into, instead
+                of a new matrix; it may be one of the operands
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the addition of the other matrices
+                (out, if given)
+        """
+
+        # Addition commutes, so sparse matrices add themselves to this one
+        if isinstance(otherMatrix, SparseMatrix):
+            newMatrix = otherMatrix.matrix_add(self)
+            if out is not None:
+                self.__check_output(out, *newMatrix.get_size())
+                out[:, :] = _as_dense(newMatrix)
+                return(out)
+            return(newMatrix)
+
+        # Ensure argument is valid
+        assert isinstance(otherMatrix, Matrix), \
+            "Argument must be a matrix."
+        m1, n1 = self.get_size()
+        m2, n2 = otherMatrix.get_size()
+        assert m1 == m2 and n1 == n2, "Matrices must be the same size."
+
+        if out is not None:
+            self.__add_into(otherMatrix, 1, out)
+            return(out)
+
+        dtype = _result_dtype(self.__dtype, otherMatrix.__dtype)
+        typecode = _result_typecode(self.__data, otherMatrix.__data) \
+            if dtype is None else DTYPES[dtype]
+        if self.__numpy_binary(otherMatrix, m1*n1, 0):
+            newMatrix = self.__numpy_result(
+                self.__numpy_array() + otherMatrix.__numpy_array(), typecode)
+            newMatrix.__as_dtype(dtype)
+            return(newMatrix)
+
+        # New element value is sum of the value of the elements in the same
+        # location in each input matrix, worked out a whole row at a time
+        newValues = []
+        for i, j in zip(self.__rows(), otherMatrix.__rows()):
+            newValues.extend(map(add, i, j))
+        # Wrap the result directly, since it is valid by construction
+        newData = _storage(newValues, typecode)
+        newMatrix = Matrix.__from_storage(newData, m1, n1)
+        newMatrix.__as_dtype(dtype)
+
+        return(newMatrix)
+
+    def add_scaled(self, otherMatrix, alpha):
+        """
+        Adds a multiple of another matrix of the same size to the matrix, in
+        place (the "axpy" operation A = A + alpha*B), without making a new
+        matrix.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the matrix to be scaled and added to the active matrix
+            alpha : integer/floating point number
+                the number to multiply the other matrix by
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure arguments are valid
+        assert isinstance(otherMatrix, Matrix), "Argument must be a matrix."
+        assert isinstance(alpha, int) or isinstance(alpha, float), \
+            "Argument must be a number."
+        assert self.get_size() == otherMatrix.get_size(), \
+            "Matrices must be the same size."
+
+        self.__add_into(otherMatrix, alpha, self)
+
+        return
+
+    def subtract(self, other):
+        """
+        Produces the resultant matrix from subtracting a matrix or a number
+        from the matrix, elementwise. Matrices with a single row or column
+        are broadcast (see Matrix).
+
+        Parameters
+        ----------
+            other : object of class Matrix/number
+                the matrix or number to be subtracted from the active matrix
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the subtraction
+        """
+
+        newMatrix = self.__binary(sub, other, 0)
+
+        return(newMatrix)
+
+    def multiply(self, other):
+        """
+        Produces the resultant matrix from multiplying the matrix by a matrix
+        or a number, elementwise (the Hadamard product, rather than the
+        matrix product of matrix_multiply()). Matrices with a single row or
+        column are broadcast (see Matrix).
+
+        Parameters
+        ----------
+            other : object of class Matrix/number
+                the matrix or number to multiply the active matrix by
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the multiplication
+        """
+
+        newMatrix = self.__binary(mul, other, 1)
+
+        return(newMatrix)
+
+    def divide(self, other):
+        """
+        Produces the resultant matrix from dividing the matrix by a matrix or
+        a number, elementwise. Division is true division, so a matrix of
+        the "int64" dtype gives one of the "float64" dtype. Matrices with a
+        single row or column are broadcast (see Matrix).
+
+        Parameters
+        ----------
+            other : object of class Matrix/number
+                the matrix or number to divide the active matrix by, with no
+                zero elements
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the division
+        """
+
+        newMatrix = self.__binary(truediv, other, None)
+
+        return(newMatrix)
+
+    def power(self, other):
+        """
+        Produces the resultant matrix from raising each element of the matrix
+        to the power of the matching element of another matrix, or to the
+        power of a number. Matrices with a single row or column are
+        broadcast (see Matrix).
+
+        Parameters
+        ----------
+            other : object of class Matrix/number
+                the matrix or number of the exponents
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix of powers
+        """
+
+        newMatrix = self.__binary(pow, other, None, checked=True)
+
+        return(newMatrix)
+
+    def compare(self, other, relation):
+        """
+        Compares the matrix with a matrix or a number, elementwise, giving a
+        compact matrix of integers which is 1 where the relation holds and 0
+        elsewhere (of the "int64" dtype, if the operands have dtypes).
+        Matrices with a single row or column are broadcast (see Matrix).
+
+        Parameters
+        ----------
+            other : object of class Matrix/number
+                the matrix or number to compare the active matrix with
+            relation : string
+                one of RELATIONS, such as "<" or "=="
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the results of the comparisons
+        """
+
+        # Ensure argument is valid
+        assert relation in RELATIONS, \
+            "Relation must be one of {}.".format(tuple(RELATIONS))
+
+        newMatrix = self.__binary(RELATIONS[relation], other, 0, 'q')
+
+        return(newMatrix)
+
+    def apply(self, function, *others):
+        """
+        Applies a function elementwise to the matrix and any other operands,
+        giving a new matrix. The function is called with an element of the
+        matrix and the matching element of each other operand, so several
+        elementwise steps can be fused into one pass over the elements, as
+        in A.apply(lambda x, mean, scale: (x - mean)/scale, means, scales),
+        instead of making a new matrix for each step. Matrices with a single
+        row or column, and numbers, are broadcast (see Matrix).
+
+        Parameters
+        ----------
+            function : function
+                the function to apply, taking a number from each operand and
+                giving a number
+            others : objects of class Matrix/numbers
+                the other operands, if any
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the results of the function
+        """
+
+        # Ensure argument is valid
+        assert callable(function), "Function must be callable."
+
+        newMatrix = self.__broadcast(function, others, checked=True)
+
+        return(newMatrix)
+
+    @classmethod
+    def linear_combination(cls, coefficients, matrices, out=None):
+        """
+        Produces the matrix (c1*A1 + c2*A2 + ... + ck*Ak) from a list of
+        numbers ci and a list of matrices Ai of the same size, in a single
+        pass over the elements instead of through an intermediate matrix for
+        every addition and scaling.
+
+        Parameters
+        ----------
+            coefficients : list of integer/floating point numbers
+                the number to multiply each matrix by
+            matrices : list of objects of class Matrix
+                the matrices to be combined
+            out : object of class Matrix/None
+                a matrix of the same size to write the result into, instead
+                of a new matrix; it may be one of the matrices
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the linear combination (out, if
+                given)
+        """
+
+        # Ensure arguments are valid
+        coefficients, matrices = list(coefficients), list(matrices)
+        assert len(coefficients) == len(matrices) and matrices, \
+            "Arguments must be lists of the same, nonzero, length."
+        for i in coefficients:
+            assert isinstance(i, int) or isinstance(i, float), \
+                "Coefficients must be numbers."
+        for i in matrices:
+            assert isinstance(i, Matrix), \
+                "Argument must be a list of matrices."
+        m, n = matrices[0].get_size()
+        for i in matrices:
+            assert i.get_size() == (m, n), "Matrices must be the same size."
+
+        # The promoted dtype of the matrices, which for "int64" matrices
+        # with a floating point coefficient is "float64"
+        dtype = matrices[0].__dtype
+        for i in matrices[1:]:
+            dtype = _result_dtype(dtype, i.__dtype)
+        if dtype == "int64" and \
+                any(isinstance(i, float) for i in coefficients):
+            dtype = "float64"
+
+        # Compact only if every matrix is, and doubles unless everything is
+        # an integer (integer results too large fall back when stored)
+        typecodes = [_typecode(i.__data) for i in matrices]
+        if None in typecodes:
+            typecode = None
+        elif set(typecodes) != {'q'} or \
+                any(isinstance(i, float) for i in coefficients):
+            typecode = 'd'
+        else:
+            typecode = 'q'
+
+        if out is not None:
+            matrices[0].__check_output(out, m, n)
+        if typecode == 'd' and _uses_numpy(m*n*len(matrices)):
+            arr = sum(c*A.__numpy_array() for c, A in zip(coefficients,
+                                                           matrices))
+            if out is not None and _typecode(out.__data) == 'd':
+                numpy.copyto(out.__numpy_array(), arr)
+                out.__touch()
+                return(out)
+            newMatrix = matrices[0].__numpy_result(arr, typecode)
+            if out is not None:
+                out.__overwrite(newMatrix.__data)
+                return(out)
+            newMatrix.__as_dtype(dtype)
+            return(newMatrix)
+
+        # Work out each row of the result from the same row of every matrix
+        # at once, with a function made for these particular coefficients
+        kernel = _linear_kernel(coefficients)
+        if out is not None:
+            # Rows can be written as they are worked out, unless the output
+            # shares storage with a matrix laid out differently from it
+            rows = zip(*(i.__rows() for i in matrices))
+            if any(out.__overlaps(i) for i in matrices):
+                rows = list(rows)
+            for i, row in enumerate(rows):
+                out.__write_row(i, list(map(kernel, *row)))
+            return(out)
+        newValues = []
+        for rows in zip(*(i.__rows() for i in matrices)):
+            newValues.extend(map(kernel, *rows))
+        # Wrap the result directly, since it is valid by construction
+        newMatrix = Matrix.__from_storage(_storage(newValues, typecode), m, n)
+        newMatrix.__as_dtype(dtype)
+
+        return(newMatrix)
+
+    def matrix_multiply(self, otherMatrix, workers=None, out=None):
+        """
+        Produces the resultant matrix from multiplying two matrices together.
+        To be clear, this method outputs the result of (self * otherMatrix),
+        not (otherMatrix * self).
+
+        The product is computed in tiles of MULTIPLY_BLOCK_SIZE rows and
+        columns, and by Strassen-Winograd recursion once every dimension is
+        larger than STRASSEN_THRESHOLD. Both are module-level settings.
+        Multiplying by a SparseMatrix gives a sparse or dense result
+        depending on its density (see SparseMatrix).
+
+        With several workers, the rows of the result are split into blocks
+        worked out by separate processes, which read the operands from and
+        write the result to shared memory. This is only done for products
+        of at least PARALLEL_THRESHOLD multiplications, of matrices holding
+        only integers (which cannot overflow 64 bits) or only floating point
+        numbers; NumPy, when it is used, already runs in parallel.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/SparseMatrix
+                the other matrix to be multiplied with the active matrix
+            workers : integer/None
+                the number of processes to share the work between (by
+                default, the work is done in this process)
+            out : object of class Matrix/None
+                a matrix of the size of the product to write it into,
+                instead of a new matrix; it may be one of the operands
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the multiplication of the other
+                matrices (out, if given)
+        """
+
+        if out is not None:
+            m1, n1 = self.get_size()
+            m2, n2 = otherMatrix.get_size()
+            assert n1 == m2, "Matrices must be of compatible size."
+            self.__check_output(out, m1, n2)
+            if isinstance(otherMatrix, Matrix) and \
+                    self.__numpy_into(otherMatrix, out, m1*n1*n2, n1):
+                # NumPy copies any operand that overlaps the output first
+                numpy.matmul(self.__numpy_array(),
+                             otherMatrix.__numpy_array(),
+                             out=out.__numpy_array())
+                out.__touch()
+                return(out)
+            if isinstance(otherMatrix, Matrix) and \
+                    (workers is None or workers == 1):
+                # Pack the columns of the other matrix once, and write each
+                # row of the product as soon as it is worked out (from a
+                # copy of the rows of this matrix, if the output shares its
+                # storage laid out differently)
+                columns = [_as_list(otherMatrix.__column(j))
+                           for j in range(n2)]
+                rows = self.__rows()
+                if out.__overlaps(self):
+                    rows = [_as_list(i) for i in rows]
+                for i, row in enumerate(rows):
+                    row = _as_list(row)
+                    out.__write_row(i, [sum(map(mul, row, j))
+                                        for j in columns])
+                return(out)
+            # The product is worked out in full before being written, since
+            # every element of it depends on a whole row and column
+            newMatrix = _as_dense(self.matrix_multiply(otherMatrix, workers))
+            out.__overwrite(newMatrix.__flat())
+            return(out)
+
+        # A sparse matrix only multiplies from the left, using its nonzeros,
+        # so work out the transpose of the product as (B^T * A^T)
+        if isinstance(otherMatrix, SparseMatrix):
+            assert self.get_size()[1] == otherMatrix.get_size()[0], \
+                "Matrices must be of compatible size."
+            newMatrix = otherMatrix.transpose().matrix_multiply(
+                self.transpose()).transpose()
+            return(newMatrix)
+
+        # Ensure argument is valid
+        assert isinstance(otherMatrix, Matrix), \
+            "Argument must be a matrix."
+        m1, n1 = self.get_size()
+        m2, n2 = otherMatrix.get_size()
+        assert n1 == m2, "Matrices must be of compatible size."
+        assert workers is None or (isinstance(workers, int) and
+                                   workers > 0), \
+            "Number of workers must be a positive integer."
+
+        dtype = _result_dtype(self.__dtype, otherMatrix.__dtype)
+        typecode = _result_typecode(self.__data, otherMatrix.__data) \
+            if dtype is None else DTYPES[dtype]
+        if self.__numpy_binary(otherMatrix, m1*n1*n2, n1):
+            newMatrix = self.__numpy_result(
+                self.__numpy_array() @ otherMatrix.__numpy_array(), typecode)
+            newMatrix.__as_dtype(dtype)
+            return(newMatrix)
+
+        if workers is not None and workers > 1 and m1 > 1 and \
+                m1*n1*n2 >= PARALLEL_THRESHOLD:
+            newMatrix = self.__parallel_multiply(otherMatrix, workers)
+            if newMatrix is not None:    # Otherwise work serially
+                newMatrix.__as_dtype(dtype)
+                return(newMatrix)
+
+        # Unpack the rows of this matrix and pack the columns of the other
+        # matrix once, so that every element of the result is the dot product
+        # of two contiguous lists
+        rows = [_as_list(i) for i in self.__rows()]
+        columns = [_as_list(otherMatrix.__column(j)) for j in range(n2)]
+        if min(m1, n1, n2) > STRASSEN_THRESHOLD:
+            newValues = _strassen_multiply(rows, columns)
+        else:
+            newValues = _blocked_multiply(rows, columns)
+        # Wrap the result directly, since it is valid by construction
+        newData = _storage(newValues, typecode)
+        newMatrix = Matrix.__from_storage(newData, m1, n2)
+        newMatrix.__as_dtype(dtype)
+
+        return(newMatrix)
+
+    @classmethod
+    def chain_order(cls, *matrices):
+        """
+        Finds the cheapest order in which to multiply a sequence of matrices
+        together, by the classic dynamic program over their sizes (taking
+        O(k^3) steps for k matrices). Nothing is multiplied.
+
+        Parameters
+        ----------
+            matrices : objects of class Matrix/MatrixExpression
+                the matrices to be multiplied, from left to right
+
+        Returns
+        -------
+            plan : integer/nested tuples of integers
+                the order of the products, as the 1-based positions of the
+                matrices grouped into pairs, such as ((1, 2), 3) for
+                (A1 * A2) * A3
+            flops : integer
+                the number of floating point operations the plan takes,
+                counting a multiplication and an addition for each term of
+                each dot product (2*m*n*p for an m x n by n x p product)
+        """
+
+        # Ensure arguments are valid
+        assert matrices, "Argument must be at least one matrix."
+        sizes = []
+        for i in matrices:
+            assert isinstance(i, Matrix) or isinstance(i, MatrixExpression), \
+                "Arguments must be matrices."
+            sizes.append(i.get_size())
+        for i in range(len(sizes) - 1):
+            assert sizes[i][1] == sizes[i+1][0], \
+                "Matrices must be of compatible size."
+
+        # Matrix i is dimensions[i] x dimensions[i+1]; cost[i][j] is the
+        # fewest scalar multiplications for the product of matrices i to j,
+        # found by trying every last split, shortest subchains first
+        k = len(sizes)
+        dimensions = [i[0] for i in sizes] + [sizes[-1][1]]
+        cost = [[0]*k for i in range(k)]
+        split = [[0]*k for i in range(k)]
+        for length in range(1, k):
+            for i in range(k - length):
+                j = i + length
+                cost[i][j], split[i][j] = min(
+                    (cost[i][s] + cost[s+1][j] +
+                     dimensions[i]*dimensions[s+1]*dimensions[j+1], s)
+                    for s in range(i, j))
+        plan = _chain_plan(split, 0, k-1)
+        flops = 2*cost[0][k-1]
+
+        return(plan, flops)
+
+    @classmethod
+    def chain_multiply(cls, *matrices, out=None):
+        """
+        Produces the resultant matrix from multiplying a sequence of matrices
+        together, from left to right, in the cheapest order (see
+        chain_order()). For matrices of very different shapes, this can take
+        orders of magnitude fewer operations than multiplying in turn.
+
+        Parameters
+        ----------
+            matrices : objects of class Matrix/MatrixExpression
+                the matrices to be multiplied, from left to right
+            out : object of class Matrix/None
+                a matrix of the size of the product to write it into,
+                instead of a new matrix
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix from the multiplication of the matrices
+                (out, if given)
+        """
+
+        plan, flops = cls.chain_order(*matrices)
+        matrices = [i.evaluate() if isinstance(i, MatrixExpression) else i
+                    for i in matrices]
+        if len(matrices) == 1:    # Copy rather than give the operand
+            return(Matrix.linear_combination([1], matrices, out))
+        newMatrix = _chain_product(plan, matrices, out)
+
+        return(newMatrix)
+
+    def transpose(self, out=None):
+        """
+        Produces the a matrix equivalent to the transpose of the existing
+        matrix.
+
+        Parameters
+        ----------
+            out : object of class Matrix/None
+                an n x m matrix to write the transpose into, instead of a
+                new matrix; it may be the matrix itself, if square
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the transpose of the original matrix (out, if given)
+        """
+
+        m, n = self.get_size()
+        if out is not None:
+            self.__check_output(out, n, m)
+            if _uses_numpy(m*n) and self.is_compact() and \
+                    _typecode(out.__data) in ('d', _typecode(self.__data)):
+                # NumPy copies the matrix first if it overlaps the output
+                numpy.copyto(out.__numpy_array(), self.__numpy_array().T)
+                out.__touch()
+                return(out)
+            columns = (self.__column(j) for j in range(n))
+            if out.__data is self.__data:    # Read before overwriting
+                columns = list(columns)
+            for j, column in enumerate(columns):
+                out.__write_row(j, column)
+            return(out)
+
+        # Give a copy of the cached transpose, which is cheaper to make than
+        # the transpose itself, so that changes to it do not reach the cache
+        newMatrix = self.__cached("transpose", self.__transpose).copy()
+
+        return(newMatrix)
+
+    def __transpose(self):
+        """
+        Works out the transpose of the matrix as a new matrix, for
+        transpose().
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the transpose of the matrix
+        """
+
+        m, n = self.get_size()
+        if _uses_numpy(m*n) and self.is_compact():
+            newMatrix = self.__numpy_result(self.__numpy_array().T,
+                                            _typecode(self.__data))
+            newMatrix.__dtype = self.__dtype
+            return(newMatrix)
+
+        # Each column of the existing matrix becomes a row of the new matrix
+        newValues = []
+        for j in range(n):
+            newValues.extend(self.__column(j))
+        # Wrap the result directly, since it is valid by construction
+        newData = _storage(newValues, _typecode(self.__data))
+        newMatrix = Matrix.__from_storage(newData, n, m)
+        newMatrix.__dtype = self.__dtype
+
+        return(newMatrix)
+
+    def tiled_multiply(self, otherMatrix, path, memory=None):
+        """
+        Multiplies two matrices out of core, writing the result to a new
+        file (see open_mmap()) rather than holding it in memory. Square tiles
+        of both matrices are read in turn, multiplied and added up into a
+        tile of the result, which is then written out, so only three tiles
+        are ever in memory. With matrices opened by open_mmap(), this works
+        for products much larger than memory.
+
+        The tiles are made as large as the memory budget allows, counting 8
+        bytes for each element when NumPy does the work (for doubles) and
+        32 bytes for each element as a Python number otherwise. Larger tiles
+        read the operands fewer times: the left matrix is read once for
+        every column of tiles of the result, and the right matrix once for
+        every row of tiles. The result is written as 64-bit integers when
+        both matrices hold integers and no element of the product can
+        overflow 64 bits (checked with a pass over each matrix first), and
+        as doubles otherwise.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the other matrix to be multiplied with the active matrix
+            path : string
+                the path of the file for the result
+            memory : integer/None
+                the memory budget for the tiles, in bytes (by default,
+                OUT_OF_CORE_MEMORY)
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the resultant matrix, mapped from the new file
+            report : dictionary
+                the amount of I/O done: "tile_size" (the side length of the
+                tiles), "tiles_read", "bytes_read" and "bytes_written"
+                (counting 8 bytes for each element moved)
+        """
+
+        # Ensure arguments are valid
+        assert isinstance(otherMatrix, Matrix), \
+            "Argument must be a matrix."
+        m, n = self.get_size()
+        n2, p = otherMatrix.get_size()
+        assert n == n2, "Matrices must be of compatible size."
+
+        typecode = 'd'
+        if self.__file_typecode() == 'q' and \
+                otherMatrix.__file_typecode() == 'q':
+            bound1 = self.__shared_typecode()[1]
+            bound2 = otherMatrix.__shared_typecode()[1]
+            if bound1*bound2*n <= INT64_MAX:    # The result fits in 64 bits
+                typecode = 'q'
+        useNumpy = typecode == 'd' and numpy is not None and USE_NUMPY
+        size = _tile_size(memory, 3, 8 if useNumpy else 32)
+        newMatrix = Matrix.open_mmap(path, "w+", m, p, typecode)
+        report = {"tile_size": size, "tiles_read": 0, "bytes_read": 0,
+                  "bytes_written": 8*m*p}
+
+        for iStart in range(0, m, size):
+            iStop = min(iStart + size, m)
+            for jStart in range(0, p, size):
+                jStop = min(jStart + size, p)
+                # Add up the products of the tiles along the row of tiles of
+                # this matrix and the column of tiles of the other matrix
+                result = None
+                for kStart in range(0, n, size):
+                    kStop = min(kStart + size, n)
+                    tile1 = self.__tile(iStart, iStop, kStart, kStop,
+                                        useNumpy)
+                    tile2 = otherMatrix.__tile(kStart, kStop, jStart, jStop,
+                                               useNumpy)
+                    report["tiles_read"] += 2
+                    report["bytes_read"] += 8*(kStop - kStart)*(
+                        iStop - iStart + jStop - jStart)
+                    if useNumpy:    # In doubles, even for integer tiles
+                        product = numpy.matmul(tile1, tile2,
+                                               dtype=numpy.float64)
+                    else:
+                        product = _blocked_multiply(tile1,
+                                                    list(zip(*tile2)))
+                    if result is None:
+                        result = product
+                    elif useNumpy:
+                        result += product
+                    else:
+                        result = list(map(add, result, product))
+                newMatrix.__write_tile(iStart, iStop, jStart, jStop, result,
+                                        useNumpy)
+        newMatrix.flush()
+
+        return(newMatrix, report)
+
+    def tiled_transpose(self, path, memory=None):
+        """
+        Transposes the matrix out of core, writing the result to a new file
+        (see open_mmap()) rather than holding it in memory. Square tiles of
+        the matrix are read, transposed and written out in turn, so only a
+        tile or two is ever in memory. With matrices opened by open_mmap(),
+        this works for matrices much larger than memory.
+
+        The tiles are made as large as the memory budget allows, counting 8
+        bytes for each element when NumPy does the work and 32 bytes for
+        each element as a Python number otherwise. The matrix is read and
+        the result written once whatever the tile size, but larger tiles
+        read and write longer runs of consecutive elements.
+
+        Parameters
+        ----------
+            path : string
+                the path of the file for the result
+            memory : integer/None
+                the memory budget for the tiles, in bytes (by default,
+                OUT_OF_CORE_MEMORY)
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the transpose, mapped from the new file
+            report : dictionary
+                the amount of I/O done: "tile_size" (the side length of the
+                tiles), "tiles_read", "bytes_read" and "bytes_written"
+                (counting 8 bytes for each element moved)
+        """
+
+        m, n = self.get_size()
+        typecode = self.__file_typecode()
+        useNumpy = numpy is not None and USE_NUMPY
+        size = _tile_size(memory, 2, 8 if useNumpy else 32)
+        newMatrix = Matrix.open_mmap(path, "w+", n, m, typecode)
+        report = {"tile_size": size, "tiles_read": 0, "bytes_read": 8*m*n,
+                  "bytes_written": 8*m*n}
+
+        # Fill the result a row of tiles at a time, from top to bottom
+        for jStart in range(0, n, size):
+            jStop = min(jStart + size, n)
+            for iStart in range(0, m, size):
+                iStop = min(iStart + size, m)
+                tile = self.__tile(iStart, iStop, jStart, jStop, useNumpy)
+                report["tiles_read"] += 1
+                if useNumpy:
+                    result = tile.T
+                else:
+                    result = [k for j in zip(*tile) for k in j]
+                newMatrix.__write_tile(jStart, jStop, iStart, iStop, result,
+                                        useNumpy)
+        newMatrix.flush()
+
+        return(newMatrix, report)
+
+    def determinant(self):
+        """
+        Computes the determinant of a square matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            value : integer/floating point number
+                the scalar number representing the value of the determinant
+        """
+
+        # Ensure matrix is valid for determinant operation
+        m, n = self.get_size()
+        assert m == n, "Matrix must be square."
+
+        value = self.__cached("determinant", self.__determinant)
+
+        return(value)
+
+    def __determinant(self):
+        """
+        Works out the determinant of the matrix, for determinant().
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            value : integer/floating point number
+                the value of the determinant
+        """
+
+        # NumPy cannot give exact determinants of integers, so those are
+        # always worked out here
+        m = self.__m
+        if _uses_numpy(m**3) and self.__numpy_kind() in ("d", "f", "float"):
+            value = float(numpy.linalg.det(self.__numpy_array()))
+            return(value)
+
+        # Work on a scratch copy of the rows, since elimination is destructive
+        rows = [list(i) for i in self.__rows()]
+        if all(isinstance(j, int) for i in rows for j in i):
+            value = _bareiss_determinant(rows)    # Exact for integer input
+        else:
+            value = _lu_determinant(rows)
+
+        return(value)
+
+    def lu(self):
+        """
+        Factorizes a square matrix as P A = L U, with partial pivoting, for
+        solving systems of linear equations with it (see LUFactorization).
+        The factorization takes O(n^3) operations, and is kept until the
+        matrix next changes, so that each later solve takes O(n^2).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            factorization : object of class LUFactorization
+                the factors of the matrix
+        """
+
+        # Ensure matrix is valid for factorization
+        m, n = self.get_size()
+        assert m == n, "Matrix must be square."
+
+        factorization = self.__cached("lu", self.__lu)
+
+        return(factorization)
+
+    def __lu(self):
+        """
+        Works out the LU factorization of the matrix, for lu().
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            factorization : object of class LUFactorization
+                the factors of the matrix
+        """
+
+        dtype = self.__dtype
+        if dtype == "int64":    # Solutions are not integers
+            dtype = "float64"
+        if dtype == "object":    # Exact, with rationals as fractions
+            rows = [[Fraction(j) if isinstance(j, numbers.Rational) else j
+                     for j in i] for i in self.__rows()]
+            permutation, sign = _lu_factor(rows)
+        elif _uses_numpy(self.__m**3):
+            arr = numpy.array(self.__numpy_array(), dtype=float)    # Copy
+            permutation, sign = _numpy_lu_factor(arr)
+            rows = arr.tolist()
+        else:
+            rows = [[float(j) for j in i] for i in self.__rows()]
+            permutation, sign = _lu_factor(rows)
+        # Integer matrices keep a copy of their elements for an exact
+        # determinant
+        integers = None
+        typecode = _typecode(self.__data)
+        if typecode == 'q' or (typecode is None and dtype != "object" and
+                               all(isinstance(j, int)
+                                   for i in self.__rows() for j in i)):
+            integers = [_as_list(i) for i in self.__rows()]
+        factorization = LUFactorization(rows, permutation, sign,
+                                        compact=self.is_compact(),
+                                        dtype=dtype, integers=integers)
+
+        return(factorization)
+
+    def solve(self, b):
+        """
+        Solves the system of linear equations A x = b, through the LU
+        factorization of the matrix (see lu()), which is reused by later
+        solves until the matrix changes.
+
+        Parameters
+        ----------
+            b : list of integer/floating point numbers, or object of class
+                Matrix
+                the right-hand side, with one number for each row of the
+                matrix, or a matrix of right-hand sides, one in each column
+
+        Returns
+        -------
+            x : list of floating point numbers, or object of class Matrix
+                the solution, of the same kind as the right-hand side
+        """
+
+        x = self.lu().solve(b)
+
+        return(x)
+
+    def inverse(self):
+        """
+        Gives the inverse of a nonsingular square matrix, through its LU
+        factorization (see lu()).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            inverseMatrix : object of class Matrix
+                the inverse of the matrix
+        """
+
+        inverseMatrix = self.lu().inverse()
+
+        return(inverseMatrix)
+
+    def sum(self, axis=None, compensated=False):
+        """
+        Adds up the elements of the matrix: all of them, or those of each
+        column or of each row. Column sums are worked out a row at a time,
+        in the order the elements are stored. Compensated summation keeps
+        the rounding errors of floating point sums from building up: sums
+        of all the elements or of rows are correctly rounded (math.fsum()),
+        and column sums use Neumaier's algorithm. Sums which overflow, or
+        add infinities of opposite signs, are worked out plainly instead, to
+        give infinity or NaN as plain sums do.
+
+        Parameters
+        ----------
+            axis : integer/None
+                None to add up every element, 0 to add up each column, or 1
+                to add up each row
+            compensated : boolean
+                whether to compensate for rounding errors
+
+        Returns
+        -------
+            total : number/object of class Matrix
+                the sum of every element, or a 1 x n matrix of the sums of
+                the columns (axis 0), or an m x 1 matrix of the sums of the
+                rows (axis 1)
+        """
+
+        # Ensure argument is valid
+        _check_axis(axis)
+
+        m, n = self.get_size()
+        floating = compensated and self.__floating()
+        if not compensated and self.__numpy_reducible():
+            total = self.__numpy_array().sum(axis=axis, keepdims=True)
+        elif axis is None:
+            if floating:
+                total = _fsum(chain.from_iterable(self.__rows()))
+            else:
+                total = sum(map(sum, self.__rows()))
+        elif axis == 1:
+            total = [_fsum(i) if floating else sum(i)
+                     for i in self.__rows()]
+        elif floating:
+            total = _neumaier_columns(self.__rows())
+        else:
+            total = _reduce_columns(add, self.__rows())
+        total = self.__reduced(total, axis)
+
+        return(total)
+
+    def mean(self, axis=None, compensated=False):
+        """
+        Gives the mean of the elements of the matrix: of all of them, or of
+        those of each column or of each row (see sum()).
+
+        Parameters
+        ----------
+            axis : integer/None
+                None for the mean of every element, 0 for that of each
+                column, or 1 for that of each row
+            compensated : boolean
+                whether to compensate for rounding errors in the sums
+
+        Returns
+        -------
+            mean : floating point number/object of class Matrix
+                the mean of every element, or a 1 x n matrix of the means of
+                the columns (axis 0), or an m x 1 matrix of the means of the
+                rows (axis 1)
+        """
+
+        m, n = self.get_size()
+        total = self.sum(axis, compensated)
+        if axis is None:
+            mean = total/(m*n)
+        else:
+            mean = total.divide(m if axis == 0 else n)
+
+        return(mean)
+
+    def min(self, axis=None):
+        """
+        Gives the smallest element of the matrix: of all of them, or of
+        those of each column or of each row.
+
+        Parameters
+        ----------
+            axis : integer/None
+                None for the smallest of every element, 0 for that of each
+                column, or 1 for that of each row
+
+        Returns
+        -------
+            least : number/object of class Matrix
+                the smallest element, or a 1 x n matrix of those of the
+                columns (axis 0), or an m x 1 matrix of those of the rows
+                (axis 1)
+        """
+
+        least = self.__extreme(min, axis)
+
+        return(least)
+
+    def max(self, axis=None):
+        """
+        Gives the largest element of the matrix: of all of them, or of those
+        of each column or of each row.
+
+        Parameters
+        ----------
+            axis : integer/None
+                None for the largest of every element, 0 for that of each
+                column, or 1 for that of each row
+
+        Returns
+        -------
+            greatest : number/object of class Matrix
+                the largest element, or a 1 x n matrix of those of the
+                columns (axis 0), or an m x 1 matrix of those of the rows
+                (axis 1)
+        """
+
+        greatest = self.__extreme(max, axis)
+
+        return(greatest)
+
+    def argmax(self, axis=None):
+        """
+        Gives the position of the largest element of the matrix (the first
+        one, if several are equal): of all of them, or of those of each
+        column or of each row. Positions are one-based, as in get_value().
+
+        Parameters
+        ----------
+            axis : integer/None
+                None for the largest of every element, 0 for that of each
+                column, or 1 for that of each row
+
+        Returns
+        -------
+            position : tuple of two integers/object of class Matrix
+                the row and column of the largest element, or a 1 x n matrix
+                of the rows of those of the columns (axis 0), or an m x 1
+                matrix of the columns of those of the rows (axis 1)
+        """
+
+        # Ensure argument is valid
+        _check_axis(axis)
+
+        if axis == 0:    # Keep the best of each column, a row at a time
+            rows = iter(self.__rows())
+            greatest = _as_list(next(rows))
+            position = [1]*len(greatest)
+            for i, row in enumerate(rows, 2):
+                for j, value in enumerate(row):
+                    if value > greatest[j]:
+                        greatest[j] = value
+                        position[j] = i
+        else:
+            position = [_as_list(i).index(max(i)) + 1 for i in self.__rows()]
+            if axis is None:    # Then the best of the rows' largest
+                greatest = [self.__data[self.__index(i, j-1)]
+                            for i, j in enumerate(position)]
+                row = greatest.index(max(greatest)) + 1
+                return((row, position[row-1]))
+        # Positions are integers, so are kept as compact integers
+        dtype = "int64" if self.__dtype is not None else None
+        position = Matrix.__from_storage(array('q', position),
+                                         *self.__reduced_size(axis))
+        position.__dtype = dtype
+
+        return(position)
+
+    def trace(self):
+        """
+        Gives the trace of a square matrix, the sum of the elements on its
+        diagonal.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            value : number
+                the trace of the matrix
+        """
+
+        # Ensure matrix is valid for trace operation
+        m, n = self.get_size()
+        assert m == n, "Matrix must be square."
+
+        # Step along the diagonal of the storage, from one element to the next
+        step = self.__rowStride + self.__columnStride
+        value = sum(self.__data[self.__offset + i*step] for i in range(n))
+
+        return(value)
+
+    def norm(self, ord="fro"):
+        """
+        Gives a norm of the matrix: the Frobenius norm (the square root of
+        the sum of the squares of the elements), the 1 norm (the largest sum
+        of the absolute values of a column) or the infinity norm (the
+        largest sum of the absolute values of a row). The Frobenius norm is
+        worked out as math.hypot() does, scaled by the largest element, so
+        that the squares cannot overflow, but the norm itself must fit in a
+        floating point number (so integers beyond about 10^308 give an
+        OverflowError). Norms are cached (see cache_info()).
+
+        Parameters
+        ----------
+            ord : string/integer/floating point number
+                "fro", 1 or math.inf, the norm to give
+
+        Returns
+        -------
+            value : number
+                the norm of the matrix
+        """
+
+        # Ensure argument is valid
+        assert ord in ("fro", 1, math.inf), \
+            "Order must be one of 'fro', 1 and math.inf."
+
+        value = self.__cached("norm {}".format(ord), lambda: self.__norm(ord))
+
+        return(value)
+
+    def stats(self, compensated=False):
+        """
+        Gives several statistics of the elements of the matrix, worked out
+        in a single pass over them: the number of elements, their sum, mean,
+        smallest and largest values, and the Frobenius norm of the matrix
+        (see sum() and norm() for how overflow is handled).
+
+        Parameters
+        ----------
+            compensated : boolean
+                whether to compensate for rounding errors in the sums (see
+                sum())
+
+        Returns
+        -------
+            stats : dictionary
+                the statistics, under the keys "count", "sum", "mean", "min",
+                "max" and "norm"
+        """
+
+        m, n = self.get_size()
+        floating = compensated and self.__floating()
+        if not compensated and self.__numpy_reducible():
+            arr = self.__numpy_array()
+            total, norm = arr.sum().item(), _numpy_frobenius(arr)
+            least, greatest = arr.min().item(), arr.max().item()
+        else:
+            rows = iter(self.__rows())
+            row = next(rows)
+            least, greatest = min(row), max(row)
+            sums, norms = [], []
+            for row in chain((row,), rows):
+                sums.append(_fsum(row) if floating else sum(row))
+                norms.append(math.hypot(*row))
+                least = min(least, min(row))
+                greatest = max(greatest, max(row))
+            total = _fsum(sums) if floating else sum(sums)
+            norm = math.hypot(*norms)
+        stats = {"count": m*n, "sum": total, "mean": total/(m*n),
+                 "min": least, "max": greatest, "norm": norm}
+
+        return(stats)
+
+    def __add__(self, otherMatrix):
+        """
+        Gives the lazy expression (self + otherMatrix), which is evaluated
+        like matrix_add() once its result is needed (see MatrixExpression).
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/MatrixExpression
+                the matrix to be added to the active matrix
+
+        Returns
+        -------
+            expression : object of class MatrixExpression
+                the unevaluated sum
+        """
+
+        return(MatrixExpression("matrix", (self,)) + otherMatrix)
+
+    def __sub__(self, otherMatrix):
+        """
+        Gives the lazy expression (self - otherMatrix) (see
+        MatrixExpression).
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/MatrixExpression
+                the matrix to be subtracted from the active matrix
+
+        Returns
+        -------
+            expression : object of class MatrixExpression
+                the unevaluated difference
+        """
+
+        return(MatrixExpression("matrix", (self,)) - otherMatrix)
+
+    def __mul__(self, number):
+        """
+        Gives the lazy expression (number * self), which is evaluated like
+        scalar_multiply() once its result is needed (see MatrixExpression).
+        Matrix products are written with the @ operator instead.
+
+        Parameters
+        ----------
+            number : integer/floating point number
+                the number to multiply each element of the matrix by
+
+        Returns
+        -------
+            expression : object of class MatrixExpression
+                the unevaluated product
+        """
+
+        return(MatrixExpression("matrix", (self,)) * number)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        """
+        Gives the lazy expression (-self) (see MatrixExpression).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            expression : object of class MatrixExpression
+                the unevaluated negation
+        """
+
+        return(-MatrixExpression("matrix", (self,)))
+
+    def __matmul__(self, otherMatrix):
+        """
+        Gives the lazy expression (self @ otherMatrix), which is evaluated
+        like matrix_multiply() once its result is needed (see
+        MatrixExpression).
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/MatrixExpression
+                the matrix to multiply the active matrix by, on the right
+
+        Returns
+        -------
+            expression : object of class MatrixExpression
+                the unevaluated product
+        """
+
+        return(MatrixExpression("matrix", (self,)) @ otherMatrix)
+
+    def __iadd__(self, otherMatrix):
+        """
+        Adds a matrix or expression to the matrix in place, for A += B,
+        without making a new matrix. A multiple of a matrix, as in
+        A += 2 * B, is added like add_scaled().
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/MatrixExpression
+                the matrix to be added to the active matrix
+
+        Returns
+        -------
+            self : object of class Matrix
+                the updated matrix
+        """
+
+        otherMatrix, alpha = _scaled_operand(otherMatrix)
+        if otherMatrix is None:
+            return(NotImplemented)
+        assert self.get_size() == otherMatrix.get_size(), \
+            "Matrices must be the same size."
+        self.__add_into(otherMatrix, alpha, self)
+
+        return(self)
+
+    def __isub__(self, otherMatrix):
+        """
+        Subtracts a matrix or expression from the matrix in place, for
+        A -= B, without making a new matrix.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/MatrixExpression
+                the matrix to be subtracted from the active matrix
+
+        Returns
+        -------
+            self : object of class Matrix
+                the updated matrix
+        """
+
+        otherMatrix, alpha = _scaled_operand(otherMatrix)
+        if otherMatrix is None:
+            return(NotImplemented)
+        assert self.get_size() == otherMatrix.get_size(), \
+            "Matrices must be the same size."
+        self.__add_into(otherMatrix, -alpha, self)
+
+        return(self)
+
+    def __imatmul__(self, otherMatrix):
+        """
+        Multiplies the matrix by a square matrix or expression on the right
+        in place, for A @= B, writing the product into the storage of the
+        matrix.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix/MatrixExpression
+                the matrix to multiply the active matrix by, on the right
+
+        Returns
+        -------
+            self : object of class Matrix
+                the updated matrix
+        """
+
+        if isinstance(otherMatrix, MatrixExpression):
+            otherMatrix = otherMatrix.evaluate()
+        if not isinstance(otherMatrix, Matrix):
+            return(NotImplemented)
+        self.matrix_multiply(otherMatrix, out=self)
+
+        return(self)
+
+    @property
+    def T(self):
+        """
+        Gives the lazy expression for the transpose of the matrix (see
+        MatrixExpression). Unlike transpose(), nothing is copied unless the
+        transpose itself is evaluated.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            expression : object of class MatrixExpression
+                the unevaluated transpose
+        """
+
+        return(MatrixExpression("matrix", (self,)).T)
+
+    def _version_stamp(self):
+        """
+        Gives the version of the matrix (see cache_info()), for
+        MatrixExpression to tell if a result it kept is out of date, or
+        None if changes to the matrix cannot be followed (when its storage
+        is shared with a buffer or has been handed out to NumPy).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            stamp : integer/None
+                the number of changes made to the matrix so far
+        """
+
+        if isinstance(self.__data, memoryview) or self.__version[1]:
+            return(None)
+        stamp = self.__version[0]
+
+        return(stamp)
+
+    def _transposed_view(self):
+        """
+        Gives the transpose of the matrix as a matrix sharing its storage,
+        with the roles of the row and column strides swapped. Used by
+        MatrixExpression to read transposes without forming them; the view
+        is only ever read, and never resized.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            view : object of class Matrix
+                the n x m transpose, sharing storage with the matrix
+        """
+
+        view = Matrix.__from_storage(self.__data, self.__n, self.__m,
+                                     shared=True)
+        view.__offset = self.__offset
+        view.__rowStride = self.__columnStride
+        view.__columnStride = self.__rowStride
+        view.__view = True
+        view.__version = self.__version
+        view.__dtype = self.__dtype
+
+        return(view)
+
+    @classmethod
+    def __from_storage(cls, data, m, n, shared=False):
+        """
+        Creates a matrix directly around an existing storage buffer, without
+        copying or validating it. Only for results that are valid by
+        construction.
+
+        Parameters
+        ----------
+            data : list/array of integer/floating point numbers
+                the m*n elements of the matrix in row-major order
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            shared : boolean
+                whether the buffer belongs to another matrix (for views),
+                so that profiling does not count it as newly allocated
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix wrapping the buffer
+        """
+
+        newMatrix = cls.__new__(cls)
+        newMatrix.__data = data
+        newMatrix.__m = m
+        newMatrix.__n = n
+        newMatrix.__offset = 0
+        newMatrix.__rowStride = n
+        newMatrix.__columnStride = 1
+        newMatrix.__validation = None
+        newMatrix.__view = False
+        newMatrix.__version = [0, False]
+        newMatrix.__cache = {}
+        newMatrix.__hits = 0
+        newMatrix.__misses = 0
+        # Float32 storage only comes from (and keeps) the float32 dtype
+        newMatrix.__dtype = "float32" if _typecode(data) == 'f' else None
+        if _PROFILING:    # Count the matrix towards the profiled operations
+            _count_matrix(None if shared else data)
+
+        return(newMatrix)
+
+    def __parallel_multiply(self, otherMatrix, workers):
+        """
+        Multiplies two matrices in several processes, each working out a
+        block of rows of the result. The rows of this matrix and the columns
+        of the other are packed into shared memory once, along with the
+        result, so that nothing but their names is sent to the workers.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the other matrix to be multiplied with the active matrix
+            workers : integer
+                the number of processes to share the work between
+
+        Returns
+        -------
+            newMatrix : object of class Matrix/None
+                the resultant matrix, or None if the elements of the
+                matrices cannot be shared as machine numbers
+        """
+
+        m1, n1 = self.get_size()
+        n2 = otherMatrix.get_size()[1]
+        typecode1, bound1 = self.__shared_typecode()
+        typecode2, bound2 = otherMatrix.__shared_typecode()
+        if typecode1 is None or typecode2 is None:
+            return(None)
+        if 'd' in (typecode1, typecode2):
+            typecode = 'd'
+        elif bound1*bound2*n1 <= INT64_MAX:
+            typecode = 'q'
+        else:    # The result might overflow 64 bits
+            return(None)
+
+        # Pack the rows of the left operand, the columns of the right
+        # operand, and room for the result
+        blocks = []
+        try:
+            for typecode0, parts, size in (
+                    (typecode1, self.__rows(), m1*n1),
+                    (typecode2, (otherMatrix.__column(j) for j in range(n2)),
+                     n1*n2),
+                    (typecode, (), m1*n2)):
+                block = shared_memory.SharedMemory(create=True,
+                                                   size=8*size)
+                blocks.append(block)
+                view = block.buf.cast(typecode0)
+                start = 0
+                for i in parts:
+                    view[start:start+len(i)] = array(typecode0, i)
+                    start += len(i)
+                view.release()
+
+            # Give each worker a block of consecutive rows of the result
+            step = -(-m1//min(workers, m1))
+            tasks = [(tuple(i.name for i in blocks),
+                      (typecode1, typecode2, typecode), (m1, n1, n2),
+                      start, min(start+step, m1))
+                     for start in range(0, m1, step)]
+            with ProcessPoolExecutor(max_workers=len(tasks)) as executor:
+                for i in executor.map(_multiply_rows, tasks):
+                    pass    # Raise any error from the workers
+
+            # Copy the result out before the shared memory is freed
+            view = blocks[2].buf.cast(typecode)
+            if _result_typecode(self.__data, otherMatrix.__data) is None:
+                newData = view.tolist()
+            else:
+                newData = array(typecode, view)
+            view.release()
+        finally:
+            for i in blocks:
+                i.close()
+                i.unlink()
+        newMatrix = Matrix.__from_storage(newData, m1, n2)
+
+        return(newMatrix)
+
+    def __shared_typecode(self):
+        """
+        Determines how the elements of the matrix can be packed into shared
+        memory: as doubles if they are all floating point numbers, or as
+        64-bit integers if they are all integers that fit.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            typecode : string/None
+                'd' or 'q', or None if the elements cannot be packed
+            bound : integer/None
+                the largest absolute value of an element, for integers
+        """
+
+        typecode = _typecode(self.__data)
+        if typecode == 'f':    # Shared as doubles, which hold them exactly
+            typecode = 'd'
+        if typecode is None:
+            kinds = set()
+            for i in self.__rows():
+                kinds.update(map(type, i))
+            if kinds == {float}:
+                typecode = 'd'
+            elif kinds == {int}:
+                typecode = 'q'
+        if typecode != 'q':
+            return(typecode, None)
+
+        bound = max(max(map(abs, i)) for i in self.__rows())
+        if bound > INT64_MAX:
+            return(None, None)
+
+        return(typecode, bound)
+
+    def __packed(self):
+        """
+        Gives the elements of the matrix in row-major order as a single
+        contiguous buffer, for to_bytes() and pickling. This is the storage
+        itself where possible, and otherwise a new array of machine numbers,
+        or text for elements that do not fit in one (fractions, of object
+        dtype, are written as "p/q").
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            typecode : string
+                'd', 'f' or 'q' for machine numbers, or 'O' for text
+            payload : bytes-like object
+                the elements of the matrix
+        """
+
+        m, n = self.get_size()
+        typecode = _typecode(self.__data)
+        if typecode is None:
+            typecode = self.__shared_typecode()[0]
+            if typecode is None:    # Mixed or too large, so write as text
+                values = [j for i in self.__rows() for j in i]
+                assert all(map(isinstance, values,
+                               repeat((int, float, Fraction)))), \
+                    "Elements must be integers, floating point numbers " \
+                    "or fractions."
+                values = [int(i) if isinstance(i, bool) else i
+                          for i in values]    # Written as 0 and 1
+                text = [str(i) if isinstance(i, Fraction) else repr(i)
+                        for i in values]
+                return('O', ",".join(text).encode())
+        elif self.__rowStride == n and self.__columnStride == 1:
+            start = self.__offset
+            payload = memoryview(self.__data)[start:start+m*n]
+            return(typecode, payload)
+
+        payload = array(typecode)
+        for i in self.__rows():
+            payload.extend(i)
+
+        return(typecode, payload)
+
+    def __numpy_array(self):
+        """
+        Gives the elements of the matrix as a NumPy array, which shares
+        memory with the storage of a compact matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            arr : two-dimensional NumPy array
+                the elements of the matrix
+        """
+
+        m, n = self.get_size()
+        typecode = _typecode(self.__data)
+        if typecode is None:
+            arr = numpy.array([_as_list(i) for i in self.__rows()])
+        else:
+            itemsize = self.__data.itemsize
+            arr = numpy.ndarray((m, n), dtype=numpy.dtype(typecode),
+                                buffer=self.__data,
+                                offset=self.__offset*itemsize,
+                                strides=(self.__rowStride*itemsize,
+                                         self.__columnStride*itemsize))
+
+        return(arr)
+
+    def __numpy_kind(self):
+        """
+        Determines how the elements of the matrix can be handed to NumPy:
+        as the doubles or 64-bit integers of compact storage, or as doubles
+        if it is stored as a list holding only floating point numbers.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            kind : string/None
+                'd' or 'q' for compact storage, "float" for a list of floating
+                point numbers, or None otherwise
+        """
+
+        kind = _typecode(self.__data)
+        if kind is None and \
+                all(set(map(type, i)) == {float} for i in self.__rows()):
+            kind = "float"
+
+        return(kind)
+
+    def __numpy_binary(self, otherMatrix, work, terms):
+        """
+        Determines if an operation on two matrices should be handed to NumPy,
+        which is the case for large enough operands that NumPy holds exactly
+        and, for integers, when no 64-bit overflow is possible.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the other operand
+            work : integer
+                number of arithmetic operations the result takes
+            terms : integer
+                number of products summed for each element of the result, or
+                0 for an elementwise sum
+
+        Returns
+        -------
+            uses : boolean
+                whether to use NumPy
+        """
+
+        if not _uses_numpy(work):
+            return(False)
+        kinds = (self.__numpy_kind(), otherMatrix.__numpy_kind())
+        if None in kinds:
+            return(False)
+        if kinds == ("q", "q"):    # Make sure the result fits in 64 bits
+            bound1 = _numpy_bound(self.__numpy_array())
+            bound2 = _numpy_bound(otherMatrix.__numpy_array())
+            if not terms:    # Elementwise sum
+                return(bound1 + bound2 <= INT64_MAX)
+            return(bound1*bound2*terms <= INT64_MAX)
+
+        return(True)
+
+    def __numpy_scalar(self, addend, factor):
+        """
+        Determines if a scalar operation on the matrix should be done in
+        place by NumPy, which is the case for large compact matrices whose
+        storage can hold the results.
+
+        Parameters
+        ----------
+            addend : integer/floating point number/None
+                the number being added to each element, if any
+            factor : integer/floating point number/None
+                the number each element is multiplied by, if any
+
+        Returns
+        -------
+            uses : boolean
+                whether to use NumPy
+        """
+
+        m, n = self.get_size()
+        typecode = _typecode(self.__data)
+        if not _uses_numpy(m*n) or typecode is None:
+            return(False)
+        self.__check_writable()
+        if typecode in ("d", "f"):
+            return(True)
+        number = addend if addend is not None else factor
+        if not isinstance(number, int):    # Floats need wider storage
+            return(False)
+        bound = _numpy_bound(self.__numpy_array())
+        if addend is not None:
+            return(bound + abs(addend) <= INT64_MAX)
+
+        return(bound*abs(factor) <= INT64_MAX)
+
+    def __numpy_result(self, arr, typecode):
+        """
+        Wraps the result of a NumPy operation as a new matrix.
+
+        Parameters
+        ----------
+            arr : two-dimensional NumPy array
+                the elements of the result
+            typecode : string/None
+                'd' or 'q' for a compact result, None for one stored as a
+                list
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the result
+        """
+
+        m, n = arr.shape
+        if typecode is None:
+            data = arr.ravel().tolist()
+        else:    # Copy the memory in one go, in row-major order
+            data = array(typecode, arr.astype(typecode).tobytes())
+        newMatrix = Matrix.__from_storage(data, m, n)
+
+        return(newMatrix)
+
+    @classmethod
+    def __from_values(cls, values, m, n, compact, dtype=None):
+        """
+        Creates a matrix from a list of its elements in row-major order,
+        checking the elements according to the module-wide validation policy.
+
+        Parameters
+        ----------
+            values : list of integer/floating point numbers
+                the m*n elements of the matrix
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            compact : boolean
+                whether to store the elements in a compact array
+            dtype : string/None
+                fixed type of the elements, one of DTYPES, or None
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the m x n matrix of the values
+        """
+
+        if DTYPES.get(dtype) is not None:    # Arrays check while copying
+            data = _dtype_storage(values, dtype)
+        elif compact and dtype is None:
+            data = _storage(values, _compact_typecode([values]))
+        else:
+            if VALIDATION_POLICY != "trusted":
+                types = _OBJECT_TYPES if dtype == "object" else (int, float)
+                for i in values:
+                    assert isinstance(i, types), \
+                        "Argument must be a list of numbers."
+            data = values
+        newMatrix = cls.__from_storage(data, m, n)
+        newMatrix.__dtype = dtype
+
+        return(newMatrix)
+
+    def __check_writable(self):
+        """
+        Checks that the storage of the matrix can be written to, which is not
+        the case for matrices made from read-only buffers.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but terminates if the matrix is read-only
+        """
+
+        assert not getattr(self.__data, "readonly", False), \
+            "Matrix must not be read-only."
+
+        return
+
+    def __check_resizable(self):
+        """
+        Prepares the storage of the matrix for a change of size. A matrix
+        sharing memory with a buffer, or a view sharing the storage of
+        another matrix, cannot change the size of that storage, so its
+        elements are first copied into a buffer of its own.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but may replace the storage buffer
+        """
+
+        self.__check_writable()
+        m, n = self.get_size()
+        if self.__view or self.__offset or self.__rowStride != n or \
+                self.__columnStride != 1 or len(self.__data) != m*n:
+            self.__widen(_typecode(self.__data), True)
+        elif isinstance(self.__data, memoryview):
+            self.__data = array(self.__data.format, self.__data)
+
+        return
+
+    def __widen(self, typecode, detach=False):
+        """
+        Moves the elements of the matrix into a new storage buffer of the
+        given type, in row-major order. A view, or a matrix using a buffer
+        (such as a mapped file) in place, cannot do this, as it would stop
+        sharing memory with the matrix or buffer, unless it is being
+        detached from it on purpose.
+
+        Parameters
+        ----------
+            typecode : string/None
+                the typecode of the new storage, or None for a list
+            detach : boolean
+                whether a view, or a matrix using a buffer, may get storage
+                of its own
+
+        Returns
+        -------
+            None, but replaces the storage buffer
+        """
+
+        assert detach or not self.__view, \
+            "Values must fit in the storage shared by the view."
+        assert detach or not isinstance(self.__data, memoryview), \
+            "Values must fit in the storage shared with the buffer."
+        self.__check_dtype(typecode)
+        self.__data = _storage([j for i in self.__rows() for j in i],
+                               typecode)
+        self.__offset = 0
+        self.__rowStride = self.__n
+        self.__columnStride = 1
+        if self.__view:    # Changes no longer show in the other matrix
+            self.__version = [self.__version[0], False]
+            self.__view = False
+
+        return
+
+    def __overwrite(self, values):
+        """
+        Replaces every element of the matrix, writing into the existing
+        storage buffer (so any memory it shares stays shared) unless the
+        values need wider storage.
+
+        Parameters
+        ----------
+            values : list of integer/floating point numbers
+                the new elements of the matrix in row-major order
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        self.__check_writable()
+        m, n = self.get_size()
+        newData = _storage(values, _typecode(self.__data))
+        if _typecode(newData) != _typecode(self.__data):
+            # Values do not fit, so switch to the wider storage
+            assert not self.__view, \
+                "Values must fit in the storage shared by the view."
+            assert not isinstance(self.__data, memoryview), \
+                "Values must fit in the storage shared with the buffer."
+            self.__check_dtype(_typecode(newData))
+            self.__data = newData
+            self.__offset = 0
+            self.__rowStride = n
+            self.__columnStride = 1
+        elif self.__rowStride == n and self.__columnStride == 1:
+            start = self.__offset
+            self.__data[start:start+m*n] = newData
+        else:    # Write the rows of a strided view one at a time
+            for i in range(m):
+                self.__data[self.__row_slice(i, 0, n)] = newData[i*n:(i+1)*n]
+        self.__touch()
+
+        return
+
+    def __flat(self):
+        """
+        Gives the elements of the matrix in row-major order: the storage
+        buffer itself when it holds exactly those, and a new list otherwise.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            values : list/array of integer/floating point numbers
+                the elements of the matrix
+        """
+
+        m, n = self.get_size()
+        if self.__offset == 0 and self.__rowStride == n and \
+                self.__columnStride == 1 and len(self.__data) == m*n:
+            return(self.__data)
+        values = [j for i in self.__rows() for j in i]
+
+        return(values)
+
+    def __touch(self):
+        """
+        Records a change to the elements of the matrix, starting a new
+        version of it (shared with any views of the same storage) so that
+        results cached for earlier versions are no longer used.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but drops the cached results
+        """
+
+        self.__version[0] += 1
+        self.__cache.clear()
+
+        return
+
+    def __export(self):
+        """
+        Records that the storage of the matrix has been handed out to NumPy,
+        which can change it without the matrix knowing, so that derived
+        results of it (and of views sharing it) are no longer cached.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but drops the cached results
+        """
+
+        self.__version[1] = True
+        self.__cache.clear()
+
+        return
+
+    def __cached(self, key, function):
+        """
+        Gives a derived result of the matrix from the cache, if it was worked
+        out for the current version of the matrix, and otherwise works it out
+        and adds it to the cache.
+
+        Parameters
+        ----------
+            key : string
+                the name of the result
+            function : function
+                works out the result, taking no arguments
+
+        Returns
+        -------
+            value : object
+                the result
+        """
+
+        version = self.__version[0]
+        entry = self.__cache.get(key)
+        if entry is not None and entry[0] == version and \
+                not self.__version[1]:
+            self.__hits += 1
+            return(entry[1])
+
+        self.__misses += 1
+        value = function()
+        # Buffers shared with other objects, and storage handed out to NumPy
+        # (which can change it without the matrix knowing), do not keep
+        # their results
+        if not isinstance(self.__data, memoryview) and \
+                not self.__version[1]:
+            self.__cache[key] = (version, value)
+
+        return(value)
+
+    def __gather(self, rows, columns):
+        """
+        Copies the elements of the given rows and columns of the matrix into
+        a new storage buffer of the same type, in row-major order. Runs of
+        consecutive columns are copied as single slices of each row.
+
+        Parameters
+        ----------
+            rows : iterable of integers
+                zero-based indices of the rows, in order
+            columns : iterable of integers
+                zero-based indices of the columns, in order
+
+        Returns
+        -------
+            data : list/array of integer/floating point numbers
+                the selected elements
+        """
+
+        runs = _runs(columns)
+        data = _storage([], _typecode(self.__data))
+        for i in rows:
+            row = self.__row(i)
+            if len(runs) == 1 and runs[0] == (0, self.__n):
+                data.extend(row)    # Whole row, without slicing it again
+            else:
+                for start, stop in runs:
+                    data.extend(row[start:stop])
+
+        return(data)
+
+    def __fitted(self, values):
+        """
+        Converts new elements for the matrix to the type of its storage,
+        first widening the storage if they do not fit in it.
+
+        Parameters
+        ----------
+            values : list of integer/floating point numbers
+                the new elements
+
+        Returns
+        -------
+            values : list/array of integer/floating point numbers
+                the same elements, in the type of the storage
+        """
+
+        self.__check_writable()
+        newValues = _storage(values, _typecode(self.__data))
+        if _typecode(newValues) != _typecode(self.__data):
+            self.__widen(_typecode(newValues), True)
+            newValues = _storage(values, _typecode(self.__data))
+
+        return(newValues)
+
+    def __rebuild(self, data, m, n):
+        """
+        Replaces the storage of the matrix with a new buffer of its own, for
+        the batch structural edits, which work out the new elements in one
+        pass. A view stops sharing memory with the matrix it came from.
+
+        Parameters
+        ----------
+            data : list/array of integer/floating point numbers
+                the m*n elements of the matrix in row-major order
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+
+        Returns
+        -------
+            None, but replaces the storage buffer
+        """
+
+        self.__check_writable()
+        self.__data = data
+        self.__m = m
+        self.__n = n
+        self.__offset = 0
+        self.__rowStride = n
+        self.__columnStride = 1
+        if self.__view:    # Changes no longer show in the other matrix
+            self.__version = [self.__version[0], False]
+            self.__view = False
+        self.__touch()
+
+        return
+
+    def __write_row(self, i, values):
+        """
+        Writes the elements of a row of the matrix into its storage, widening
+        the storage first if they do not fit in it (which a view cannot do).
+
+        Parameters
+        ----------
+            i : integer
+                zero-based index of the row
+            values : list/array of integer/floating point numbers
+                the new elements of the row
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        typecode = _typecode(self.__data)
+        newRow = _storage(values, typecode)
+        if _typecode(newRow) != typecode:
+            self.__widen(_typecode(newRow))
+            newRow = _storage(values, _typecode(self.__data))
+        self.__data[self.__row_slice(i, 0, self.__n)] = newRow
+        self.__touch()
+
+        return
+
+    def __check_output(self, out, m, n):
+        """
+        Checks that a matrix given to write the result of an operation into
+        is an m x n matrix which can be written to.
+
+        Parameters
+        ----------
+            out : object of class Matrix
+                the matrix to write the result into
+            m : integer
+                number of rows in the result
+            n : integer
+                number of columns in the result
+
+        Returns
+        -------
+            None, but terminates if the matrix cannot hold the result
+        """
+
+        assert isinstance(out, Matrix), "Output must be a matrix."
+        assert out.get_size() == (m, n), \
+            "Output must be of the same size as the result."
+        out.__check_writable()
+
+        return
+
+    def __overlaps(self, otherMatrix):
+        """
+        Determines if the matrix shares storage with another matrix laid out
+        differently, so that writing an element of one may change another
+        element of the other.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the other matrix
+
+        Returns
+        -------
+            overlaps : boolean
+                whether the two overlap other than element for element
+        """
+
+        layout = (self.__offset, self.__rowStride, self.__columnStride)
+        overlaps = self.__data is otherMatrix.__data and layout != \
+            (otherMatrix.__offset, otherMatrix.__rowStride,
+             otherMatrix.__columnStride)
+
+        return(overlaps)
+
+    def __add_into(self, otherMatrix, alpha, out):
+        """
+        Writes (self + alpha*otherMatrix) into the storage of a matrix of the
+        same size, for matrix_add(), add_scaled() and the += and -=
+        operators. NumPy writes into compact storage directly; otherwise the
+        result is written a row at a time, so no intermediate matrix is made.
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the matrix to be scaled and added to the active matrix
+            alpha : integer/floating point number
+                the number to multiply the other matrix by
+            out : object of class Matrix
+                the matrix to write the result into, which may be self
+
+        Returns
+        -------
+            None, but updates out
+        """
+
+        m, n = self.get_size()
+        self.__check_output(out, m, n)
+
+        # Scaling by a number other than 1 or -1 takes a scratch array, and
+        # is only done by NumPy for floating point results, which cannot
+        # overflow
+        scaled = isinstance(alpha, float) or alpha not in (1, -1)
+        floating = _typecode(out.__data) in ('d', 'f') and \
+            (isinstance(alpha, float) or
+             _typecode(self.__data) in ('d', 'f') and
+             _typecode(otherMatrix.__data) in ('d', 'f'))
+        if (not scaled or floating) and \
+                self.__numpy_into(otherMatrix, out, m*n, 0):
+            arr = out.__numpy_array()
+            if not scaled:
+                function = numpy.add if alpha == 1 else numpy.subtract
+                function(self.__numpy_array(), otherMatrix.__numpy_array(),
+                         out=arr)
+            else:
+                numpy.add(self.__numpy_array(),
+                          alpha*otherMatrix.__numpy_array(), out=arr)
+            out.__touch()
+            return
+
+        if alpha == 1:
+            function = add
+        elif alpha == -1:
+            function = sub
+        else:
+            function = _linear_kernel([1, alpha])
+        # Rows can be written as they are worked out, unless the output
+        # shares storage with an operand laid out differently from it
+        rows = zip(self.__rows(), otherMatrix.__rows())
+        if out.__overlaps(self) or out.__overlaps(otherMatrix):
+            rows = list(rows)
+        for i, (row1, row2) in enumerate(rows):
+            out.__write_row(i, list(map(function, row1, row2)))
+
+        return
+
+    def __numpy_into(self, otherMatrix, out, work, terms):
+        """
+        Determines if NumPy should work out an operation on two matrices
+        straight into the storage of a third, which is the case when all
+        three are compact, the output can hold the result, and NumPy would
+        be used for the operation anyway (see __numpy_binary()).
+
+        Parameters
+        ----------
+            otherMatrix : object of class Matrix
+                the other operand
+            out : object of class Matrix
+                the matrix the result is written into
+            work : integer
+                number of arithmetic operations the result takes
+            terms : integer
+                number of products summed for each element of the result, or
+                0 for an elementwise sum
+
+        Returns
+        -------
+            uses : boolean
+                whether to use NumPy
+        """
+
+        typecodes = (_typecode(self.__data), _typecode(otherMatrix.__data))
+        typecode = _typecode(out.__data)
+        if None in typecodes or typecode is None or \
+                (typecode == 'q' and typecodes != ('q', 'q')):
+            return(False)
+
+        return(self.__numpy_binary(otherMatrix, work, terms))
+
+    def __binary(self, function, other, terms, typecode=None, checked=False):
+        """
+        Works out an elementwise operation on the matrix and a matrix or a
+        number, handing it to NumPy where the results are the same as they
+        would be here, and otherwise broadcasting it in one pass.
+
+        Parameters
+        ----------
+            function : function
+                the operation, taking two numbers (or NumPy arrays)
+            other : object of class Matrix/number
+                the other operand
+            terms : integer/None
+                number of products in each element of the result (0 for a
+                sum or comparison, 1 for a product), for the bound on integer
+                results, or None for operations never handed to NumPy
+            typecode : string/None
+                the typecode of the storage of the result, if fixed
+            checked : boolean
+                whether the results may not be numbers (see __broadcast())
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the results
+        """
+
+        # Ensure argument is valid
+        assert isinstance(other, Matrix) or isinstance(other, _OBJECT_TYPES), \
+            "Argument must be a matrix or a number."
+        operand = other
+        if not isinstance(other, Matrix):    # Number, as a 1 x 1 matrix
+            operand = Matrix.__from_storage([other], 1, 1)
+        m, n = _broadcast_size([self.get_size(), operand.get_size()])
+        if terms is None or not self.__numpy_binary(operand, m*n, terms):
+            newMatrix = self.__broadcast(function, (other,), typecode,
+                                         checked)
+            return(newMatrix)
+
+        matrices = [self] + ([other] if isinstance(other, Matrix) else [])
+        typecode, dtype = Matrix.__broadcast_type(matrices, typecode)
+        arr = function(self.__numpy_array(), operand.__numpy_array())
+        if typecode == 'q' and arr.dtype.kind == "f":
+            typecode = 'd'    # Integers with a floating point operand
+        newMatrix = self.__numpy_result(arr, typecode)
+        newMatrix.__broadcast_dtype(dtype)
+
+        return(newMatrix)
+
+    def __broadcast(self, function, others, typecode=None, checked=False):
+        """
+        Works out a function of the matrix and other operands elementwise,
+        in a single pass over the elements, broadcasting numbers and
+        matrices with a single row or column to the size of the result (see
+        Matrix).
+
+        Parameters
+        ----------
+            function : function
+                the function, taking a number from each operand
+            others : tuple of objects of class Matrix/numbers
+                the operands after the matrix
+            typecode : string/None
+                the typecode of the storage of the result, if fixed
+            checked : boolean
+                whether to check that the results are numbers the matrix can
+                hold (unless its validation policy is "trusted"), for
+                functions that can give anything else, such as a complex
+                power of a negative number
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix of the results
+        """
+
+        # Ensure arguments are valid
+        for i in others:
+            assert isinstance(i, Matrix) or isinstance(i, _OBJECT_TYPES), \
+                "Operands must be matrices or numbers."
+        matrices = [self] + [i for i in others if isinstance(i, Matrix)]
+        m, n = _broadcast_size([i.get_size() for i in matrices])
+        if typecode is None and \
+                any(not isinstance(i, (Matrix, int, float)) for i in others):
+            typecode, dtype = None, "object"    # Exact numbers, say
+        else:
+            typecode, dtype = Matrix.__broadcast_type(matrices, typecode)
+
+        # Work out each row of the result from the matching row of every
+        # operand at once, with repeated rows where operands are broadcast
+        rows = [self.__broadcast_rows(m, n)]
+        for i in others:
+            if isinstance(i, Matrix):
+                rows.append(i.__broadcast_rows(m, n))
+            else:
+                rows.append(repeat([i]*n, m))
+        newValues = []
+        for i in zip(*rows):
+            newValues.extend(map(function, *i))
+        if checked and self.get_validation_policy() != "trusted":
+            types = _OBJECT_TYPES if dtype == "object" else (int, float)
+            assert all(map(isinstance, newValues, repeat(types))), \
+                "Results must be numbers."
+        # Wrap the result directly, since the results are numbers
+        newMatrix = Matrix.__from_storage(_storage(newValues, typecode), m, n)
+        newMatrix.__broadcast_dtype(dtype)
+
+        return(newMatrix)
+
+    @staticmethod
+    def __broadcast_type(matrices, typecode):
+        """
+        Gives the storage and dtype of the result of an elementwise
+        operation: the storage of the result of matrix_add() on the matrix
+        operands, and their promoted dtype (see DTYPES), or, for a fixed
+        typecode (compact integers, for comparisons), "int64" if the
+        operands have dtypes.
+
+        Parameters
+        ----------
+            matrices : list of objects of class Matrix
+                the matrix operands
+            typecode : string/None
+                the typecode of the storage of the result, if fixed
+
+        Returns
+        -------
+            typecode : string/None
+                the typecode of the storage of the result
+            dtype : string/None
+                the dtype of the result
+        """
+
+        dtype = matrices[0].__dtype
+        for i in matrices[1:]:
+            dtype = _result_dtype(dtype, i.__dtype)
+        if typecode is not None:
+            return(typecode, "int64" if dtype is not None else None)
+        if dtype is not None:
+            return(DTYPES[dtype], dtype)
+
+        typecodes = {_typecode(i.__data) for i in matrices}
+        if None in typecodes:
+            typecode = None
+        elif len(typecodes) == 1:
+            typecode = typecodes.pop()
+        else:    # Doubles hold both floats and integers
+            typecode = 'd'
+
+        return(typecode, dtype)
+
+    def __broadcast_dtype(self, dtype):
+        """
+        Gives the result of an elementwise operation its dtype, with results
+        of the "int64" dtype that are not all integers (such as quotients)
+        promoted to "float64", as NumPy does.
+
+        Parameters
+        ----------
+            dtype : string/None
+                the dtype of the operands, or None
+
+        Returns
+        -------
+            None, but sets the dtype of the matrix
+        """
+
+        if dtype == "int64" and _typecode(self.__data) == 'd':
+            dtype = "float64"
+        self.__as_dtype(dtype)
+
+        return
+
+    def __broadcast_rows(self, m, n):
+        """
+        Gives the rows of the matrix broadcast to a larger size, repeating a
+        single row m times, or the element of each row of a single column n
+        times, for the elementwise operations.
+
+        Parameters
+        ----------
+            m : integer
+                number of rows to give
+            n : integer
+                number of elements in each row
+
+        Returns
+        -------
+            rows : iterable of lists/arrays of numbers
+                the m rows of n elements
+        """
+
+        p, q = self.get_size()
+        if p == 1:
+            row = _as_list(next(self.__rows()))
+            if q == 1:
+                row = row*n
+            return(repeat(row, m))
+        if q == 1:
+            return([i[0]]*n for i in self.__rows())
+
+        return(self.__rows())
+
+    def __floating(self):
+        """
+        Determines if the elements of the matrix are floating point numbers,
+        which are the only ones compensated summation changes the sums of.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            floating : boolean
+                whether any element is a floating point number
+        """
+
+        typecode = _typecode(self.__data)
+        if typecode is not None:
+            return(typecode != 'q')
+        floating = any(isinstance(j, float) for i in self.__rows() for j in i)
+
+        return(floating)
+
+    def __numpy_reducible(self):
+        """
+        Determines if a reduction of the matrix should be handed to NumPy,
+        which is the case for large compact matrices of floating point
+        numbers (integers are kept here, where their sums cannot overflow).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            uses : boolean
+                whether to use NumPy
+        """
+
+        m, n = self.get_size()
+        uses = _uses_numpy(m*n) and _typecode(self.__data) in ('d', 'f')
+
+        return(uses)
+
+    def __reduced_size(self, axis):
+        """
+        Gives the size of the matrix of the results of a reduction along an
+        axis: a row for axis 0, and a column for axis 1.
+
+        Parameters
+        ----------
+            axis : integer
+                0 or 1, the axis reduced along
+
+        Returns
+        -------
+            m : integer
+                number of rows in the result
+            n : integer
+                number of columns in the result
+        """
+
+        m, n = self.get_size()
+        if axis == 0:
+            return(1, n)
+
+        return(m, 1)
+
+    def __reduced(self, values, axis):
+        """
+        Gives the results of a reduction of the matrix: a single number for
+        a reduction of every element, and otherwise a matrix stored like
+        this one (with its dtype) holding a result for each column or row.
+
+        Parameters
+        ----------
+            values : number/list of numbers/NumPy array
+                the results
+            axis : integer/None
+                None, 0 or 1, the axis reduced along
+
+        Returns
+        -------
+            result : number/object of class Matrix
+                the results
+        """
+
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if axis is None:
+                return(values.item())
+            values = values.ravel().tolist()
+        if axis is None:
+            return(values)
+
+        data = _storage(values, _typecode(self.__data))
+        result = Matrix.__from_storage(data, *self.__reduced_size(axis))
+        result.__as_dtype(self.__dtype)
+
+        return(result)
+
+    def __extreme(self, function, axis):
+        """
+        Gives the smallest or largest elements of the matrix, for min() and
+        max().
+
+        Parameters
+        ----------
+            function : function
+                min or max
+            axis : integer/None
+                None, 0 or 1, the axis reduced along
+
+        Returns
+        -------
+            result : number/object of class Matrix
+                the smallest or largest element, or those of each column or
+                row
+        """
+
+        # Ensure argument is valid
+        _check_axis(axis)
+
+        if self.__numpy_reducible():
+            arr = self.__numpy_array()
+            values = arr.min(axis, keepdims=True) if function is min else \
+                arr.max(axis, keepdims=True)
+        elif axis is None:
+            values = function(map(function, self.__rows()))
+        elif axis == 1:
+            values = list(map(function, self.__rows()))
+        else:
+            values = _reduce_columns(function, self.__rows())
+        result = self.__reduced(values, axis)
+
+        return(result)
+
+    def __norm(self, ord):
+        """
+        Works out a norm of the matrix, for norm().
+
+        Parameters
+        ----------
+            ord : string/integer/floating point number
+                "fro", 1 or math.inf, the norm to work out
+
+        Returns
+        -------
+            value : number
+                the norm of the matrix
+        """
+
+        if self.__numpy_reducible():
+            arr = self.__numpy_array()
+            if ord == "fro":
+                value = _numpy_frobenius(arr)
+            else:
+                value = numpy.linalg.norm(arr, ord).item()
+            return(value)
+
+        if ord == "fro":    # The norms of the rows, then of those
+            value = math.hypot(*(math.hypot(*i) for i in self.__rows()))
+        elif ord == 1:    # Column sums, a row at a time
+            value = max(_reduce_columns(add, (map(abs, i)
+                                              for i in self.__rows())))
+        else:
+            value = max(sum(map(abs, i)) for i in self.__rows())
+
+        return(value)
+
+    def __checks_elements(self):
+        """
+        Determines if the values being written into the matrix should be
+        checked to be numbers, which is skipped only in "trusted" mode.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            checks : boolean
+                whether to check the elements being written
+        """
+
+        checks = self.get_validation_policy() != "trusted" and \
+            DTYPES.get(self.__dtype) is None    # Fixed arrays check for us
+
+        return(checks)
+
+    def __element_types(self):
+        """
+        Gives the types of number the elements of the matrix may be: any
+        real numbers for the "object" dtype, and otherwise integers and
+        floating point numbers.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            types : tuple of types
+                the types of the elements, for isinstance()
+        """
+
+        if self.__dtype == "object":
+            return(_OBJECT_TYPES)
+
+        return((int, float))
+
+    def __check_dtype(self, typecode):
+        """
+        Terminates if the storage of a matrix with a fixed dtype is about
+        to change to a different type (as it would to hold a value that does
+        not fit), since the dtype of a matrix never changes.
+
+        Parameters
+        ----------
+            typecode : string/None
+                the typecode of the new storage, or None for a list
+
+        Returns
+        -------
+            None, but terminates if the storage cannot change
+        """
+
+        assert self.__dtype is None or typecode == DTYPES[self.__dtype], \
+            "Values must be of the dtype of the matrix ({}).".format(
+                self.__dtype)
+
+        return
+
+    def __as_dtype(self, dtype):
+        """
+        Gives a newly made result a fixed dtype, converting its storage if
+        it is not already of that type.
+
+        Parameters
+        ----------
+            dtype : string/None
+                one of DTYPES, or None to leave the storage flexible
+
+        Returns
+        -------
+            None, but may replace the storage buffer
+        """
+
+        if dtype is not None and _typecode(self.__data) != DTYPES[dtype]:
+            self.__data = _dtype_storage(
+                [j for i in self.__rows() for j in i], dtype)
+            self.__offset = 0
+            self.__rowStride = self.__n
+            self.__columnStride = 1
+        self.__dtype = dtype
+
+        return
+
+    def __revalidate(self):
+        """
+        Checks the whole matrix after a change if it is in "strict" mode.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but terminates if the matrix is invalid
+        """
+
+        if self.get_validation_policy() == "strict":
+            self.check_validity()
+
+        return
+
+    def __append_row(self, row):
+        """
+        Appends a row to the storage buffer, widening the storage if the row
+        does not fit in it. The row is not checked.
+
+        Parameters
+        ----------
+            row : list of integer/floating point numbers
+                elements of the row to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Convert the row first, so a failed conversion leaves no partial row
+        self.__check_resizable()
+        newRow = _storage(row, _typecode(self.__data))
+        if _typecode(newRow) != _typecode(self.__data):
+            # Row needs a wider type than the matrix has, so widen it
+            self.__check_dtype(_typecode(newRow))
+            self.__data = _storage(list(self.__data), _typecode(newRow))
+        self.__data.extend(newRow)
+        self.__touch()
+        self.__m += 1    # Update number of rows
+        self.__n = len(row)    # Update number of columns
+        self.__rowStride = self.__n
+
+        return
+
+    def __file_typecode(self):
+        """
+        Gives the type the elements of the matrix are written to files as:
+        the typecode of compact storage, or for a list, 'q' if it holds only
+        integers which fit in 64 bits and 'd' otherwise.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            typecode : string
+                'd' or 'q'
+        """
+
+        typecode = _typecode(self.__data)
+        if typecode is None:
+            typecode = _compact_typecode(self.__rows())
+
+        return(typecode)
+
+    def __tile(self, iStart, iStop, jStart, jStop, useNumpy):
+        """
+        Reads a rectangular block of elements of the matrix.
+
+        Parameters
+        ----------
+            iStart, iStop : integer
+                zero-based rows of the block, from iStart up to iStop
+            jStart, jStop : integer
+                zero-based columns of the block, from jStart up to jStop
+            useNumpy : boolean
+                whether to give the block as a NumPy array
+
+        Returns
+        -------
+            tile : list of lists/two-dimensional NumPy array
+                the rows of the block
+        """
+
+        if useNumpy and _typecode(self.__data) is not None:
+            arr = self.__numpy_array()[iStart:iStop, jStart:jStop]
+            return(numpy.array(arr))    # Copy, to read it in now
+
+        tile = [_as_list(self.__data[self.__row_slice(i, jStart, jStop)])
+                for i in range(iStart, iStop)]
+        if useNumpy:
+            tile = numpy.array(tile)
+
+        return(tile)
+
+    def __write_tile(self, iStart, iStop, jStart, jStop, tile, useNumpy):
+        """
+        Writes a rectangular block of elements of the matrix, for the
+        out-of-core operations.
+
+        Parameters
+        ----------
+            iStart, iStop : integer
+                zero-based rows of the block, from iStart up to iStop
+            jStart, jStop : integer
+                zero-based columns of the block, from jStart up to jStop
+            tile : list/two-dimensional NumPy array
+                the elements of the block, in row-major order if a list
+            useNumpy : boolean
+                whether the block is a NumPy array
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        if useNumpy:
+            self.__numpy_array()[iStart:iStop, jStart:jStop] = tile
+            self.__touch()
+            return
+
+        typecode = _typecode(self.__data)
+        n = jStop - jStart
+        for i in range(iStart, iStop):
+            start = (i - iStart)*n
+            self.__data[self.__row_slice(i, jStart, jStop)] = \
+                array(typecode, tile[start:start+n])
+        self.__touch()
+
+        return
+
+    def __index(self, i, j):
+        """
+        Gives the position of an element in the storage buffer.
+
+        Parameters
+        ----------
+            i : integer
+                zero-based row index of the element
+            j : integer
+                zero-based column index of the element
+
+        Returns
+        -------
+            index : integer
+                position of the element in the flat storage
+        """
+
+        index = self.__offset + i*self.__rowStride + j*self.__columnStride
+
+        return(index)
+
+    def __row(self, i):
+        """
+        Gives the elements of a row of the matrix as a sequence, using a
+        single slice of the storage buffer.
+
+        Parameters
+        ----------
+            i : integer
+                zero-based index of the row
+
+        Returns
+        -------
+            row : list/array of integer/floating point numbers
+                the elements of the row
+        """
+
+        row = self.__data[self.__row_slice(i, 0, self.__n)]
+
+        return(row)
+
+    def __row_slice(self, i, jStart, jStop):
+        """
+        Gives the slice of the storage buffer holding part of a row of the
+        matrix, which steps backwards through the buffer for reversed views.
+
+        Parameters
+        ----------
+            i : integer
+                zero-based index of the row
+            jStart, jStop : integer
+                zero-based columns of the part, from jStart up to jStop
+
+        Returns
+        -------
+            span : slice
+                the positions of the elements in the storage buffer
+        """
+
+        start = self.__index(i, jStart)
+        stop = self.__index(i, jStop)
+        if stop < 0:    # Runs backwards past the start of the buffer
+            stop = None
+        span = slice(start, stop, self.__columnStride)
+
+        return(span)
+
+    def __rows(self):
+        """
+        Iterates over the rows of the matrix, from top to bottom.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            rows : generator of lists/arrays of numbers
+                the elements of each row in turn
+        """
+
+        return(self.__row(i) for i in range(self.__m))
+
+    def __chunks(self, chunkSize):
+        """
+        Iterates over the rows of the matrix in chunks, for iter_rows().
+
+        Parameters
+        ----------
+            chunkSize : integer
+                the number of rows in each chunk
+
+        Returns
+        -------
+            chunks : generator of lists of lists of numbers
+                the rows of each chunk in turn
+        """
+
+        for start in range(0, self.__m, chunkSize):
+            stop = min(start + chunkSize, self.__m)
+            yield [_as_list(self.__row(i)) for i in range(start, stop)]
+
+    def __column(self, j):
+        """
+        Gives the elements of a column of the matrix as a sequence, using a
+        single strided slice of the storage buffer.
+
+        Parameters
+        ----------
+            j : integer
+                zero-based index of the column
+
+        Returns
+        -------
+            column : list/array of integer/floating point numbers
+                the elements of the column
+        """
+
+        start = self.__index(0, j)
+        stop = start + self.__m*self.__rowStride
+        if stop < 0:    # Runs backwards past the start of the buffer
+            stop = None
+        column = self.__data[start:stop:self.__rowStride]
+
+        return(column)
+
+
+class SparseMatrix:
+    """
+    A class to represent a sparse matrix, a two-dimensional array of numbers
+    most of which are zero, storing only the nonzero elements.
+
+    The nonzero elements are kept in compressed sparse row (CSR) form: for
+    each row, the columns and values of its nonzero elements, in order of
+    column. Changes made through set_value() are first collected as
+    (row, column, value) coordinates (COO form), and merged into the CSR
+    arrays in one pass the next time the whole matrix is read. Elements
+    which are not stored read as a zero of the type of the elements given:
+    0.0 once any of them is a floating point number, and 0 otherwise.
+
+    Operations between sparse matrices, and between sparse and dense
+    matrices, give a SparseMatrix when the density of the result (the
+    fraction of its elements which are nonzero) is at most SPARSE_THRESHOLD,
+    and a dense Matrix otherwise.
+
+    Attributes
+    ----------
+        m : integer
+            numbers of rows in the matrix (for an m x n matrix)
+        n : integer
+            number of columns in the matrix (for an m x n matrix)
+
+    Methods
+    -------
+        from_coo(m, n, entries) :
+            creates a sparse matrix from (row, column, value) coordinates
+        from_dense(matrix) :
+            creates a sparse matrix with the elements of a dense matrix
+        to_dense() :
+            gives the matrix as a dense Matrix
+        get_size() :
+            gives the size of the matrix (for an m x n matrix)
+        count_nonzero() :
+            gives the number of nonzero elements of the matrix
+        density() :
+            gives the fraction of elements of the matrix which are nonzero
+        get_value() :
+            gives the value of a specified element of the matrix
+        set_value() :
+            changes the value of a specified element of the matrix
+        add_row(row) :
+            adds a row of numbers to the matrix
+        delete_row(row) :
+            deletes a specified row of the matrix
+        add_column(column) :
+            adds a column of numbers to the matrix
+        delete_column(column) :
+            deletes a specified column of the matrix
+        scalar_multiply(number) :
+            multiplies each element of the matrix by a specified number
+        matrix_add(otherMatrix) :
+            adds two matrices together, producing a new matrix
+        matrix_multiply(otherMatrix) :
+            multiplies two matrices together, producing a new matrix
+        transpose() :
+            transposes the matrix, producing a new matrix
+
+    Example Usage
+    -------------
+        A = SparseMatrix([[0,0,3],[4,0,0]])    # 2 x 3 matrix, 2 nonzeros
+        B = SparseMatrix.from_coo(1000, 1000, [(1,1,2.5), (1000,3,1)])
+    """
+
+    __slots__ = ("__m", "__n", "__indptr", "__indices", "__data",
+                 "__pending", "__zero")
+
+    def __init__(self, values):
+        """
+        Instantiates the sparse matrix from the values of all of its
+        elements, keeping only those which are nonzero.
+
+        Parameters
+        ----------
+        values : list of lists of integer/floating point numbers
+            elements to be placed in the matrix in the form of row vectors
+
+        Returns
+        -------
+            None, but creates the matrix
+        """
+
+        # Ensure argument passed in is valid
+        assert values and isinstance(values, list), \
+            "Argument must be a list of lists of numbers."
+
+        # Instantiate an empty matrix
+        self.__m = 0
+        self.__n = 0
+        self.__indptr = [0]
+        self.__indices = []
+        self.__data = []
+        self.__pending = {}
+        self.__zero = 0    # Until a floating point element is given
+        for i in values:
+            self.add_row(i)    # Add row by row
+
+        return
+
+    @classmethod
+    def from_coo(cls, m, n, entries):
+        """
+        Creates a sparse matrix from the coordinates and values of its
+        nonzero elements. Values given for the same element are added
+        together.
+
+        Parameters
+        ----------
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            entries : iterable of (row, column, value) tuples
+                row number, column number and value of each element
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix
+                the m x n matrix of the given elements
+        """
+
+        # Ensure arguments are valid
+        _check_size(m, n)
+
+        rows = [{} for i in range(m)]    # Columns and values of each row
+        zero = 0
+        for row, column, value in entries:
+            assert isinstance(row, int) and isinstance(column, int), \
+                "Location must be an integer value."
+            assert isinstance(value, int) or isinstance(value, float), \
+                "Value must be a number."
+            assert row > 0 and column > 0 and row <= m and column <= n, \
+                "Matrix must be defined at the given location."
+            rows[row-1][column-1] = rows[row-1].get(column-1, 0) + value
+            if isinstance(value, float):
+                zero = 0.0
+        newMatrix = cls.__from_rows(rows, m, n, zero)
+
+        return(newMatrix)
+
+    @classmethod
+    def from_dense(cls, matrix):
+        """
+        Creates a sparse matrix holding the nonzero elements of a dense
+        matrix.
+
+        Parameters
+        ----------
+            matrix : object of class Matrix
+                the dense matrix to convert
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix
+                the same matrix in sparse form
+        """
+
+        assert isinstance(matrix, Matrix), "Argument must be a matrix."
+
+        m, n = matrix.get_size()
+        newMatrix = cls.__from_dense_rows(
+            [matrix.get_row(i) for i in range(1, m+1)], n, dense=False)
+
+        return(newMatrix)
+
+    def to_dense(self):
+        """
+        Gives the matrix as a dense Matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the same matrix in dense form
+        """
+
+        m, n = self.get_size()
+        values = [self.__zero]*(m*n)
+        for i, columns, data in self.__row_items():
+            for j, value in zip(columns, data):
+                values[i*n+j] = value
+        newMatrix = Matrix.from_flat(values, m, n)
+
+        return(newMatrix)
+
+    def __str__(self):
+        """
+        Gives a string representation of the matrix as a grid of numbers,
+        zeros included, in the same form as for a dense Matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            matrixString : string
+                elements of the matrix represented in an easily printable and
+                human-readable form
+        """
+
+        matrixString = str(self.to_dense())
+
+        return(matrixString)
+
+    def __repr__(self):
+        """
+        Gives an official string representation of the matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            matrixString : string
+                official string representation of the matrix, contaning the
+                size of the matrix, its number of nonzero elements and the
+                object's id
+        """
+
+        m, n = self.get_size()
+        matrixString = "{} x {} SparseMatrix object with {} nonzero " \
+            "elements and id of {}.".format(m, n, self.count_nonzero(),
+                                            str(id(self)))
+
+        return(matrixString)
+
+    def get_size(self):
+        """
+        Gives the size of the matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+        """
+
+        m, n = self.__m, self.__n    # Get info from private attributes
+
+        return(m, n)
+
+    def count_nonzero(self):
+        """
+        Gives the number of nonzero elements of the matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            count : integer
+                number of stored nonzero elements
+        """
+
+        self.__compress()
+        count = len(self.__data)
+
+        return(count)
+
+    def density(self):
+        """
+        Gives the fraction of the elements of the matrix which are nonzero.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            density : floating point number
+                number of nonzero elements divided by m*n
+        """
+
+        m, n = self.get_size()
+        density = self.count_nonzero()/(m*n)
+
+        return(density)
+
+    def get_value(self, row, column):
+        """
+        Gives the value of a specified element of the matrix.
+
+        Parameters
+        ----------
+            row : integer
+                row number of desired element
+            column : integer
+                column number of desired element
+
+        Returns
+        -------
+            value : integer/floating point number
+                value of the element at the given location
+        """
+
+        # Ensure arguments passed in are valid
+        assert isinstance(row, int) and isinstance(column, int), \
+            "Location must be an integer value."
+        m, n = self.get_size()
+        assert row > 0 and column > 0 and row <= m and column <= n, \
+            "Matrix must be defined at the given location."
+
+        location = (row-1, column-1)
+        if location in self.__pending:    # Changed since the last merge
+            value = self.__pending[location] or self.__zero
+            return(value)
+        # Binary search for the column among the nonzeros of the row
+        start, stop = self.__indptr[row-1], self.__indptr[row]
+        k = bisect_left(self.__indices, column-1, start, stop)
+        if k < stop and self.__indices[k] == column-1:
+            value = self.__data[k]
+        else:
+            value = self.__zero
+
+        return(value)
+
+    def set_value(self, row, column, value):
+        """
+        Changes the value of a specified element of the matrix. The change
+        is recorded in constant time and merged into the compressed rows
+        when the whole matrix is next read.
+
+        Parameters
+        ----------
+            row : integer
+                row number of element to be changed
+            column : integer
+                column number of element to be changed
+            value : integer/floating point number
+                new value for the specified element to take
+
+        Returns
+        -------
+            None, but updates the matrix elements
+        """
+
+        # Ensure arguments passed in are valid
+        assert isinstance(row, int) and isinstance(column, int), \
+            "Location must be an integer value."
+        assert isinstance(value, int) or isinstance(value, float), \
+            "Value must be a number."
+        m, n = self.get_size()
+        assert row > 0 and column > 0 and row <= m and column <= n, \
+            "Matrix must be defined at the given location."
+
+        self.__pending[(row-1, column-1)] = value    # Zero removes it
+        if isinstance(value, float):
+            self.__zero = 0.0
+
+
+        return
+
+    def add_row(self, row):
+        """
+        Appends a single row to the bottom of the existing matrix.
+
+        Parameters
+        ----------
+            row : list of integer/floating point numbers
+                elements of the row to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument passed in is valid
+        assert row and isinstance(row, list), \
+            "Argument must be a list of numbers."
+        for i in row:
+            assert isinstance(i, int) or isinstance(i, float), \
+                "Argument must be a list of numbers."
+        m, n = self.get_size()
+        if m:    # Since it may be the first row
+            assert len(row) == n, "Rows must be of same length."
+
+        for j, value in enumerate(row):
+            if value != 0:    # Keep only the nonzero elements
+                self.__indices.append(j)
+                self.__data.append(value)
+            if isinstance(value, float):
+                self.__zero = 0.0
+        self.__indptr.append(len(self.__data))
+        self.__m += 1    # Update number of rows
+        self.__n = len(row)    # Update number of columns
+
+        return
+
+    def delete_row(self, row):
+        """
+        Removes a specified row of the matrix, moving all rows below up one.
+
+        Parameters
+        ----------
+            row : integer
+                the number of the row to be removed
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        assert isinstance(row, int), "Row index must be an integer."
+        m, n = self.get_size()
+        assert row > 0 and row <= m, \
+            "Matrix must be defined at the given location."
+        assert m != 1, "Matrix must have more than one row."
+
+        self.__compress()
+        start, stop = self.__indptr[row-1], self.__indptr[row]
+        del self.__indices[start:stop]    # Remove the nonzeros of that row
+        del self.__data[start:stop]
+        count = stop - start
+        self.__indptr[row:] = [k - count for k in self.__indptr[row+1:]]
+        self.__m -= 1
+
+        return
+
+    def add_column(self, column):
+        """
+        Appends a single column to the end of the matrix.
+
+        Parameters
+        ----------
+            column : list of integer/floating point numbers
+                elements of the column to be added to the matrix
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument passed in is valid
+        assert column and isinstance(column, list), \
+            "Argument must be a list of numbers."
+        for i in column:
+            assert isinstance(i, int) or isinstance(i, float), \
+                "Argument must be a list of numbers."
+        m, n = self.get_size()
+        assert len(column) == m, "Columns must be of same length."
+
+        # The new column is last, so its nonzeros go at the end of each row
+        for i, value in enumerate(column):
+            if value != 0:
+                self.__pending[(i, n)] = value
+            if isinstance(value, float):
+                self.__zero = 0.0
+        self.__n += 1    # Update number of columns
+
+        return
+
+    def delete_column(self, column):
+        """
+        Removes a specified column of the matrix, moving all columns to the
+        right to the left by one.
+
+        Parameters
+        ----------
+            column : integer
+                the number of the column to be removed
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        assert isinstance(column, int), "Column index must be an integer."
+        m, n = self.get_size()
+        assert column > 0 and column <= n, \
+            "Matrix must be defined at the given location."
+        assert n != 1, "Matrix must have more than one column."
+
+        # Rebuild the rows in one pass, dropping the column and shifting the
+        # ones after it to the left
+        self.__compress()
+        indptr, indices, data = [0], [], []
+        for i, columns, values in self.__row_items():
+            for j, value in zip(columns, values):
+                if j != column-1:
+                    indices.append(j if j < column-1 else j-1)
+                    data.append(value)
+            indptr.append(len(data))
+        self.__indptr, self.__indices, self.__data = indptr, indices, data
+        self.__n -= 1
+
+        return
+
+    def scalar_multiply(self, number):
+        """
+        Multiplies each element of the matrix by some scalar number.
+
+        Parameters
+        ----------
+            number : integer/floating point number
+                the scalar number for the matrix to be mutiplied by
+
+        Returns
+        -------
+            None, but updates the existing matrix
+        """
+
+        # Ensure argument is valid
+        assert isinstance(number, int) or isinstance(number, float), \
+            "Argument must be a number."
+
+        self.__compress()
+        if isinstance(number, float):
+            self.__zero = 0.0
+        if number == 0:    # Every element becomes zero
+            self.__indptr = [0]*(self.__m + 1)
+            self.__indices = []
+            self.__data = []
+        else:    # Only the nonzero elements need multiplying
+            self.__data = [i*number for i in self.__data]
+
+        return
+
+    def matrix_add(self, otherMatrix):
+        """
+        Produces the resultant matrix from adding two matrices together, the
+        other of which may be sparse or dense. The result is sparse if its
+        density is at most SPARSE_THRESHOLD, and dense otherwise.
+
+        Parameters
+        ----------
+            otherMatrix : object of class SparseMatrix/Matrix
+                the other matrix to be added to the active matrix
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix/Matrix
+                the resultant matrix from the addition of the other matrices
+        """
+
+        # Ensure argument is valid
+        assert isinstance(otherMatrix, (SparseMatrix, Matrix)), \
+            "Argument must be a matrix."
+        m1, n1 = self.get_size()
+        m2, n2 = otherMatrix.get_size()
+        assert m1 == m2 and n1 == n2, "Matrices must be the same size."
+
+        if isinstance(otherMatrix, Matrix):
+            # Add the nonzeros of this matrix onto the dense elements
+            rows = [otherMatrix.get_row(i) for i in range(1, m1+1)]
+            for i, columns, values in self.__row_items():
+                row = rows[i]
+                for j, value in zip(columns, values):
+                    row[j] += value
+            newMatrix = SparseMatrix.__from_dense_rows(rows, n1, self.__zero)
+            return(newMatrix)
+
+        # Merge the nonzeros of the two matrices row by row
+        rows = []
+        for (i, columns1, values1), (k, columns2, values2) in \
+                zip(self.__row_items(), otherMatrix.__row_items()):
+            row = dict(zip(columns1, values1))
+            for j, value in zip(columns2, values2):
+                row[j] = row.get(j, 0) + value
+            rows.append(row)
+        newMatrix = SparseMatrix.__from_rows(
+            rows, m1, n1, self.__zero + otherMatrix.__zero).__densify()
+
+        return(newMatrix)
+
+    def matrix_multiply(self, otherMatrix):
+        """
+        Produces the resultant matrix from multiplying two matrices together,
+        the other of which may be sparse or dense. To be clear, this method
+        outputs the result of (self * otherMatrix). Only the nonzero elements
+        of this matrix (and of the other, if sparse) are ever multiplied. The
+        result is sparse if its density is at most SPARSE_THRESHOLD, and
+        dense otherwise.
+
+        Parameters
+        ----------
+            otherMatrix : object of class SparseMatrix/Matrix
+                the other matrix to be multiplied with the active matrix
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix/Matrix
+                the resultant matrix from the multiplication of the other
+                matrices
+        """
+
+        # Ensure argument is valid
+        assert isinstance(otherMatrix, (SparseMatrix, Matrix)), \
+            "Argument must be a matrix."
+        m1, n1 = self.get_size()
+        m2, n2 = otherMatrix.get_size()
+        assert n1 == m2, "Matrices must be of compatible size."
+
+        if isinstance(otherMatrix, Matrix):
+            # Each row of the result is a combination of the rows of the
+            # dense matrix, weighted by the nonzeros of the row of this one
+            otherRows = [otherMatrix.get_row(k) for k in range(1, m2+1)]
+            zero = self.__zero
+            if any(isinstance(y, float) for row in otherRows for y in row):
+                zero = 0.0
+            rows = []
+            for i, columns, values in self.__row_items():
+                row = [zero]*n2
+                for k, value in zip(columns, values):
+                    row = [x + value*y for x, y in zip(row, otherRows[k])]
+                rows.append(row)
+            newMatrix = SparseMatrix.__from_dense_rows(rows, n2, zero)
+            return(newMatrix)
+
+        # Same, for sparse rows accumulated in dictionaries (Gustavson's
+        # algorithm)
+        otherRows = [dict(zip(columns, values))
+                     for i, columns, values in otherMatrix.__row_items()]
+        rows = []
+        for i, columns, values in self.__row_items():
+            row = {}
+            for k, value in zip(columns, values):
+                for j, otherValue in otherRows[k].items():
+                    row[j] = row.get(j, 0) + value*otherValue
+            rows.append(row)
+        newMatrix = SparseMatrix.__from_rows(
+            rows, m1, n2, self.__zero + otherMatrix.__zero).__densify()
+
+        return(newMatrix)
+
+    def transpose(self):
+        """
+        Produces the a matrix equivalent to the transpose of the existing
+        matrix, which is also sparse.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix
+                the transpose of the original matrix
+        """
+
+        # Bucket the nonzeros by column; going through the rows in order
+        # keeps each bucket sorted by row
+        m, n = self.get_size()
+        rows = [{} for j in range(n)]
+        for i, columns, values in self.__row_items():
+            for j, value in zip(columns, values):
+                rows[j][i] = value
+        newMatrix = SparseMatrix.__from_rows(rows, n, m, self.__zero)
+
+        return(newMatrix)
+
+    def __densify(self):
+        """
+        Gives the matrix in whichever form suits its density: itself if its
+        density is at most SPARSE_THRESHOLD, or else as a dense Matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            matrix : object of class SparseMatrix/Matrix
+                the matrix in the suitable form
+        """
+
+        if self.density() > SPARSE_THRESHOLD:
+            return(self.to_dense())
+
+        return(self)
+
+    @classmethod
+    def __from_rows(cls, rows, m, n, zero=0):
+        """
+        Creates a sparse matrix from a dictionary of the columns and values
+        of the elements of each row. Zero values are dropped.
+
+        Parameters
+        ----------
+            rows : list of dictionaries from integers to numbers
+                zero-based column and value of each element of each row
+            m : integer
+                number of rows in the matrix
+            n : integer
+                number of columns in the matrix
+            zero : integer/floating point number
+                value of the elements which are not stored (0 or 0.0)
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix
+                the m x n matrix of the given elements
+        """
+
+        newMatrix = cls.__new__(cls)
+        newMatrix.__m = m
+        newMatrix.__n = n
+        newMatrix.__pending = {}
+        newMatrix.__zero = zero
+        indptr, indices, data = [0], [], []
+        for row in rows:
+            for j in sorted(row):
+                if row[j] != 0:
+                    indices.append(j)
+                    data.append(row[j])
+            indptr.append(len(data))
+        newMatrix.__indptr = indptr
+        newMatrix.__indices = indices
+        newMatrix.__data = data
+
+        return(newMatrix)
+
+    @classmethod
+    def __from_dense_rows(cls, rows, n, zero=0, dense=True):
+        """
+        Creates a matrix from the rows of all its elements, as a SparseMatrix
+        if its density is at most SPARSE_THRESHOLD (or dense is False) and as
+        a Matrix otherwise.
+
+        Parameters
+        ----------
+            rows : list of lists of integer/floating point numbers
+                all the elements of the matrix, row by row
+            n : integer
+                number of columns in the matrix
+            zero : integer/floating point number
+                zero of the operands the elements were worked out from, which
+                becomes 0.0 if any of the elements is a floating point number
+            dense : boolean
+                whether the result may be a Matrix
+
+        Returns
+        -------
+            newMatrix : object of class SparseMatrix/Matrix
+                the matrix in the suitable form
+        """
+
+        m = len(rows)
+        count = sum(len(i) - i.count(0) for i in rows)    # Number of nonzeros
+        if dense and count > SPARSE_THRESHOLD*m*n:
+            newMatrix = Matrix.from_flat([j for i in rows for j in i], m, n)
+        else:
+            if any(isinstance(value, float) for row in rows for value in row):
+                zero = 0.0
+            newMatrix = cls.__from_rows(
+                [{j: value for j, value in enumerate(row) if value != 0}
+                 for row in rows], m, n, zero)
+
+        return(newMatrix)
+
+    def __compress(self):
+        """
+        Merges the changes recorded by set_value() into the compressed rows,
+        in a single pass over the rows.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None, but updates the storage of the matrix
+        """
+
+        if not self.__pending:
+            return
+
+        # Group the changes by row
+        changes = {}
+        for (i, j), value in self.__pending.items():
+            changes.setdefault(i, {})[j] = value
+        indptr, indices, data = [0], [], []
+        for i in range(self.__m):
+            start, stop = self.__indptr[i], self.__indptr[i+1]
+            if i in changes:    # Merge the changes into the row
+                row = dict(zip(self.__indices[start:stop],
+                               self.__data[start:stop]))
+                row.update(changes[i])
+                for j in sorted(row):
+                    if row[j] != 0:
+                        indices.append(j)
+                        data.append(row[j])
+            else:    # Row is unchanged
+                indices.extend(self.__indices[start:stop])
+                data.extend(self.__data[start:stop])
+            indptr.append(len(data))
+        self.__indptr, self.__indices, self.__data = indptr, indices, data
+        self.__pending = {}
+
+        return
+
+    def __row_items(self):
+        """
+        Iterates over the rows of the matrix, giving the zero-based columns
+        and the values of the nonzero elements of each.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            rows : generator of (integer, list, list) tuples
+                index, columns and values of the nonzeros of each row
+        """
+
+        self.__compress()
+        indptr, indices, data = self.__indptr, self.__indices, self.__data
+
+        return((i, indices[indptr[i]:indptr[i+1]], data[indptr[i]:indptr[i+1]])
+               for i in range(self.__m))
+
+
+class MatrixExpression:
+    """
+    A class to represent a formula of matrices which has not been worked out
+    yet, built with the operators of Matrix: A @ B for matrix_multiply(),
+    A + B and A - B for matrix_add(), c * A and -A for scalar_multiply(),
+    and A.T for transpose().
+
+    Nothing is computed until the result is needed, through evaluate() or
+    the first access to an element. The whole formula is then evaluated at
+    once, which avoids most of the intermediate matrices of the equivalent
+    chain of method calls:
+        - transposes are moved down onto the matrices they apply to, and
+          read through their strides rather than copied, so that A.T @ B
+          multiplies by the columns of A directly
+        - sums, differences and multiples are merged into a single linear
+          combination (see Matrix.linear_combination), computed in one pass
+          over the elements
+        - products of several matrices are worked out in the cheapest
+          order (see Matrix.chain_multiply)
+        - subexpressions that appear more than once, such as A @ B in
+          (A @ B) + 2 * (A @ B), are only computed once
+    The result is kept until one of the matrices of the formula changes, so
+    it is only evaluated again after a change. Since sums of multiples are
+    multiplied out, floating point results may differ from the chain of
+    method calls in the last bits. Sparse matrices cannot be used in
+    formulas; they are combined with matrix_add() and matrix_multiply().
+
+    Attributes
+    ----------
+        operation : string
+            "matrix" for a matrix itself, "add", "subtract", "scale",
+            "multiply" or "transpose"
+        operands : tuple
+            the matrix (for "matrix"), or the expressions operated on
+        scalar : integer/floating point number/None
+            the number multiplied by, for "scale"
+
+    Methods
+    -------
+        get_size() :
+            gives the size of the result (for an m x n result)
+        get_value(row, column) :
+            gives the value of a specified element of the result
+        evaluate() :
+            works out the result of the expression, as a matrix
+
+    Example Usage
+    -------------
+        A = Matrix([[1,2],[3,4]])
+        B = Matrix([[5,6],[7,8]])
+        E = 2 * (A @ B) - A.T    # Nothing computed yet
+        C = E.evaluate()    # Matrix object of the result
+        E.get_value(1, 2)    # Element of the result
+    """
+
+    __slots__ = ("operation", "operands", "scalar", "__size", "__result",
+                 "__stamps")
+
+    def __init__(self, operation, operands, scalar=None):
+        """
+        Instantiates the expression, checking that the sizes of its operands
+        are compatible.
+
+        Parameters
+        ----------
+            operation : string
+                the operation of the expression (see the class attributes)
+            operands : tuple
+                the matrix or expressions operated on
+            scalar : integer/floating point number/None
+                the number multiplied by, for "scale"
+
+        Returns
+        -------
+            None, but instantiates the expression
+        """
+
+        if operation == "matrix":
+            assert isinstance(operands[0], Matrix), \
+                "Argument must be a matrix."
+        size = operands[0].get_size()
+        if operation in ("add", "subtract"):
+            assert size == operands[1].get_size(), \
+                "Matrices must be the same size."
+        elif operation == "multiply":
+            m2, n2 = operands[1].get_size()
+            assert size[1] == m2, "Matrices must be of compatible size."
+            size = (size[0], n2)
+        elif operation == "transpose":
+            size = (size[1], size[0])
+
+        self.operation = operation
+        self.operands = tuple(operands)
+        self.scalar = scalar
+        self.__size = size
+        self.__result = None
+        self.__stamps = None
+
+        return
+
+    def __str__(self):
+        """
+        Gives a string representation of the result of the expression,
+        evaluating it if needed.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            matrixString : string
+                string representation of the resulting matrix
+        """
+
+        return(str(self.__evaluated()))
+
+    def __repr__(self):
+        """
+        Gives an official string representation of the expression, without
+        evaluating it.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            expressionString : string
+                official string representation of the expression, containing
+                the size of its result and the object's id
+        """
+
+        m, n = self.get_size()
+        expressionString = \
+            "{} x {} MatrixExpression object with id of {}.".format(
+                m, n, str(id(self)))    # Set up message
+
+        return(expressionString)
+
+    def __add__(self, otherMatrix):
+        otherMatrix = _as_expression(otherMatrix)
+        if otherMatrix is None:
+            return(NotImplemented)
+        return(MatrixExpression("add", (self, otherMatrix)))
+
+    def __sub__(self, otherMatrix):
+        otherMatrix = _as_expression(otherMatrix)
+        if otherMatrix is None:
+            return(NotImplemented)
+        return(MatrixExpression("subtract", (self, otherMatrix)))
+
+    def __mul__(self, number):
+        if not (isinstance(number, int) or isinstance(number, float)):
+            return(NotImplemented)
+        return(MatrixExpression("scale", (self,), number))
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return(MatrixExpression("scale", (self,), -1))
+
+    def __matmul__(self, otherMatrix):
+        otherMatrix = _as_expression(otherMatrix)
+        if otherMatrix is None:
+            return(NotImplemented)
+        return(MatrixExpression("multiply", (self, otherMatrix)))
+
+    @property
+    def T(self):
+        return(MatrixExpression("transpose", (self,)))
+
+    def get_size(self):
+        """
+        Gives the size of the result of the expression, without evaluating
+        it.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            m : integer
+                number of rows in the result
+            n : integer
+                number of columns in the result
+        """
+
+        m, n = self.__size
+
+        return(m, n)
+
+    def get_value(self, row, column):
+        """
+        Gives the value of an element of the result of the expression,
+        evaluating it if needed.
+
+        Parameters
+        ----------
+            row : integer
+                the row number of the desired element
+            column : integer
+                the column number of the desired element
+
+        Returns
+        -------
+            value : integer/floating point number
+                the value of the element at the specified location
+        """
+
+        value = self.__evaluated().get_value(row, column)
+
+        return(value)
+
+    def evaluate(self):
+        """
+        Works out the result of the expression, the first time it is called
+        or after a change to one of its matrices, and gives a copy of it as a
+        new matrix, so that changes to the matrix given do not reach later
+        evaluations.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the result of the expression
+        """
+
+        newMatrix = self.__evaluated().copy()
+
+        return(newMatrix)
+
+    def __evaluated(self):
+        """
+        Gives the result of the expression, for reading without copying,
+        working it out the first time it is needed and again whenever one
+        of its matrices has changed since (see Matrix.cache_info()).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            result : object of class Matrix
+                the result of the expression, which must not be changed
+        """
+
+        matrices = {}
+        node = self.__normalize(False, matrices)
+        stamps = [i._version_stamp() for i in matrices.values()]
+        if self.__result is None or None in stamps or \
+                stamps != self.__stamps:
+            if node[0] == "matrix":    # Copy rather than give the operand
+                node = ("linear", ((node, 1),))
+            self.__result = _evaluate_node(node, matrices, {})
+            self.__stamps = stamps
+
+        return(self.__result)
+
+    def __normalize(self, transposed, matrices):
+        """
+        Rewrites the expression (or its transpose) in a normal form made of
+        nested tuples, which compare equal whenever two subexpressions do
+        the same work:
+            - ("matrix", id, transposed) for a matrix or its transpose
+            - ("multiply", left, right) for a product
+            - ("linear", ((term, coefficient), ...)) for a sum of multiples
+              of distinct terms, none of which are themselves sums
+        Transposes are moved down to the matrices, using (A + B)^T =
+        A^T + B^T and (A B)^T = B^T A^T.
+
+        Parameters
+        ----------
+            transposed : boolean
+                whether to give the normal form of the transpose
+            matrices : dictionary
+                the matrices of the expression by their ids, filled in here
+
+        Returns
+        -------
+            node : tuple
+                the normal form of the expression
+        """
+
+        operation = self.operation
+        if operation == "matrix":
+            matrix = self.operands[0]
+            matrices[id(matrix)] = matrix
+            return(("matrix", id(matrix), transposed))
+        if operation == "transpose":
+            return(self.operands[0].__normalize(not transposed, matrices))
+        if operation == "multiply":
+            left, right = self.operands
+            if transposed:
+                left, right = right, left
+            return(("multiply", left.__normalize(transposed, matrices),
+                    right.__normalize(transposed, matrices)))
+
+        if operation == "add":
+            factors = (1, 1)
+        elif operation == "subtract":
+            factors = (1, -1)
+        else:
+            factors = (self.scalar,)
+        # Collect the terms of the operands, adding up repeated terms
+        terms = {}
+        for operand, factor in zip(self.operands, factors):
+            node = operand.__normalize(transposed, matrices)
+            for term, coefficient in \
+                    node[1] if node[0] == "linear" else ((node, 1),):
+                terms[term] = terms.get(term, 0) + factor*coefficient
+        node = ("linear", tuple(terms.items()))
+
+        return(node)
+
+
+class LUFactorization:
+    """
+    A class to represent the LU factorization of a square matrix with
+    partial pivoting, P A = L U, as given by Matrix.lu(). Working out the
+    factors takes O(n^3) operations, once; after that each solve takes
+    O(n^2) operations per right-hand side, so one factorization serves any
+    number of systems with the same matrix.
+
+    The factors are kept packed together in a single list of rows, with U
+    on and above the diagonal and the multipliers of L (whose diagonal is
+    all ones) below it, along with the permutation of the rows. Their
+    elements are floating point numbers, whatever the elements of the
+    matrix were, except for matrices of object dtype, which are factorized
+    exactly (with integers and other rationals as fractions).
+
+    Methods
+    -------
+        get_size() :
+            gives the size of the factorized matrix
+        get_factors() :
+            gives L, U and the permutation of the rows as separate objects
+        is_singular() :
+            determines if the factorized matrix is singular
+        solve(b) :
+            solves the system A x = b for a right-hand side
+        solve_many(B) :
+            solves the system A X = B for a matrix of right-hand sides
+        inverse() :
+            gives the inverse of the factorized matrix
+        determinant() :
+            gives the value of the determinant of the factorized matrix
+
+    Example Usage
+    -------------
+        factors = A.lu()
+        x = factors.solve([1,2,3])    # List of the solution
+        X = factors.solve_many(B)    # Matrix of the solutions, by column
+    """
+
+    __slots__ = ("__rows", "__permutation", "__sign", "__compact", "__dtype",
+                 "__integers")
+
+    def __init__(self, rows, permutation, sign, compact=False, dtype=None,
+                 integers=None):
+        """
+        Instantiates the factorization around factors already worked out
+        (see Matrix.lu()).
+
+        Parameters
+        ----------
+            rows : list of lists of floating point numbers
+                the rows of L and U packed together
+            permutation : list of integers
+                for each row of the factors, the zero-based index of the row
+                of the matrix it came from
+            sign : integer
+                1 or -1, the sign of the permutation
+            compact : boolean
+                whether to give matrices in compact storage
+            dtype : string/None
+                the dtype of the matrices given (see DTYPES), with "object"
+                for exact factors, or None
+            integers : list of lists of integers/None
+                the rows of the factorized matrix, if it holds only
+                integers, for its exact determinant
+
+        Returns
+        -------
+            None, but creates the factorization
+        """
+
+        self.__rows = rows
+        self.__permutation = permutation
+        self.__sign = sign
+        self.__compact = compact
+        self.__dtype = dtype
+        self.__integers = integers
+
+        return
+
+    def __repr__(self):
+        n = len(self.__rows)
+        return("LUFactorization({} x {})".format(n, n))
+
+    def get_size(self):
+        """
+        Gives the size of the factorized matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            m : integer
+                number of rows in the matrix (for an m x n matrix)
+            n : integer
+                number of columns in the matrix (for an m x n matrix)
+        """
+
+        n = len(self.__rows)
+
+        return(n, n)
+
+    def get_factors(self):
+        """
+        Gives the factors as separate objects, such that the rows of the
+        matrix taken in the order of the permutation are L U.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            L : object of class Matrix
+                the unit lower triangular factor
+            U : object of class Matrix
+                the upper triangular factor
+            permutation : list of integers
+                for each row of L U, the one-based index of the row of the
+                matrix it is
+        """
+
+        n = len(self.__rows)
+        kind = int if self.__dtype == "object" else float
+        lower = [[row[j] if j < i else kind(i == j) for j in range(n)]
+                 for i, row in enumerate(self.__rows)]
+        upper = [[row[j] if j >= i else kind(0) for j in range(n)]
+                 for i, row in enumerate(self.__rows)]
+        L = Matrix(lower, compact=self.__compact, dtype=self.__dtype)
+        U = Matrix(upper, compact=self.__compact, dtype=self.__dtype)
+        permutation = [i + 1 for i in self.__permutation]
+
+        return(L, U, permutation)
+
+    def is_singular(self):
+        """
+        Determines if the factorized matrix is singular, which is when U has
+        a zero on its diagonal. (Nearly singular matrices are not detected,
+        but give solutions with large rounding errors.)
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            singular : boolean
+                whether the matrix is singular
+        """
+
+        singular = any(row[i] == 0 for i, row in enumerate(self.__rows))
+
+        return(singular)
+
+    def solve(self, b):
+        """
+        Solves the system of linear equations A x = b, by forward and then
+        back substitution through the factors, in O(n^2) operations.
+
+        Parameters
+        ----------
+            b : list of integer/floating point numbers, or object of class
+                Matrix
+                the right-hand side, with one number for each row of the
+                matrix; a matrix is solved for each of its columns, as by
+                solve_many()
+
+        Returns
+        -------
+            x : list of floating point numbers, or object of class Matrix
+                the solution, of the same kind as the right-hand side
+        """
+
+        if isinstance(b, Matrix):
+            x = self.solve_many(b)
+            return(x)
+
+        # Ensure arguments are valid
+        n = len(self.__rows)
+        assert isinstance(b, list) and len(b) == n, \
+            "Argument must be a list of one number for each row."
+        types = _OBJECT_TYPES if self.__dtype == "object" else (int, float)
+        for i in b:
+            assert isinstance(i, types), "Argument must be a list of numbers."
+        assert not self.is_singular(), "Matrix must not be singular."
+
+        # Solve L y = P b, then U x = y
+        rows = self.__rows
+        y = []
+        for i in range(n):
+            y.append(b[self.__permutation[i]] - sum(map(mul, rows[i][:i], y)))
+        x = [0.0]*n
+        for i in range(n-1, -1, -1):
+            row = rows[i]
+            x[i] = (y[i] - sum(map(mul, row[i+1:], x[i+1:])))/row[i]
+
+        return(x)
+
+    def solve_many(self, B):
+        """
+        Solves the system of linear equations A X = B for every column of B
+        at once, in O(n^2 k) operations for k columns.
+
+        Parameters
+        ----------
+            B : object of class Matrix, or list of lists of integer/floating
+                point numbers
+                the right-hand sides, one in each column, with as many rows
+                as the matrix (given as a matrix or a list of its rows)
+
+        Returns
+        -------
+            X : object of class Matrix
+                the solutions, one in each column
+        """
+
+        # Ensure arguments are valid
+        n = len(self.__rows)
+        if isinstance(B, list):    # Rows of the right-hand sides
+            B = Matrix(B, dtype="object" if self.__dtype == "object" else
+                       None)
+        assert isinstance(B, Matrix), "Argument must be a matrix."
+        assert B.get_size()[0] == n, "Matrices must be of compatible size."
+        assert not self.is_singular(), "Matrix must not be singular."
+
+        k = B.get_size()[1]
+        right = [B.get_row(i + 1) for i in self.__permutation]
+        if self.__dtype != "object" and _uses_numpy(n*n*k):
+            solution = _numpy_lu_solve(self.__rows, right)
+        else:
+            solution = _lu_solve(self.__rows, right)
+        X = Matrix.from_flat([j for i in solution for j in i], n, k,
+                             compact=self.__compact, dtype=self.__dtype)
+
+        return(X)
+
+    def inverse(self):
+        """
+        Gives the inverse of the factorized matrix, by solving for each
+        column of the identity matrix.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            inverseMatrix : object of class Matrix
+                the inverse of the matrix
+        """
+
+        n = len(self.__rows)
+        inverseMatrix = self.solve_many(Matrix.identity(n))
+
+        return(inverseMatrix)
+
+    def determinant(self):
+        """
+        Gives the determinant of the factorized matrix, the product of the
+        diagonal of U with the sign of the permutation, in O(n) operations,
+        or 0 for a singular matrix. As for Matrix.determinant(), the
+        determinant of a matrix of integers is an exact integer, worked out
+        by fraction-free elimination of a copy of the matrix, in O(n^3)
+        operations.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            value : integer/floating point number/number
+                the value of the determinant (exact for object dtype)
+        """
+
+        if self.__integers is not None:
+            value = _bareiss_determinant([list(i) for i in self.__integers])
+            return(value)
+        exact = self.__dtype == "object"
+        if self.is_singular():
+            return(0 if exact else 0.0)
+        value = self.__sign if exact else float(self.__sign)
+        for i, row in enumerate(self.__rows):
+            value *= row[i]
+
+        return(value)
+
+
+class MatrixBatch:
+    """
+    A class to represent a batch of matrices all of the same size, such as
+    many small transforms, kept together in one flat buffer (the elements
+    of the first matrix in row-major order, then those of the second, and
+    so on). Operations on a batch work on every matrix in it at once, with
+    the checks and dispatch done once for the batch rather than once for
+    each matrix, and with unrolled kernels for 2 x 2, 3 x 3 and 4 x 4
+    matrices. As for Matrix, the buffer is a list by default, or an array
+    of machine integers ('q') or doubles ('d') in compact mode, which is
+    handed over to NumPy for large batches of doubles. A batch of matrices
+    sharing a dtype (see DTYPES) keeps it, promoted as for Matrix by
+    operations with other batches and matrices, and gives matrices of it.
+
+    Methods
+    -------
+        get_count() :
+            gives the number of matrices in the batch
+        get_size() :
+            gives the size of each matrix in the batch
+        get_matrix(k) :
+            gives a copy of one matrix of the batch
+        to_matrices() :
+            gives copies of all the matrices of the batch
+        is_compact() :
+            determines if the batch is stored as a compact array
+        matrix_add(other) :
+            adds two batches, or a matrix to every matrix of a batch
+        matrix_multiply(other) :
+            multiplies two batches, or every matrix of a batch by a matrix
+        transpose() :
+            transposes every matrix of the batch
+        determinant() :
+            gives the determinant of every matrix of the batch
+        from_flat(values, count, m, n) :
+            creates a batch of count m x n matrices from its elements
+
+    Example Usage
+    -------------
+        A = MatrixBatch([[[1,2],[3,4]], [[0,1],[1,0]]])    # Two 2 x 2
+        B = MatrixBatch([Matrix.identity(2)]*2)    # From matrices
+        C = A.matrix_multiply(B).transpose()    # Still two 2 x 2
+        D = A.matrix_multiply(Matrix([[0,1],[1,0]]))    # Same matrix for all
+        values = A.determinant()    # [-2, -1]
+    """
+
+    __slots__ = ("__data", "__count", "__m", "__n", "__dtype")
+
+    def __init__(self, matrices, compact=False):
+        """
+        Instantiates the batch from a list of matrices of the same size.
+
+        Parameters
+        ----------
+            matrices : list of objects of class Matrix, or of lists of
+                lists of integer/floating point numbers
+                the matrices of the batch, each as a Matrix or as a list of
+                its rows
+            compact : boolean
+                whether to store the elements in a compact array, as 64-bit
+                integers if they all are integers and as doubles otherwise
+                (but never for matrices of the "object" dtype)
+
+        Returns
+        -------
+            None, but creates the batch
+        """
+
+        # Ensure arguments passed in are valid
+        assert matrices and isinstance(matrices, list), \
+            "Argument must be a list of matrices."
+        values = []
+        size = None
+        dtypes = set()
+        for i in matrices:
+            if isinstance(i, Matrix):
+                dtypes.add(i.get_dtype())
+                m, n = i.get_size()
+                rows = [i.get_row(j + 1) for j in range(m)]
+            else:
+                assert i and isinstance(i, list), \
+                    "Argument must be a list of matrices."
+                rows = i
+                dtypes.add(None)
+                m = len(rows)
+                n = len(rows[0]) if isinstance(rows[0], list) else None
+                for j in rows:
+                    assert isinstance(j, list) and len(j) == n, \
+                        "Each row must have the same number of elements."
+            if size is None:
+                size = (m, n)
+            assert (m, n) == size, "Matrices must all be of the same size."
+            for j in rows:
+                values.extend(j)
+        _check_size(m, n)
+        dtype = dtypes.pop() if len(dtypes) == 1 else None
+
+        self.__data = MatrixBatch.__checked(values, compact, dtype)
+        self.__count = len(matrices)
+        self.__m = m
+        self.__n = n
+        self.__dtype = dtype
+
+        return
+
+    def __str__(self):
+        """
+        Gives a string representation of the batch, as the grids of numbers
+        of its matrices separated by blank lines.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            batchString : string
+                the matrices of the batch in printable form
+        """
+
+        batchString = "\n\n".join(str(i) for i in self.to_matrices())
+
+        return(batchString)
+
+    def __repr__(self):
+        return("MatrixBatch({} matrices of {} x {})".format(
+            self.__count, self.__m, self.__n))
+
+    def __len__(self):
+        return(self.__count)
+
+    @classmethod
+    def from_flat(cls, values, count, m, n, compact=False):
+        """
+        Creates a batch from a flat sequence of its elements, the m*n
+        elements of each matrix in row-major order, one matrix after
+        another. This is the fastest way to build a large batch.
+
+        Parameters
+        ----------
+            values : iterable of integer/floating point numbers
+                the count*m*n elements of the batch
+            count : integer
+                number of matrices in the batch
+            m : integer
+                number of rows in each matrix
+            n : integer
+                number of columns in each matrix
+            compact : boolean
+                whether to store the elements in a compact array
+
+        Returns
+        -------
+            newBatch : object of class MatrixBatch
+                the batch of the values
+        """
+
+        # Ensure arguments are valid
+        _check_size(m, n)
+        assert isinstance(count, int) and count > 0, \
+            "Count must be a positive integer."
+        values = list(values)
+        assert len(values) == count*m*n, "Number of values must be count*m*n."
+
+        newBatch = cls.__from_storage(cls.__checked(values, compact), count,
+                                      m, n)
+
+        return(newBatch)
+
+    def get_count(self):
+        """
+        Gives the number of matrices in the batch.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            count : integer
+                number of matrices in the batch
+        """
+
+        return(self.__count)
+
+    def get_size(self):
+        """
+        Gives the size of each matrix in the batch.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            m : integer
+                number of rows in each matrix (for m x n matrices)
+            n : integer
+                number of columns in each matrix (for m x n matrices)
+        """
+
+        return(self.__m, self.__n)
+
+    def get_matrix(self, k):
+        """
+        Gives a copy of one matrix of the batch.
+
+        Parameters
+        ----------
+            k : integer
+                one-based index of the matrix within the batch
+
+        Returns
+        -------
+            newMatrix : object of class Matrix
+                the matrix, with storage of its own
+        """
+
+        # Ensure argument is valid
+        assert isinstance(k, int), "Index must be an integer."
+        assert 1 <= k <= self.__count, "Index must be within the batch."
+
+        size = self.__m*self.__n
+        newMatrix = Matrix.from_flat(self.__data[(k-1)*size:k*size],
+                                     self.__m, self.__n,
+                                     compact=self.is_compact(),
+                                     dtype=self.__dtype)
+
+        return(newMatrix)
+
+    def to_matrices(self):
+        """
+        Gives copies of all the matrices of the batch.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            matrices : list of objects of class Matrix
+                the matrices, in order
+        """
+
+        matrices = [self.get_matrix(k + 1) for k in range(self.__count)]
+
+        return(matrices)
+
+    def is_compact(self):
+        """
+        Determines if the batch is stored as a compact array.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            compact : boolean
+                whether the elements are kept in an array
+        """
+
+        compact = _typecode(self.__data) is not None
+
+        return(compact)
+
+    def matrix_add(self, other):
+        """
+        Adds another batch of the same size to the batch, matrix by matrix,
+        or adds a single matrix to every matrix of the batch, in one pass
+        over the elements.
+
+        Parameters
+        ----------
+            other : object of class MatrixBatch/Matrix
+                the batch to be added, or the matrix to add to each matrix
+
+        Returns
+        -------
+            newBatch : object of class MatrixBatch
+                the batch of the sums
+        """
+
+        # Ensure arguments are valid
+        data, count, typecode, dtype = self.__operand(other)
+        assert other.get_size() == (self.__m, self.__n), \
+            "Matrices must be of the same size."
+
+        work = self.__count*self.__m*self.__n
+        if typecode == 'd' and _uses_numpy(work):
+            arr = _numpy_batch(self.__data, self.__count, 1, -1) + \
+                _numpy_batch(data, count, 1, -1)
+            newData = array('d', arr.tobytes())
+        else:
+            if count == 1:    # The same matrix for each matrix of the batch
+                data = data*self.__count
+            newData = _storage(list(map(add, self.__data, data)), typecode)
+        newBatch = MatrixBatch.__from_storage(newData, self.__count,
+                                              self.__m, self.__n, dtype)
+
+        return(newBatch)
+
+    def matrix_multiply(self, other):
+        """
+        Multiplies each matrix of the batch by the matrix in the same place
+        of another batch, or every matrix of the batch by a single matrix,
+        all in one call. Square 2 x 2, 3 x 3 and 4 x 4 products use unrolled
+        kernels, and large batches of doubles are handed over to NumPy.
+
+        Parameters
+        ----------
+            other : object of class MatrixBatch/Matrix
+                the batch of matrices to multiply by, or the single matrix
+                to multiply each matrix by (on the right)
+
+        Returns
+        -------
+            newBatch : object of class MatrixBatch
+                the batch of the products
+        """
+
+        # Ensure arguments are valid
+        data, count, typecode, dtype = self.__operand(other)
+        n, p = other.get_size()
+        assert self.__n == n, "Matrices must be of compatible size."
+
+        m, k = self.__m, self.__count
+        if typecode == 'd' and _uses_numpy(k*m*n*p):
+            arr = numpy.matmul(_numpy_batch(self.__data, k, m, n),
+                               _numpy_batch(data, count, n, p))
+            newData = array('d', arr.tobytes())
+        else:
+            step = 0 if count == 1 else n*p    # Reuse a single matrix
+            kernel = _BATCH_MULTIPLY_KERNELS.get((m, n, p))
+            if kernel is not None:
+                values = kernel(self.__data, data, k, step)
+            else:
+                values = _batch_multiply(self.__data, data, k, step, m, n, p)
+            newData = _storage(values, typecode)
+        newBatch = MatrixBatch.__from_storage(newData, k, m, p, dtype)
+
+        return(newBatch)
+
+    def transpose(self):
+        """
+        Transposes every matrix of the batch, by moving each element
+        position of all the matrices at once (m*n slice copies in all,
+        whatever the number of matrices).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            newBatch : object of class MatrixBatch
+                the batch of the transposes
+        """
+
+        m, n = self.__m, self.__n
+        size = m*n
+        data = self.__data
+        newData = data[:]
+        for i in range(m):
+            for j in range(n):
+                newData[j*m+i::size] = data[i*n+j::size]
+        newBatch = MatrixBatch.__from_storage(newData, self.__count, n, m,
+                                              self.__dtype)
+
+        return(newBatch)
+
+    def determinant(self):
+        """
+        Computes the determinant of every matrix of a batch of square
+        matrices. Matrices of size 2, 3 and 4 use closed-form cofactor
+        expansions, which are exact for integers; larger ones are
+        eliminated one by one, as by Matrix.determinant().
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            values : list of integer/floating point numbers
+                the determinant of each matrix, in order
+        """
+
+        # Ensure batch is valid for determinant operation
+        n = self.__m
+        assert n == self.__n, "Matrices must be square."
+
+        data = self.__data
+        k = self.__count
+        if _typecode(data) == 'd' and _uses_numpy(k*n**3):
+            arr = _numpy_batch(data, k, n, n)
+            values = numpy.linalg.det(arr).tolist()
+        elif n in _BATCH_DETERMINANT_KERNELS:
+            values = _BATCH_DETERMINANT_KERNELS[n](data, k)
+        else:
+            values = []
+            size = n*n
+            for start in range(0, k*size, size):
+                rows = [_as_list(data[i:i+n])
+                        for i in range(start, start+size, n)]
+                if all(isinstance(j, int) for i in rows for j in i):
+                    values.append(_bareiss_determinant(rows))
+                else:
+                    values.append(_lu_determinant(rows))
+
+        return(values)
+
+    def __operand(self, other):
+        """
+        Gives the flat elements of the other operand of a batch operation,
+        checking that it is a batch of the same number of matrices or a
+        single matrix, along with the storage type and dtype for the result.
+
+        Parameters
+        ----------
+            other : object of class MatrixBatch/Matrix
+                the other operand
+
+        Returns
+        -------
+            data : list/array of integer/floating point numbers
+                the elements of the operand, one matrix after another
+            count : integer
+                number of matrices in the operand (1 for a single matrix)
+            typecode : string/None
+                'q' or 'd' for a compact result, None for a list
+            dtype : string/None
+                the promoted dtype of the result
+        """
+
+        if isinstance(other, MatrixBatch):
+            assert other.__count == self.__count, \
+                "Batches must have the same number of matrices."
+            data, count, dtype = other.__data, other.__count, other.__dtype
+        else:
+            assert isinstance(other, Matrix), \
+                "Argument must be a batch or a matrix."
+            m, n = other.get_size()
+            data = [j for i in range(m) for j in other.get_row(i + 1)]
+            if other.is_compact():
+                data = array(_compact_typecode([data]), data)
+            count, dtype = 1, other.get_dtype()
+        typecode = _result_typecode(self.__data, data)
+        dtype = _result_dtype(self.__dtype, dtype)
+
+        return(data, count, typecode, dtype)
+
+    @staticmethod
+    def __checked(values, compact, dtype=None):
+        """
+        Builds the storage buffer of a batch from a list of its elements,
+        checking them according to the module-wide validation policy.
+
+        Parameters
+        ----------
+            values : list of integer/floating point numbers
+                the elements of the batch
+            compact : boolean
+                whether to store the elements in a compact array
+            dtype : string/None
+                the dtype of the matrices of the batch, if any
+
+        Returns
+        -------
+            data : list/array of integer/floating point numbers
+                the storage buffer
+        """
+
+        if compact and dtype != "object":    # Arrays check while copying
+            data = _storage(values, _compact_typecode([values]))
+        else:
+            if VALIDATION_POLICY != "trusted":
+                types = _OBJECT_TYPES if dtype == "object" else (int, float)
+                for i in values:
+                    assert isinstance(i, types), \
+                        "Argument must be a list of numbers."
+            data = values
+
+        return(data)
+
+    @classmethod
+    def __from_storage(cls, data, count, m, n, dtype=None):
+        """
+        Creates a batch directly around a storage buffer, without copying or
+        validating it. Only for results that are valid by construction.
+
+        Parameters
+        ----------
+            data : list/array of integer/floating point numbers
+                the count*m*n elements of the batch
+            count : integer
+                number of matrices in the batch
+            m : integer
+                number of rows in each matrix
+            n : integer
+                number of columns in each matrix
+            dtype : string/None
+                the dtype of the matrices of the batch, if any
+
+        Returns
+        -------
+            newBatch : object of class MatrixBatch
+                the batch wrapping the buffer
+        """
+
+        newBatch = cls.__new__(cls)
+        newBatch.__data = data
+        newBatch.__count = count
+        newBatch.__m = m
+        newBatch.__n = n
+        newBatch.__dtype = dtype
+
+        return(newBatch)
+
+
+class MatrixValues:
+    """
+    A live, list of lists style view of the elements of a matrix, returned
+    by Matrix.values. Indexing gives a MatrixRowValues view of one row.
+
+    Attributes
+    ----------
+        matrix : object of class Matrix
+            the matrix whose elements are viewed
+    """
+
+    __slots__ = ("matrix",)
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        return
+
+    def __len__(self):
+        return(self.matrix.get_size()[0])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return([self[k] for k in range(*i.indices(len(self)))])
+        i = _normalize_index(i, len(self))
+        return(MatrixRowValues(self.matrix, i))
+
+    def __iter__(self):
+        return(MatrixRowValues(self.matrix, i) for i in range(len(self)))
+
+    def __eq__(self, other):
+        try:
+            return(len(self) == len(other) and
+                   all(i == j for i, j in zip(self, other)))
+        except TypeError:
+            return(NotImplemented)
+
+    def __repr__(self):
+        return(repr([list(i) for i in self]))
+
+
+class MatrixRowValues:
+    """
+    A live, list style view of the elements of one row of a matrix.
+
+    Attributes
+    ----------
+        matrix : object of class Matrix
+            the matrix whose elements are viewed
+        row : integer
+            zero-based index of the row within the matrix
+    """
+
+    __slots__ = ("matrix", "row")
+
+    def __init__(self, matrix, row):
+        self.matrix = matrix
+        self.row = row
+        return
+
+    def __len__(self):
+        return(self.matrix.get_size()[1])
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return([self[k] for k in range(*j.indices(len(self)))])
+        j = _normalize_index(j, len(self))
+        return(self.matrix.get_value(self.row+1, j+1))
+
+    def __setitem__(self, j, value):
+        j = _normalize_index(j, len(self))
+        self.matrix.set_value(self.row+1, j+1, value)
+        return
+
+    def __iter__(self):
+        return(self.matrix.get_value(self.row+1, j+1)
+               for j in range(len(self)))
+
+    def __eq__(self, other):
+        try:
+            return(len(self) == len(other) and
+                   all(i == j for i, j in zip(self, other)))
+        except TypeError:
+            return(NotImplemented)
+
+    def __repr__(self):
+        return(repr(list(self)))
+
+class ProfileStats:
+    """
+    A class to gather statistics on the Matrix operations called while it is
+    active, as given by profile() for use as a context manager:
+
+        with matrix.profile() as stats:
+            C = A.matrix_multiply(B)
+        print(stats)
+
+    For each profiled method (see PROFILED_METHODS), it keeps the number of
+    calls (and of those that raised an error), the wall time spent in them,
+    an estimate of the floating point operations they did, and the number
+    of matrices they made along with the bytes of storage those took. Each
+    call includes the work of the profiled methods it calls in turn, so the
+    statistics of a method are inclusive, while the totals only count calls
+    made from outside them.
+
+    Methods
+    -------
+        record(name, call) :
+            adds the statistics of one call of a method
+        get_operations() :
+            gives the statistics of each method called
+        get_total() :
+            gives the statistics of all the calls together
+    """
+
+    __slots__ = ("__operations", "__total", "__hook")
+
+    def __init__(self, hook=None):
+        """
+        Instantiates the statistics, with nothing recorded.
+
+        Parameters
+        ----------
+            hook : function/None
+                a function to also pass each call to while this is active,
+                as hook(name, call) (see record())
+
+        Returns
+        -------
+            None, but creates the statistics
+        """
+
+        self.__operations = {}
+        self.__total = _profile_record()
+        self.__hook = hook
+
+        return
+
+    def __enter__(self):
+        with _PROFILE_LOCK:
+            _PROFILES.append(self)
+            _instrument()
+        return(self)
+
+    def __exit__(self, *exception):
+        with _PROFILE_LOCK:
+            _PROFILES.remove(self)
+            _instrument()
+        return(False)
+
+    def __str__(self):
+        """
+        Gives the statistics as a table, one line for each method called,
+        slowest first.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            table : string
+                the statistics of each method, under a line of headings
+        """
+
+        lines = ["{:32s}{:>8s}{:>8s}{:>12s}{:>14s}{:>10s}{:>14s}".format(
+            "operation", "calls", "errors", "seconds", "flops", "matrices",
+            "bytes")]
+        for name, record in sorted(self.__operations.items(),
+                                   key=lambda i: -i[1]["seconds"]):
+            lines.append("{:32s}{calls:8d}{errors:8d}{seconds:12.6f}"
+                         "{flops:14d}{matrices:10d}{bytes:14d}".format(
+                             name, **record))
+
+        return("\n".join(lines))
+
+    def __repr__(self):
+        return("ProfileStats({} operations, {} calls)".format(
+            len(self.__operations), self.__total["calls"]))
+
+    def record(self, name, call):
+        """
+        Adds the statistics of one call of a method, and passes them on to
+        the hook of the profile, if any.
+
+        Parameters
+        ----------
+            name : string
+                the class and name of the method, as in "Matrix.transpose"
+            call : dictionary
+                "calls" (1), "errors" (1 if it raised an error, and 0
+                otherwise), "seconds", "flops", "matrices" and "bytes" for
+                the call, and "depth", the number of profiled calls it was
+                made from (0 for calls from outside them)
+
+        Returns
+        -------
+            None, but updates the statistics
+        """
+
+        if name not in self.__operations:
+            self.__operations[name] = _profile_record()
+        records = [self.__operations[name]]
+        if call["depth"] == 0:
+            records.append(self.__total)
+        for record in records:
+            for key in record:
+                record[key] += call[key]
+        if self.__hook is not None:
+            self.__hook(name, call)
+
+        return
+
+    def get_operations(self):
+        """
+        Gives the statistics of each method called while profiling.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            operations : dictionary
+                for each method called, by class and name (such as
+                "Matrix.transpose"), a dictionary of its "calls", "errors",
+                "seconds", "flops", "matrices" and "bytes"
+        """
+
+        operations = {name: dict(record)
+                      for name, record in self.__operations.items()}
+
+        return(operations)
+
+    def get_total(self):
+        """
+        Gives the statistics of all the calls made while profiling, counting
+        only the calls made from outside other profiled methods (whose own
+        statistics already include them).
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            total : dictionary
+                the "calls", "errors", "seconds", "flops", "matrices" and
+                "bytes" of all the calls together
+        """
+
+        total = dict(self.__total)
+
+        return(total)
+
+
+def profile(hook=None):
+    """
+    Profiles the Matrix operations called within a with block:
+
+        with matrix.profile() as stats:
+            ...
+
+    The profiled methods (see PROFILED_METHODS) are only wrapped while a
+    profile or hook is active, so there is no cost otherwise. Profiles may
+    be nested, with each one counting every call made while it is active.
+    The methods are wrapped on their classes, so a profile counts the calls
+    made by every thread while it is active, not only those of the thread
+    that started it (and the counts of calls running at the same time in
+    different threads are mixed together); starting and stopping profiles
+    from several threads is safe.
+
+    Parameters
+    ----------
+        hook : function/None
+            a function to also pass each call to, as hook(name, call) (see
+            ProfileStats.record())
+
+    Returns
+    -------
+        stats : object of class ProfileStats
+            the statistics, gathered while the with block runs
+    """
+
+    stats = ProfileStats(hook)
+
+    return(stats)
+
+
+def add_profile_hook(hook):
+    """
+    Subscribes a function to every call of the profiled methods, until it
+    is removed, such as to pass the statistics on to a metrics exporter.
+    The methods are profiled for as long as any hook is subscribed.
+
+    Parameters
+    ----------
+        hook : function
+            the function to call after each profiled call, as hook(name,
+            call) (see ProfileStats.record())
+
+    Returns
+    -------
+        None, but subscribes the hook
+    """
+
+    assert callable(hook), "Hook must be a function."
+    with _PROFILE_LOCK:
+        _PROFILE_HOOKS.append(hook)
+        _instrument()
+
+    return
+
+
+def remove_profile_hook(hook):
+    """
+    Unsubscribes a function added by add_profile_hook().
+
+    Parameters
+    ----------
+        hook : function
+            the function to unsubscribe
+
+    Returns
+    -------
+        None, but unsubscribes the hook
+    """
+
+    with _PROFILE_LOCK:
+        assert hook in _PROFILE_HOOKS, "Hook must have been added."
+        _PROFILE_HOOKS.remove(hook)
+        _instrument()
+
+    return
+
+
+def _normalize_index(index, length):
+    """
+    Converts a possibly negative zero-based index into a non-negative one,
+    as for list indexing.
+
+    Parameters
+    ----------
+        index : integer
+            the index to convert
+        length : integer
+            length of the sequence being indexed
+
+    Returns
+    -------
+        index : integer
+            the equivalent non-negative index
+    """
+
+    assert isinstance(index, int), "Index must be an integer."
+    if index < 0:
+        index += length
+    if not 0 <= index < length:
+        raise IndexError("Index out of range.")
+
+    return(index)
+
+
+def _split_key(key):
+    """
+    Splits an index of a matrix into the rows and the columns it selects,
+    where an index of rows alone selects all the columns.
+
+    Parameters
+    ----------
+        key : integer/slice, or tuple of two integers/slices
+            the index of the matrix
+
+    Returns
+    -------
+        rows, columns : integer/slice
+            the rows and the columns selected
+    """
+
+    if isinstance(key, tuple):
+        assert len(key) == 2, "Index must have at most two parts."
+        rows, columns = key
+    else:
+        rows, columns = key, slice(None)
+    for i in (rows, columns):
+        assert isinstance(i, (int, slice)), \
+            "Index must be made of integers and slices."
+
+    return(rows, columns)
+
+
+def _view_range(index, length):
+    """
+    Gives the positions along one dimension of a matrix selected by an
+    integer or a slice, for a view of the matrix.
+
+    Parameters
+    ----------
+        index : integer/slice
+            the zero-based index or slice
+        length : integer
+            length of the dimension being indexed
+
+    Returns
+    -------
+        start : integer
+            first position selected
+        step : integer
+            distance between the positions selected
+        count : integer
+            number of positions selected
+    """
+
+    if isinstance(index, int):
+        return(_normalize_index(index, length), 1, 1)
+    start, stop, step = index.indices(length)
+    count = len(range(start, stop, step))
+    assert count > 0, "Matrix must not be empty."
+
+    return(start, step, count)
+
+
+def _check_indices(indices, length):
+    """
+    Checks the 1-based row or column numbers given to a batch structural
+    edit, and gives them as a set.
+
+    Parameters
+    ----------
+        indices : iterable of integers
+            the row or column numbers
+        length : integer
+            number of rows or columns in the matrix
+
+    Returns
+    -------
+        indices : set of integers
+            the distinct row or column numbers
+    """
+
+    indices = set(indices)
+    assert indices, "Argument must be a list of indices."
+    for i in indices:
+        assert isinstance(i, int) and 0 < i <= length, \
+            "Matrix must be defined at the given location."
+
+    return(indices)
+
+
+def _runs(indices):
+    """
+    Splits a sequence of indices into runs of consecutive, increasing
+    indices, so that each run can be copied as a single slice.
+
+    Parameters
+    ----------
+        indices : iterable of integers
+            the indices, in order
+
+    Returns
+    -------
+        runs : list of tuples of integers
+            the start and stop of each run, as for a slice
+    """
+
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i:
+            runs[-1] = (runs[-1][0], i+1)    # Extend the current run
+        else:
+            runs.append((i, i+1))
+
+    return(runs)
+
+
+def _as_expression(value):
+    """
+    Converts an operand of a matrix operator to an expression.
+
+    Parameters
+    ----------
+        value : object
+            the operand
+
+    Returns
+    -------
+        expression : object of class MatrixExpression/None
+            the operand as an expression, or None if it is not a matrix
+    """
+
+    if isinstance(value, MatrixExpression):
+        return(value)
+    if isinstance(value, Matrix):
+        return(MatrixExpression("matrix", (value,)))
+    assert not isinstance(value, SparseMatrix), \
+        "Sparse matrices must be combined with matrix_add() or " \
+        "matrix_multiply(), not operators."
+
+    return(None)
+
+
+def _scaled_operand(value):
+    """
+    Splits the right hand side of an in-place operator into a matrix and
+    the number it is multiplied by, so that A += c * B needs no matrix for
+    c * B. Other expressions are evaluated.
+
+    Parameters
+    ----------
+        value : object
+            the right hand side of the operator
+
+    Returns
+    -------
+        matrix : object of class Matrix/None
+            the matrix, or None if the value is not a matrix or expression
+        alpha : integer/floating point number
+            the number the matrix is multiplied by
+    """
+
+    alpha = 1
+    if isinstance(value, MatrixExpression):
+        if value.operation == "scale" and \
+                value.operands[0].operation == "matrix":
+            alpha = value.scalar
+            value = value.operands[0].operands[0]
+        else:
+            value = value.evaluate()
+    if not isinstance(value, Matrix):
+        return(None, alpha)
+
+    return(value, alpha)
+
+
+def _as_dense(matrix):
+    """
+    Converts the result of an operation to a Matrix, if it is sparse.
+
+    Parameters
+    ----------
+        matrix : object of class Matrix/SparseMatrix
+            the result of the operation
+
+    Returns
+    -------
+        matrix : object of class Matrix
+            the same result, as a Matrix
+    """
+
+    if isinstance(matrix, SparseMatrix):
+        matrix = matrix.to_dense()
+
+    return(matrix)
+
+
+def _evaluate_node(node, matrices, results):
+    """
+    Evaluates an expression in the normal form of MatrixExpression, reusing
+    the results of any subexpressions already evaluated.
+
+    Parameters
+    ----------
+        node : tuple
+            the normal form of the expression
+        matrices : dictionary
+            the matrices of the expression by their ids
+        results : dictionary
+            the results of the subexpressions evaluated so far, by normal
+            form, updated here
+
+    Returns
+    -------
+        result : object of class Matrix
+            the result of the expression, which for a matrix on its own is
+            the matrix itself or a view of its transpose
+    """
+
+    if node in results:
+        return(results[node])
+
+    if node[0] == "matrix":
+        result = matrices[node[1]]
+        if node[2]:
+            result = result._transposed_view()
+    elif node[0] == "multiply":    # Products of several in the best order
+        factors = [_evaluate_node(i, matrices, results)
+                   for i in _chain_factors(node)]
+        plan, flops = Matrix.chain_order(*factors)
+        result = _chain_product(plan, factors)
+    else:
+        coefficients = [i[1] for i in node[1]]
+        terms = [_evaluate_node(i[0], matrices, results) for i in node[1]]
+        result = Matrix.linear_combination(coefficients, terms)
+    results[node] = result
+
+    return(result)
+
+
+def _chain_plan(split, i, j):
+    """
+    Builds the plan of a chain of matrix products from the best splits found
+    by Matrix.chain_order().
+
+    Parameters
+    ----------
+        split : list of lists of integers
+            split[i][j] is the last matrix of the left part of the product of
+            matrices i to j
+        i, j : integer
+            zero-based positions of the first and last matrices of the chain
+
+    Returns
+    -------
+        plan : integer/nested tuples of integers
+            the order of the products, using 1-based positions
+    """
+
+    if i == j:
+        return(i + 1)
+    s = split[i][j]
+
+    return((_chain_plan(split, i, s), _chain_plan(split, s+1, j)))
+
+
+def _chain_product(plan, matrices, out=None):
+    """
+    Multiplies a chain of matrices in the order given by a plan of
+    Matrix.chain_order().
+
+    Parameters
+    ----------
+        plan : integer/nested tuples of integers
+            the order of the products, using 1-based positions
+        matrices : list of objects of class Matrix
+            the matrices of the chain
+        out : object of class Matrix/None
+            a matrix to write the final product into, if any
+
+    Returns
+    -------
+        product : object of class Matrix
+            the product, or the matrix itself for a single position
+    """
+
+    if isinstance(plan, int):
+        return(matrices[plan-1])
+    left = _chain_product(plan[0], matrices)
+    right = _chain_product(plan[1], matrices)
+
+    return(left.matrix_multiply(right, out=out))
+
+
+def _chain_factors(node):
+    """
+    Gives the factors of a product in the normal form of MatrixExpression,
+    from left to right, looking through products of products.
+
+    Parameters
+    ----------
+        node : tuple
+            the normal form of the product
+
+    Returns
+    -------
+        factors : list of tuples
+            the normal forms of the factors, none of which are products
+    """
+
+    if node[0] != "multiply":
+        return([node])
+    factors = _chain_factors(node[1]) + _chain_factors(node[2])
+
+    return(factors)
+
+
+def _linear_kernel(coefficients):
+    """
+    Makes a function which takes one number for each coefficient and gives
+    their linear combination, with the coefficients built in (and the
+    common cases of one and two of them unrolled), for use with map() over
+    whole rows at a time.
+
+    Parameters
+    ----------
+        coefficients : list of integer/floating point numbers
+            the coefficient of each argument of the function
+
+    Returns
+    -------
+        kernel : function
+            the function (x0, x1, ...) -> c0*x0 + c1*x1 + ...
+    """
+
+    coefficients = list(coefficients)
+    if len(coefficients) == 1:
+        c0, = coefficients
+
+        def kernel(x0):
+            return(c0*x0)
+    elif len(coefficients) == 2:
+        c0, c1 = coefficients
+
+        def kernel(x0, x1):
+            return(c0*x0 + c1*x1)
+    else:
+        def kernel(*values):
+            return(sum(map(mul, coefficients, values)))
+
+    return(kernel)
+
+
+def _check_size(m, n):
+    """
+    Checks that the given numbers of rows and columns make a valid size for
+    a matrix.
+
+    Parameters
+    ----------
+        m : integer
+            number of rows
+        n : integer
+            number of columns
+
+    Returns
+    -------
+        None, but terminates if the size is invalid
+    """
+
+    assert isinstance(m, int) and isinstance(n, int), \
+        "Size must be an integer value."
+    assert m > 0 and n > 0, "Matrix must not be empty."
+
+    return
+
+
+def _broadcast_size(sizes):
+    """
+    Gives the size of the result of an elementwise operation on matrices of
+    the given sizes, terminating unless each can be broadcast to it (see
+    Matrix): every number of rows must be 1 or the largest, and the same
+    for the numbers of columns.
+
+    Parameters
+    ----------
+        sizes : list of tuples of two integers
+            sizes of the operands
+
+    Returns
+    -------
+        m : integer
+            number of rows in the result
+        n : integer
+            number of columns in the result
+    """
+
+    m = max(i[0] for i in sizes)
+    n = max(i[1] for i in sizes)
+    for p, q in sizes:
+        assert p in (1, m) and q in (1, n), \
+            "Matrices must be of sizes that broadcast together."
+
+    return(m, n)
+
+
+def _check_axis(axis):
+    """
+    Terminates if an axis to reduce a matrix along is not valid.
+
+    Parameters
+    ----------
+        axis : integer/None
+            the axis: None for every element, 0 for columns or 1 for rows
+
+    Returns
+    -------
+        None, but terminates if the axis is not valid
+    """
+
+    assert axis is None or axis in (0, 1), "Axis must be None, 0 or 1."
+
+    return
+
+
+def _reduce_columns(function, rows):
+    """
+    Reduces each column of a matrix with a function of two numbers, working
+    through the rows in order (so in the order a row-major matrix is
+    stored) rather than down each column in turn.
+
+    Parameters
+    ----------
+        function : function
+            the reduction, such as add or max
+        rows : iterable of iterables of numbers
+            the rows of the matrix
+
+    Returns
+    -------
+        values : list of numbers
+            the result for each column
+    """
+
+    rows = iter(rows)
+    values = list(next(rows))
+    for i in rows:
+        values = list(map(function, values, i))
+
+    return(values)
+
+
+def _neumaier_columns(rows):
+    """
+    Adds up each column of a matrix with Neumaier's compensated summation,
+    working through the rows in order: the rounding error of each addition
+    is carried in a separate sum, which is added back at the end.
+
+    Parameters
+    ----------
+        rows : iterable of iterables of numbers
+            the rows of the matrix
+
+    Returns
+    -------
+        values : list of numbers
+            the sum of each column
+    """
+
+    rows = iter(rows)
+    sums = list(next(rows))
+    errors = [0.0]*len(sums)
+    for i in rows:
+        newSums = list(map(add, sums, i))
+        # The bits lost from the smaller of the two numbers added
+        errors = [e + ((s - t) + x if abs(s) >= abs(x) else (x - t) + s)
+                  for e, s, x, t in zip(errors, sums, i, newSums)]
+        sums = newSums
+    # Sums which are infinite or NaN are left as they are, since their
+    # errors are NaN
+    values = [s + e if math.isfinite(s) else s for s, e in zip(sums, errors)]
+
+    return(values)
+
+
+def _fsum(values):
+    """
+    Adds up numbers with math.fsum(), which is correctly rounded, unless the
+    sum overflows or adds infinities of opposite signs, which math.fsum()
+    refuses; those are added up plainly, to give infinity or NaN.
+
+    Parameters
+    ----------
+        values : iterable of numbers
+            the numbers to add up
+
+    Returns
+    -------
+        total : floating point number
+            the sum of the numbers
+    """
+
+    values = list(values)
+    try:
+        total = math.fsum(values)
+    except (OverflowError, ValueError):
+        total = sum(values)
+
+    return(total)
+
+
+def _numpy_frobenius(arr):
+    """
+    Gives the Frobenius norm of a NumPy array of floating point numbers,
+    scaled by its largest absolute value (as math.hypot() is) so that the
+    squares of large elements do not overflow.
+
+    Parameters
+    ----------
+        arr : two-dimensional NumPy array
+            the elements of the matrix
+
+    Returns
+    -------
+        value : floating point number
+            the norm
+    """
+
+    scale = numpy.abs(arr).max().item() if arr.size else 0.0
+    if scale == 0 or not math.isfinite(scale):
+        return(numpy.linalg.norm(arr).item())
+    value = scale*numpy.linalg.norm(arr/scale).item()
+
+    return(value)
+
+
+def _parse_rows(reader, chunkSize):
+    """
+    Parses the lines of a CSV file into rows of numbers, a chunk of lines at
+    a time, for Matrix.load_csv().
+
+    Parameters
+    ----------
+        reader : iterator of lists of strings
+            the fields of each line, from csv.reader()
+        chunkSize : integer/None
+            the number of lines to parse at a time (by default, CHUNK_SIZE)
+
+    Returns
+    -------
+        rows : generator of lists of integer/floating point numbers
+            the rows of numbers, skipping blank lines
+    """
+
+    if chunkSize is None:
+        chunkSize = CHUNK_SIZE
+    assert isinstance(chunkSize, int) and chunkSize > 0, \
+        "Chunk size must be a positive integer."
+
+    while True:
+        lines = list(islice(reader, chunkSize))
+        if not lines:
+            return
+        yield from [_parse_row(i) for i in lines if i]
+
+
+def _parse_row(fields):
+    """
+    Converts the fields of a line of a CSV file into numbers: integers where
+    they are written as integers, and floating point numbers otherwise.
+
+    Parameters
+    ----------
+        fields : list of strings
+            the fields of the line
+
+    Returns
+    -------
+        row : list of integer/floating point numbers
+            the numbers of the line
+    """
+
+    try:    # Whole lines of decimals or of integers convert in one go
+        if all(map(contains, fields, repeat("."))):
+            return(list(map(float, fields)))
+        return(list(map(int, fields)))
+    except ValueError:
+        pass
+
+    try:
+        row = [int(i) if i.strip().lstrip("+-").isdigit() else float(i)
+               for i in fields]
+    except ValueError:
+        raise AssertionError("File must hold only numbers.")
+
+    return(row)
+
+
+def _binary_header(m, n, typecode, compact, dtype=None):
+    """
+    Gives the header of a matrix in binary form (see Matrix.to_bytes()).
+
+    Parameters
+    ----------
+        m : integer
+            number of rows in the matrix
+        n : integer
+            number of columns in the matrix
+        typecode : string
+            'd', 'f', 'q' or 'O', the encoding of the elements
+        compact : boolean
+            whether the matrix is stored as a compact array
+        dtype : string/None
+            the fixed dtype of the matrix, if any
+
+    Returns
+    -------
+        header : bytes
+            the BINARY_HEADER_SIZE bytes of the header
+    """
+
+    byteorder = "<" if sys.byteorder == "little" else ">"
+    # Bits above the first give the dtype, as one more than its position
+    flags = int(compact)
+    if dtype is not None:
+        flags |= (list(DTYPES).index(dtype) + 1) << 1
+    header = struct.pack("<8s2sBB4xqq", BINARY_MAGIC,
+                         (byteorder + typecode).encode(), BINARY_VERSION,
+                         flags, m, n)
+
+    return(header)
+
+
+def _read_binary_header(header):
+    """
+    Reads the header of a matrix in binary form (see Matrix.to_bytes()),
+    checking that it is valid.
+
+    Parameters
+    ----------
+        header : bytes-like object
+            the BINARY_HEADER_SIZE bytes of the header
+
+    Returns
+    -------
+        byteorder : string
+            '<' or '>', the byte order of the elements
+        typecode : string
+            'd', 'f', 'q' or 'O', the encoding of the elements
+        compact : boolean
+            whether the matrix was stored as a compact array
+        m : integer
+            number of rows in the matrix
+        n : integer
+            number of columns in the matrix
+        dtype : string/None
+            the fixed dtype of the matrix, if it had one
+    """
+
+    assert len(header) == BINARY_HEADER_SIZE and \
+        bytes(header[:8]) == BINARY_MAGIC, "Data must hold a matrix."
+    magic, form, version, flags, m, n = struct.unpack("<8s2sBB4xqq", header)
+    assert version == BINARY_VERSION, "Data must be of a known version."
+    byteorder, typecode = form.decode()
+    assert byteorder in "<>" and typecode in "dfqO" and \
+        flags >> 1 <= len(DTYPES), "Data must hold a matrix."
+    _check_size(m, n)
+    dtype = list(DTYPES)[(flags >> 1) - 1] if flags >> 1 else None
+
+    return(byteorder, typecode, bool(flags & 1), m, n, dtype)
+
+
+def _tile_size(memory, tiles, itemsize):
+    """
+    Gives the side length of the largest square tiles that fit in a memory
+    budget, for the out-of-core operations.
+
+    Parameters
+    ----------
+        memory : integer/None
+            the memory budget in bytes, or None for OUT_OF_CORE_MEMORY
+        tiles : integer
+            the number of tiles held in memory at once
+        itemsize : integer
+            the memory taken by each element of a tile, in bytes
+
+    Returns
+    -------
+        size : integer
+            the side length of the tiles
+    """
+
+    if memory is None:
+        memory = OUT_OF_CORE_MEMORY
+    assert isinstance(memory, int), "Memory budget must be an integer."
+    size = math.isqrt(memory//(tiles*itemsize))
+    assert size > 0, "Memory budget must fit one element of each tile."
+
+    return(size)
+
+
+def _uses_numpy(work):
+    """
+    Determines if NumPy is available and enabled, and if an operation is
+    large enough to be worth handing over to it.
+
+    Parameters
+    ----------
+        work : integer
+            number of arithmetic operations the operation takes
+
+    Returns
+    -------
+        uses : boolean
+            whether to use NumPy
+    """
+
+    uses = numpy is not None and USE_NUMPY and work >= NUMPY_THRESHOLD
+
+    return(uses)
+
+
+def _numpy_bound(arr):
+    """
+    Gives the largest magnitude among the elements of an integer NumPy
+    array, as a Python integer (which cannot overflow).
+
+    Parameters
+    ----------
+        arr : NumPy array of integers
+            the elements to look at
+
+    Returns
+    -------
+        bound : integer
+            the largest absolute value of an element
+    """
+
+    bound = max(int(arr.max()), -int(arr.min()))
+
+    return(bound)
+
+
+def _typecode(data):
+    """
+    Gives the array typecode of a storage buffer.
+
+    Parameters
+    ----------
+        data : list/array of numbers
+            the storage buffer (a list, array or memoryview)
+
+    Returns
+    -------
+        typecode : string/None
+            'q' or 'd' for compact storage, None for lists
+    """
+
+    if isinstance(data, array):
+        return(data.typecode)
+    if isinstance(data, memoryview):
+        return(data.format)
+
+    return(None)
+
+
+def _compact_typecode(rows):
+    """
+    Chooses the narrowest compact typecode that can hold the given values
+    exactly: 'q' for integers which fit in 64 bits, 'd' otherwise.
+
+    Parameters
+    ----------
+        rows : list of lists of integer/floating point numbers
+            the values to be stored
+
+    Returns
+    -------
+        typecode : string
+            'q' or 'd'
+    """
+
+    for i in rows:
+        for j in i:
+            if isinstance(j, float) or not INT64_MIN <= j <= INT64_MAX:
+                return('d')
+
+    return('q')
+
+
+def _widen(typecode, value):
+    """
+    Gives the storage type to switch to when a value does not fit in the
+    current compact storage: doubles for floating point values in integer
+    arrays, or a plain list for anything else (such as very large integers).
+
+    Parameters
+    ----------
+        typecode : string/None
+            typecode of the current storage
+        value : integer/floating point number
+            the value which could not be stored
+
+    Returns
+    -------
+        typecode : string/None
+            typecode of the wider storage
+    """
+
+    if typecode == 'q' and isinstance(value, float):
+        return('d')
+
+    return(None)
+
+
+def _result_typecode(data1, data2):
+    """
+    Gives the storage type for the result of an operation on two matrices:
+    compact only if both operands are compact, of the same type if both
+    are, and doubles otherwise.
+
+    Parameters
+    ----------
+        data1, data2 : list/array of numbers
+            storage buffers of the operands
+
+    Returns
+    -------
+        typecode : string/None
+            typecode for the storage of the result
+    """
+
+    typecode1, typecode2 = _typecode(data1), _typecode(data2)
+    if typecode1 is None or typecode2 is None:
+        return(None)
+    if typecode1 != typecode2:    # Doubles hold both floats and integers
+        return('d')
+
+    return(typecode1)
+
+
+def _check_dtype(dtype):
+    """
+    Terminates if a dtype is not one of DTYPES (or None).
+
+    Parameters
+    ----------
+        dtype : string/None
+            the dtype to check
+
+    Returns
+    -------
+        None, but terminates if the dtype is not known
+    """
+
+    assert dtype is None or dtype in DTYPES, \
+        "Dtype must be one of {}.".format(tuple(DTYPES))
+
+    return
+
+
+def _result_dtype(dtype1, dtype2):
+    """
+    Gives the dtype of the result of an operation on two matrices (see
+    DTYPES): none unless both operands have one, the same dtype if both
+    have it, "object" if either has that, and "float64" for any other mix.
+
+    Parameters
+    ----------
+        dtype1, dtype2 : string/None
+            dtypes of the operands
+
+    Returns
+    -------
+        dtype : string/None
+            dtype of the result
+    """
+
+    if dtype1 is None or dtype2 is None:
+        return(None)
+    if dtype1 == dtype2:
+        return(dtype1)
+    if "object" in (dtype1, dtype2):
+        return("object")
+
+    return("float64")
+
+
+def _dtype_storage(values, dtype):
+    """
+    Builds a storage buffer of a fixed dtype (see DTYPES) holding the given
+    values, terminating if they do not fit in it, rather than falling back
+    to wider storage as _storage() does.
+
+    Parameters
+    ----------
+        values : list of numbers
+            the elements to be stored, in row-major order
+        dtype : string
+            one of DTYPES
+
+    Returns
+    -------
+        data : list/array of numbers
+            the new storage buffer
+    """
+
+    typecode = DTYPES[dtype]
+    if typecode is None:
+        return(list(values))
+    try:
+        data = array(typecode, values)
+    except (TypeError, OverflowError):    # Floats in an integer array, say
+        data = None
+    if typecode == 'f' and data is not None and \
+            _float32_overflows(values, data):
+        data = None
+    assert data is not None, \
+        "Values must be of the dtype of the matrix ({}).".format(dtype)
+
+    return(data)
+
+
+def _storage(values, typecode):
+    """
+    Builds a storage buffer holding the given values, as an array of the
+    given typecode where possible. Integer arrays that cannot hold the values
+    fall back to doubles, and then to a list, as do arrays of 4 byte floats
+    too small for the values.
+
+    Parameters
+    ----------
+        values : list of integer/floating point numbers
+            the elements to be stored, in row-major order
+        typecode : string/None
+            the preferred typecode, or None for a list
+
+    Returns
+    -------
+        data : list/array of numbers
+            the new storage buffer
+    """
+
+    if typecode is not None:
+        try:
+            data = array(typecode, values)
+        except TypeError:    # Floating point values in an integer array
+            if typecode == 'q':
+                return(_storage(values, 'd'))
+        except OverflowError:    # Integers too large for 64 bits
+            pass
+        else:
+            if typecode != 'f' or not _float32_overflows(values, data):
+                return(data)
+
+    return(list(values))
+
+
+def _float32_overflows(values, data):
+    """
+    Determines if storing values in an array of 4 byte floats turned any
+    of them into an infinity, which the array does silently for values too
+    large for it.
+
+    Parameters
+    ----------
+        values : list/array of integer/floating point numbers
+            the values stored
+        data : array of floating point numbers
+            the array of 4 byte floats holding them
+
+    Returns
+    -------
+        overflows : boolean
+            whether any finite value became infinite
+    """
+
+    if math.inf not in data and -math.inf not in data:
+        return(False)
+    overflows = any(math.isinf(i) and not math.isinf(j)
+                    for i, j in zip(data, values))
+
+    return(overflows)
+
+
+def _as_list(values):
+    """
+    Converts a row or column slice of a storage buffer to a list, since
+    iterating over a list is faster than over an array (which creates a new
+    number object for every element it gives).
+
+    Parameters
+    ----------
+        values : list/array of integer/floating point numbers
+            the elements to convert
+
+    Returns
+    -------
+        values : list of integer/floating point numbers
+            the same elements as a list
+    """
+
+    if isinstance(values, list):    # Slices of a list are already copies
+        return(values)
+
+    return(values.tolist())
+
+
+def _blocked_multiply(rows, columns):
+    """
+    Multiplies two matrices, given as the rows of the left operand and the
+    columns of the right operand, tile by tile. Each tile pairs a block of
+    rows with a block of columns, so the columns of a block are reused for
+    every row while they are still in cache.
+
+    Parameters
+    ----------
+        rows : list of lists of integer/floating point numbers
+            the rows of the left matrix
+        columns : list of lists of integer/floating point numbers
+            the columns of the right matrix
+
+    Returns
+    -------
+        values : list of integer/floating point numbers
+            elements of the product in row-major order
+    """
+
+    m, p = len(rows), len(columns)
+    block = MULTIPLY_BLOCK_SIZE
+    if p <= block:    # Only a single column block, so no tiling needed
+        return([sum(map(mul, i, j)) for i in rows for j in columns])
+
+    values = [0]*(m*p)
+    for jStart in range(0, p, block):
+        jStop = min(jStart + block, p)
+        columnBlock = columns[jStart:jStop]
+        for iStart in range(0, m, block):
+            for i in range(iStart, min(iStart + block, m)):
+                row = rows[i]
+                # Elements of this row of the result within the column block
+                values[i*p+jStart:i*p+jStop] = \
+                    [sum(map(mul, row, j)) for j in columnBlock]
+
+    return(values)
+
+
+def _multiply_rows(task):
+    """
+    Works out a block of rows of a product in a worker process for
+    Matrix.matrix_multiply(), reading the operands from and writing the
+    result to shared memory.
+
+    Parameters
+    ----------
+        task : tuple
+            the names of the shared memory holding the rows of the left
+            operand, the columns of the right operand and the result; their
+            typecodes; the sizes m, n and p of the product; and the first
+            and last (exclusive) zero-based rows to work out
+
+    Returns
+    -------
+        None, but writes the rows into the result
+    """
+
+    names, typecodes, (m, n, p), start, stop = task
+    blocks = [shared_memory.SharedMemory(name=i) for i in names]
+    try:
+        views = [i.buf.cast(j) for i, j in zip(blocks, typecodes)]
+        rows = [views[0][i*n:(i+1)*n].tolist() for i in range(start, stop)]
+        columns = [views[1][j*n:(j+1)*n].tolist() for j in range(p)]
+        if min(len(rows), n, p) > STRASSEN_THRESHOLD:
+            values = _strassen_multiply(rows, columns)
+        else:
+            values = _blocked_multiply(rows, columns)
+        views[2][start*p:stop*p] = array(typecodes[2], values)
+        for i in views:
+            i.release()
+    finally:
+        for i in blocks:
+            i.close()
+
+    return
+
+
+def _strassen_multiply(rows, columns):
+    """
+    Multiplies two matrices, given as the rows of the left operand and the
+    columns of the right operand, using the Strassen-Winograd algorithm. It
+    uses 7 half-size products (instead of 8) and 15 additions per level,
+    recursing until a dimension is at most STRASSEN_THRESHOLD.
+
+    Parameters
+    ----------
+        rows : list of lists of integer/floating point numbers
+            the rows of the left matrix
+        columns : list of lists of integer/floating point numbers
+            the columns of the right matrix
+
+    Returns
+    -------
+        values : list of integer/floating point numbers
+            elements of the product in row-major order
+    """
+
+    p = len(columns)
+    product = _strassen(rows, [list(i) for i in zip(*columns)])
+    values = []
+    for i in product:
+        values.extend(i[:p])    # Drop any padding from odd dimensions
+
+    return(values)
+
+
+def _strassen(a, b):
+    """
+    Recursive step of the Strassen-Winograd algorithm, on matrices stored
+    as lists of rows. Odd dimensions are padded with a row or column of
+    zeros, so the result may have one extra (zero) row and column.
+
+    Parameters
+    ----------
+        a : list of lists of integer/floating point numbers
+            the rows of the left matrix
+        b : list of lists of integer/floating point numbers
+            the rows of the right matrix
+
+    Returns
+    -------
+        c : list of lists of integer/floating point numbers
+            the rows of the product, possibly padded
+    """
+
+    m, n, p = len(a), len(b), len(b[0])
+    if min(m, n, p) <= STRASSEN_THRESHOLD:
+        values = _blocked_multiply(a, [list(i) for i in zip(*b)])
+        return([values[i*p:(i+1)*p] for i in range(m)])
+
+    # Pad odd dimensions with zeros so the matrices split into quarters
+    if n % 2:
+        a = [i + [0] for i in a]
+        b = b + [[0]*p]
+        n += 1
+    if m % 2:
+        a = a + [[0]*n]
+        m += 1
+    if p % 2:
+        b = [i + [0] for i in b]
+        p += 1
+    h, k, q = m//2, n//2, p//2
+    a11 = [i[:k] for i in a[:h]]
+    a12 = [i[k:] for i in a[:h]]
+    a21 = [i[:k] for i in a[h:]]
+    a22 = [i[k:] for i in a[h:]]
+    b11 = [i[:q] for i in b[:k]]
+    b12 = [i[q:] for i in b[:k]]
+    b21 = [i[:q] for i in b[k:]]
+    b22 = [i[q:] for i in b[k:]]
+
+    # Winograd's form: 8 additions of the operands, 7 products, 7 additions
+    # of the products
+    s1 = _elementwise(add, a21, a22)
+    s2 = _elementwise(sub, s1, a11)
+    s3 = _elementwise(sub, a11, a21)
+    s4 = _elementwise(sub, a12, s2)
+    t1 = _elementwise(sub, b12, b11)
+    t2 = _elementwise(sub, b22, t1)
+    t3 = _elementwise(sub, b22, b12)
+    t4 = _elementwise(sub, t2, b21)
+    p1 = _strassen(a11, b11)
+    p2 = _strassen(a12, b21)
+    p3 = _strassen(s4, b22)
+    p4 = _strassen(a22, t4)
+    p5 = _strassen(s1, t1)
+    p6 = _strassen(s2, t2)
+    p7 = _strassen(s3, t3)
+    u1 = _elementwise(add, p1, p2)
+    u2 = _elementwise(add, p1, p6)
+    u3 = _elementwise(add, u2, p7)
+    u4 = _elementwise(add, u2, p5)
+    u5 = _elementwise(add, u4, p3)
+    u6 = _elementwise(sub, u3, p4)
+    u7 = _elementwise(add, u3, p5)
+
+    # Reassemble the quarters, trimming any padding of the sub-products
+    c = [i[:q] + j[:q] for i, j in zip(u1[:h], u5[:h])] + \
+        [i[:q] + j[:q] for i, j in zip(u6[:h], u7[:h])]
+
+    return(c)
+
+
+def _elementwise(function, a, b):
+    """
+    Combines two matrices stored as lists of rows element by element.
+
+    Parameters
+    ----------
+        function : function
+            binary operation applied to each pair of elements
+        a, b : lists of lists of integer/floating point numbers
+            the rows of the two matrices
+
+    Returns
+    -------
+        c : list of lists of integer/floating point numbers
+            the rows of the combined matrix
+    """
+
+    c = [list(map(function, i, j)) for i, j in zip(a, b)]
+
+    return(c)
+
+
+def _bareiss_determinant(rows):
+    """
+    Computes the determinant of a square integer matrix using fraction-free
+    Bareiss elimination, so that every intermediate value (and the result)
+    is an exact integer. Runs in O(n^3) arithmetic operations.
+
+    Parameters
+    ----------
+        rows : list of lists of integers
+            rows of the matrix, which are overwritten during elimination
+
+    Returns
+    -------
+        value : integer
+            the exact value of the determinant
+    """
+
+    n = len(rows)
+    sign = 1    # Tracks the effect of row swaps on the determinant
+    previous = 1    # Pivot of the previous step, divides out exactly
+    for k in range(n-1):
+        if rows[k][k] == 0:
+            # Find a lower row with a nonzero entry in this column to swap in
+            for i in range(k+1, n):
+                if rows[i][k] != 0:
+                    rows[k], rows[i] = rows[i], rows[k]
+                    sign = -sign
+                    break
+            else:    # Whole column below the diagonal is zero
+                return(0)
+        pivotRow = rows[k]
+        pivot = pivotRow[k]
+        for i in range(k+1, n):
+            row = rows[i]
+            factor = row[k]
+            # Fraction-free update of the trailing part of the row; the
+            # division by the previous pivot is always exact
+            row[k+1:] = [(x*pivot - factor*y) // previous
+                         for x, y in zip(row[k+1:], pivotRow[k+1:])]
+        previous = pivot
+
+    value = sign*rows[n-1][n-1]
+
+    return(value)
+
+
+def _lu_determinant(rows):
+    """
+    Computes the determinant of a square matrix using LU decomposition with
+    partial pivoting, taking the product of the diagonal of U. Runs in
+    O(n^3) arithmetic operations, which are exact for exact numbers (such
+    as Fractions).
+
+    Parameters
+    ----------
+        rows : list of lists of numbers
+            rows of the matrix, which are overwritten during elimination
+
+    Returns
+    -------
+        value : number
+            the value of the determinant
+    """
+
+    n = len(rows)
+    value = 1
+    for k in range(n):
+        # Choose the entry of largest magnitude in the column as the pivot
+        p = max(range(k, n), key=lambda i: abs(rows[i][k]))
+        if rows[p][k] == 0:    # Matrix is singular
+            return(0.0)
+        if p != k:
+            rows[k], rows[p] = rows[p], rows[k]
+            value = -value    # Each row swap flips the sign
+        pivotRow = rows[k]
+        pivot = pivotRow[k]
+        value *= pivot
+        for i in range(k+1, n):
+            row = rows[i]
+            factor = row[k]/pivot
+            if factor:    # Rows already zero in this column need no update
+                row[k+1:] = [x - factor*y
+                             for x, y in zip(row[k+1:], pivotRow[k+1:])]
+
+    return(value)
+
+
+def _lu_factor(rows):
+    """
+    Factorizes a square matrix as P A = L U by Gaussian elimination with
+    partial pivoting, in O(n^3) operations, keeping the multipliers of L in
+    place of the zeros they make. Columns without a nonzero pivot (of a
+    singular matrix) are left as they are.
+
+    Parameters
+    ----------
+        rows : list of lists of floating point numbers
+            rows of the matrix, which are overwritten with the packed
+            factors
+
+    Returns
+    -------
+        permutation : list of integers
+            for each row of the factors, the zero-based index of the row of
+            the matrix it came from
+        sign : integer
+            1 or -1, the sign of the permutation
+    """
+
+    n = len(rows)
+    permutation = list(range(n))
+    sign = 1
+    for k in range(n):
+        # Choose the entry of largest magnitude in the column as the pivot
+        p = max(range(k, n), key=lambda i: abs(rows[i][k]))
+        if p != k:
+            rows[k], rows[p] = rows[p], rows[k]
+            permutation[k], permutation[p] = permutation[p], permutation[k]
+            sign = -sign
+        pivotRow = rows[k]
+        pivot = pivotRow[k]
+        if pivot == 0:    # Nothing left to eliminate in this column
+            continue
+        tail = pivotRow[k+1:]
+        for i in range(k+1, n):
+            row = rows[i]
+            factor = row[k]/pivot
+            row[k] = factor    # Multiplier of L
+            if factor:    # Rows already zero in this column need no update
+                row[k+1:] = [x - factor*y for x, y in zip(row[k+1:], tail)]
+
+    return(permutation, sign)
+
+
+def _numpy_lu_factor(arr):
+    """
+    Factorizes a square matrix as _lu_factor() does, with NumPy doing the
+    elimination for a whole column at a time.
+
+    Parameters
+    ----------
+        arr : two-dimensional NumPy array of floating point numbers
+            the matrix, which is overwritten with the packed factors
+
+    Returns
+    -------
+        permutation : list of integers
+            for each row of the factors, the zero-based index of the row of
+            the matrix it came from
+        sign : integer
+            1 or -1, the sign of the permutation
+    """
+
+    n = arr.shape[0]
+    permutation = list(range(n))
+    sign = 1
+    for k in range(n):
+        p = k + int(numpy.argmax(numpy.abs(arr[k:, k])))
+        if p != k:
+            arr[[k, p]] = arr[[p, k]]
+            permutation[k], permutation[p] = permutation[p], permutation[k]
+            sign = -sign
+        pivot = arr[k, k]
+        if pivot == 0:
+            continue
+        arr[k+1:, k] /= pivot
+        arr[k+1:, k+1:] -= numpy.outer(arr[k+1:, k], arr[k, k+1:])
+
+    return(permutation, sign)
+
+
+def _lu_solve(rows, right):
+    """
+    Solves L U X = B for packed LU factors of a nonsingular matrix, by
+    forward and then back substitution, a whole row of X at a time.
+
+    Parameters
+    ----------
+        rows : list of lists of floating point numbers
+            rows of L and U packed together (see _lu_factor()), or of exact
+            numbers for an exact solution
+        right : list of lists of integer/floating point numbers
+            rows of B, already permuted
+
+    Returns
+    -------
+        solution : list of lists of floating point numbers
+            rows of X
+    """
+
+    n = len(rows)
+    forward = []    # Rows of Y, for L Y = B
+    for i in range(n):
+        row = rows[i]
+        y = list(right[i])
+        for j in range(i):
+            factor = row[j]
+            if factor:
+                y = [a - factor*b for a, b in zip(y, forward[j])]
+        forward.append(y)
+    solution = [None]*n    # Rows of X, for U X = Y
+    for i in range(n-1, -1, -1):
+        row = rows[i]
+        x = forward[i]
+        for j in range(i+1, n):
+            factor = row[j]
+            if factor:
+                x = [a - factor*b for a, b in zip(x, solution[j])]
+        pivot = row[i]
+        solution[i] = [a/pivot for a in x]
+
+    return(solution)
+
+
+def _numpy_lu_solve(rows, right):
+    """
+    Solves L U X = B as _lu_solve() does, with NumPy doing the substitution
+    for a whole row of X at a time.
+
+    Parameters
+    ----------
+        rows : list of lists of floating point numbers
+            rows of L and U packed together (see _lu_factor())
+        right : list of lists of integer/floating point numbers
+            rows of B, already permuted
+
+    Returns
+    -------
+        solution : list of lists of floating point numbers
+            rows of X
+    """
+
+    factors = numpy.array(rows, dtype=float)
+    X = numpy.array(right, dtype=float)
+    n = len(rows)
+    for i in range(1, n):
+        X[i] -= factors[i, :i] @ X[:i]
+    for i in range(n-1, -1, -1):
+        X[i] -= factors[i, i+1:] @ X[i+1:]
+        X[i] /= factors[i, i]
+    solution = X.tolist()
+
+    return(solution)
+
+
+def _numpy_batch(data, count, m, n):
+    """
+    Gives the compact storage of a batch of matrices as a three-dimensional
+    NumPy array sharing its memory.
+
+    Parameters
+    ----------
+        data : array of integer/floating point numbers
+            elements of the matrices, one matrix after another
+        count : integer
+            number of matrices
+        m, n : integers
+            size of the matrices (n may be -1, for the rest of each matrix)
+
+    Returns
+    -------
+        arr : three-dimensional NumPy array
+            the matrices, indexed as arr[k, i, j]
+    """
+
+    arr = numpy.frombuffer(data, dtype=numpy.dtype(data.typecode)).reshape(
+        count, m, n)
+
+    return(arr)
+
+
+def _batch_multiply(a, b, count, step, m, n, p):
+    """
+    Multiplies a batch of m x n matrices by a batch of n x p matrices, one
+    pair at a time, for sizes without an unrolled kernel.
+
+    Parameters
+    ----------
+        a : list/array of integer/floating point numbers
+            elements of the left matrices, one matrix after another
+        b : list/array of integer/floating point numbers
+            elements of the right matrices, one matrix after another
+        count : integer
+            number of products
+        step : integer
+            distance between the right matrices in b (0 to reuse one)
+        m, n, p : integers
+            sizes of the matrices
+
+    Returns
+    -------
+        values : list of integer/floating point numbers
+            elements of the products, one matrix after another
+    """
+
+    values = []
+    for k in range(count):
+        start = k*m*n
+        rows = [_as_list(a[i:i+n]) for i in range(start, start + m*n, n)]
+        start = k*step
+        columns = [_as_list(b[start+j:start+n*p:p]) for j in range(p)]
+        for row in rows:
+            values.extend(sum(map(mul, row, column)) for column in columns)
+
+    return(values)
+
+
+def _batch_multiply_2(a, b, count, step):
+    """
+    Multiplies a batch of 2 x 2 matrices by another (see _batch_multiply()),
+    with the products written out in full.
+    """
+
+    values = []
+    j = 0
+    for i in range(0, 4*count, 4):
+        a0, a1, a2, a3 = a[i:i+4]
+        b0, b1, b2, b3 = b[j:j+4]
+        values += (a0*b0 + a1*b2, a0*b1 + a1*b3,
+                   a2*b0 + a3*b2, a2*b1 + a3*b3)
+        j += step
+
+    return(values)
+
+
+def _batch_multiply_3(a, b, count, step):
+    """
+    Multiplies a batch of 3 x 3 matrices by another (see _batch_multiply()),
+    with the products written out in full.
+    """
+
+    values = []
+    j = 0
+    for i in range(0, 9*count, 9):
+        a0, a1, a2, a3, a4, a5, a6, a7, a8 = a[i:i+9]
+        b0, b1, b2, b3, b4, b5, b6, b7, b8 = b[j:j+9]
+        values += (a0*b0 + a1*b3 + a2*b6, a0*b1 + a1*b4 + a2*b7,
+                   a0*b2 + a1*b5 + a2*b8,
+                   a3*b0 + a4*b3 + a5*b6, a3*b1 + a4*b4 + a5*b7,
+                   a3*b2 + a4*b5 + a5*b8,
+                   a6*b0 + a7*b3 + a8*b6, a6*b1 + a7*b4 + a8*b7,
+                   a6*b2 + a7*b5 + a8*b8)
+        j += step
+
+    return(values)
+
+
+def _batch_multiply_4(a, b, count, step):
+    """
+    Multiplies a batch of 4 x 4 matrices by another (see _batch_multiply()),
+    with the products written out in full.
+    """
+
+    values = []
+    j = 0
+    for i in range(0, 16*count, 16):
+        (a0, a1, a2, a3, a4, a5, a6, a7,
+         a8, a9, a10, a11, a12, a13, a14, a15) = a[i:i+16]
+        (b0, b1, b2, b3, b4, b5, b6, b7,
+         b8, b9, b10, b11, b12, b13, b14, b15) = b[j:j+16]
+        values += (a0*b0 + a1*b4 + a2*b8 + a3*b12,
+                   a0*b1 + a1*b5 + a2*b9 + a3*b13,
+                   a0*b2 + a1*b6 + a2*b10 + a3*b14,
+                   a0*b3 + a1*b7 + a2*b11 + a3*b15,
+                   a4*b0 + a5*b4 + a6*b8 + a7*b12,
+                   a4*b1 + a5*b5 + a6*b9 + a7*b13,
+                   a4*b2 + a5*b6 + a6*b10 + a7*b14,
+                   a4*b3 + a5*b7 + a6*b11 + a7*b15,
+                   a8*b0 + a9*b4 + a10*b8 + a11*b12,
+                   a8*b1 + a9*b5 + a10*b9 + a11*b13,
+                   a8*b2 + a9*b6 + a10*b10 + a11*b14,
+                   a8*b3 + a9*b7 + a10*b11 + a11*b15,
+                   a12*b0 + a13*b4 + a14*b8 + a15*b12,
+                   a12*b1 + a13*b5 + a14*b9 + a15*b13,
+                   a12*b2 + a13*b6 + a14*b10 + a15*b14,
+                   a12*b3 + a13*b7 + a14*b11 + a15*b15)
+        j += step
+
+    return(values)
+
+
+def _batch_determinant_2(a, count):
+    """
+    Computes the determinants of a batch of 2 x 2 matrices.
+
+    Parameters
+    ----------
+        a : list/array of integer/floating point numbers
+            elements of the matrices, one matrix after another
+        count : integer
+            number of matrices
+
+    Returns
+    -------
+        values : list of integer/floating point numbers
+            the determinant of each matrix
+    """
+
+    values = [a[i]*a[i+3] - a[i+1]*a[i+2] for i in range(0, 4*count, 4)]
+
+    return(values)
+
+
+def _batch_determinant_3(a, count):
+    """
+    Computes the determinants of a batch of 3 x 3 matrices, by expanding
+    along the first row (see _batch_determinant_2()).
+    """
+
+    values = []
+    for i in range(0, 9*count, 9):
+        a0, a1, a2, a3, a4, a5, a6, a7, a8 = a[i:i+9]
+        values.append(a0*(a4*a8 - a5*a7) - a1*(a3*a8 - a5*a6) +
+                      a2*(a3*a7 - a4*a6))
+
+    return(values)
+
+
+def _batch_determinant_4(a, count):
+    """
+    Computes the determinants of a batch of 4 x 4 matrices, by Laplace
+    expansion along the top two rows, as the sum of products of the 2 x 2
+    minors of the top and bottom halves (see _batch_determinant_2()).
+    """
+
+    values = []
+    for i in range(0, 16*count, 16):
+        (a0, a1, a2, a3, a4, a5, a6, a7,
+         a8, a9, a10, a11, a12, a13, a14, a15) = a[i:i+16]
+        s0, s1, s2 = a0*a5 - a4*a1, a0*a6 - a4*a2, a0*a7 - a4*a3
+        s3, s4, s5 = a1*a6 - a5*a2, a1*a7 - a5*a3, a2*a7 - a6*a3
+        c0, c1, c2 = a8*a13 - a12*a9, a8*a14 - a12*a10, a8*a15 - a12*a11
+        c3, c4, c5 = a9*a14 - a13*a10, a9*a15 - a13*a11, a10*a15 - a14*a11
+        values.append(s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0)
+
+    return(values)
+
+
+# Unrolled kernels of MatrixBatch, by the sizes (m, n, p) of the products
+# and the size n of the determinants they work out
+_BATCH_MULTIPLY_KERNELS = {
+    (2, 2, 2): _batch_multiply_2,
+    (3, 3, 3): _batch_multiply_3,
+    (4, 4, 4): _batch_multiply_4,
+}
+_BATCH_DETERMINANT_KERNELS = {
+    2: _batch_determinant_2,
+    3: _batch_determinant_3,
+    4: _batch_determinant_4,
+}
+
+
+def _profile_record():
+    """
+    Gives the statistics of no calls at all, to be added to.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        record : dictionary
+            zero "calls", "errors", "seconds", "flops", "matrices" and
+            "bytes"
+    """
+
+    record = {"calls": 0, "errors": 0, "seconds": 0.0, "flops": 0,
+              "matrices": 0, "bytes": 0}
+
+    return(record)
+
+
+def _instrument():
+    """
+    Wraps the profiled methods while any profile or hook is active, and
+    puts back the original methods once none are. Called with
+    _PROFILE_LOCK held.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        None, but wraps or unwraps the methods
+    """
+
+    global _PROFILING
+    active = bool(_PROFILES or _PROFILE_HOOKS)
+    if active == _PROFILING:
+        return
+    for className, names in PROFILED_METHODS.items():
+        cls = globals()[className]
+        for name in names:
+            if active:
+                method = vars(cls)[name]
+                _PROFILE_ORIGINALS[(cls, name)] = method
+                if isinstance(method, classmethod):
+                    method = classmethod(_profiled(
+                        className + "." + name, method.__func__))
+                else:
+                    method = _profiled(className + "." + name, method)
+            else:
+                method = _PROFILE_ORIGINALS.pop((cls, name))
+            setattr(cls, name, method)
+    _PROFILING = active
+
+    return
+
+
+def _profiled(name, function):
+    """
+    Wraps a method to time each call of it, and count the matrices made,
+    their bytes and the floating point operations done during the call,
+    passing the results to each active profile and hook, whether or not the
+    call raises an error.
+
+    Parameters
+    ----------
+        name : string
+            the class and name of the method, as in "Matrix.transpose"
+        function : function
+            the method to wrap
+
+    Returns
+    -------
+        profiled : function
+            the wrapped method
+    """
+
+    # Results that may come from the cache, which take no arithmetic then
+    cachedKey = {"Matrix.determinant": "determinant",
+                 "Matrix.lu": "lu"}.get(name)
+
+    @wraps(function)
+    def profiled(*args, **kwargs):
+        counts = _PROFILE_COUNTS
+        matrices, size, flops = \
+            counts["matrices"], counts["bytes"], counts["flops"]
+        depth = counts["depth"]
+        counts["depth"] = depth + 1
+        hits = None if cachedKey is None else args[0].cache_info()["hits"]
+        result, failed = None, True
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            counts["depth"] = depth
+            # Arithmetic is estimated from the sizes involved, for calls
+            # that did not fail or come from the cache; anything else counts
+            # the operations of the profiled methods it called
+            estimate = None
+            if hits is not None and args[0].cache_info()["hits"] > hits:
+                estimate = 0
+            elif not failed:
+                if kwargs:    # Estimates look at the arguments in order
+                    bound = inspect.signature(function).bind(*args,
+                                                             **kwargs)
+                    bound.apply_defaults()
+                    args = bound.args
+                estimate = _estimate_flops(name, args, result)
+            if estimate is not None:
+                counts["flops"] = flops + estimate
+            call = {"calls": 1, "errors": int(failed), "seconds": seconds,
+                    "flops": counts["flops"] - flops,
+                    "matrices": counts["matrices"] - matrices,
+                    "bytes": counts["bytes"] - size, "depth": depth}
+            for stats in list(_PROFILES):
+                stats.record(name, call)
+            for hook in list(_PROFILE_HOOKS):
+                hook(name, call)
+        return(result)
+
+    return(profiled)
+
+
+def _estimate_flops(name, args, result):
+    """
+    Estimates the number of floating point operations a call of one of the
+    arithmetic methods does, from the sizes of its operands and result: a
+    multiplication and an addition for each term of each dot product, one
+    operation for each element of a sum, 2n^3/3 for a determinant or LU
+    factorization that was not given from the cache, and 2n^2 for each
+    right-hand side solved through one.
+
+    Parameters
+    ----------
+        name : string
+            the class and name of the method called
+        args : tuple
+            the arguments of the call in order (with any given by keyword
+            put in their places), starting with the matrix (or class)
+        result : any
+            the result of the call
+
+    Returns
+    -------
+        flops : integer/None
+            the estimate, or None for methods that are not arithmetic
+    """
+
+    if name in ("Matrix.determinant", "Matrix.lu"):
+        n = args[0].get_size()[0]
+        return(2*n**3//3)
+    if name in ("Matrix.solve", "Matrix.inverse", "LUFactorization.solve",
+                "LUFactorization.solve_many", "LUFactorization.inverse"):
+        n = args[0].get_size()[0]
+        k = 1 if isinstance(result, list) else result.get_size()[1]
+        return(2*n*n*k)
+    if name in ("MatrixBatch.matrix_add", "MatrixBatch.matrix_multiply",
+                "MatrixBatch.determinant"):
+        count = args[0].get_count()
+        m, n = args[0].get_size()
+        if name == "MatrixBatch.matrix_add":
+            return(count*m*n)
+        if name == "MatrixBatch.matrix_multiply":
+            return(2*count*m*n*args[1].get_size()[1])
+        return(count*2*n**3//3)
+    name = name.split(".")[1]
+    if len(args) < 2:
+        return(None)
+    # Methods that work in place (or write to a file) are estimated from
+    # the sizes of their operands rather than their results
+    if name in ("scalar_add", "scalar_multiply", "add_scaled"):
+        m, p = args[0].get_size()
+        return(2*m*p if name == "add_scaled" else m*p)
+    if name == "tiled_multiply":
+        m, n = args[0].get_size()
+        return(2*m*n*args[1].get_size()[1])
+    if not isinstance(result, (Matrix, SparseMatrix)):
+        return(None)
+    m, p = result.get_size()
+    if name in ("matrix_multiply", "__imatmul__"):
+        return(2*m*args[1].get_size()[0]*p)
+    if name == "chain_multiply":
+        return(Matrix.chain_order(*args[1:])[1])
+    if name in ("matrix_add", "__iadd__", "__isub__", "subtract", "multiply",
+                "divide", "power", "compare"):
+        return(m*p)
+    if name == "linear_combination":
+        return(2*len(args[2])*m*p if len(args) > 2 else None)
+
+    return(None)
+
+
+def _count_matrix(data):
+    """
+    Counts a newly made matrix, and the bytes of its storage buffer, towards
+    the operations being profiled. Buffers shared with other matrices, or
+    given by the caller (memoryviews), are not counted, and for lists only
+    the list itself is, not the number objects it holds.
+
+    Parameters
+    ----------
+        data : list/array/memoryview/None
+            the storage of the matrix, or None if it is shared
+
+    Returns
+    -------
+        None, but updates the counts
+    """
+
+    _PROFILE_COUNTS["matrices"] += 1
+    if data is not None and not isinstance(data, memoryview):
+        _PROFILE_COUNTS["bytes"] += sys.getsizeof(data)
+
+    return
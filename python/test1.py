@@ -5,6 +5,7 @@
 # Made by Isaac Joffe
 
 import unittest
+import matrix
 from matrix import Matrix
 
 
@@ -100,6 +101,27 @@ class TestMatrix(unittest.TestCase):
         self.assertEqual(str(E), str(F))
         return
 
+    def test_streaming_rows(self):
+        A = Matrix.from_rows(([i, i+1] for i in range(3)))
+        self.assertEqual(str(A), "0 1\n1 2\n2 3")
+        A.add_rows(iter([(5, 6), range(7, 9)]))
+        self.assertEqual(A.get_size(), (5, 2))
+        self.assertEqual(A.get_row(5), [7, 8])
+        B = Matrix.from_rows(([1.5*i] for i in range(4)), compact=True)
+        self.assertTrue(B.is_compact())
+        self.assertEqual(B.get_column(1), [0.0, 1.5, 3.0, 4.5])
+        # A bad row leaves the matrix as it was before the call
+        with self.assertRaises(AssertionError):
+            A.add_rows(iter([[0, 0], [0.5, 0.5], [0, 0, 0]]))
+        self.assertEqual(A.get_size(), (5, 2))
+        with self.assertRaises(AssertionError):
+            B.add_rows(iter([[2**70], ["x"]]))
+        self.assertEqual(B.get_size(), (4, 1))
+        self.assertTrue(B.is_compact())
+        with self.assertRaises(AssertionError):
+            Matrix.from_rows(iter([]))
+        return
+
     def test_errors(self):
         A = Matrix([[1,2,3],[4,5,6],[7,8,9]])
         with self.assertRaises(AssertionError):
@@ -176,6 +198,37 @@ class TestMatrix(unittest.TestCase):
             A.delete_column(1.5)
         return
 
+    def test_validation_policy(self):
+        A = Matrix([[1,2,3],[4,5,6]], validation="incremental")
+        B = Matrix([[1,2,3],[4,5,6]], validation="trusted")
+        C = Matrix([[1,2,3],[4,5,6]])
+        self.assertEqual(A.get_validation_policy(), "incremental")
+        self.assertEqual(B.get_validation_policy(), "trusted")
+        self.assertEqual(C.get_validation_policy(), "strict")
+        with self.assertRaises(AssertionError):
+            A.set_value(1,1,"hello world")
+        with self.assertRaises(AssertionError):
+            A.add_row([0,0,"hello world"])
+        with self.assertRaises(AssertionError):
+            B.add_row([0,0])
+        with self.assertRaises(AssertionError):
+            B.set_value(3,1,0)
+        A.add_rows([[7,8,9],[1,1,1]])
+        A.add_column([0,0,0,0])
+        self.assertEqual(str(A), "1 2 3 0\n4 5 6 0\n7 8 9 0\n1 1 1 0")
+        with self.assertRaises(AssertionError):
+            C.set_validation_policy("lenient")
+        C.set_validation_policy("trusted")
+        self.assertEqual(C.get_validation_policy(), "trusted")
+        C.set_validation_policy(None)
+        try:
+            matrix.VALIDATION_POLICY = "incremental"
+            self.assertEqual(C.get_validation_policy(), "incremental")
+            self.assertEqual(B.get_validation_policy(), "trusted")
+        finally:
+            matrix.VALIDATION_POLICY = "strict"
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,762 @@
+# This is a script to test the operations (determinant, arithmetic and
+# products) of the Matrix() object defined in matrix.py, comparing results
+# against reference values and straightforward reference implementations
+
+import math
+import random
+import tracemalloc
+import unittest
+from fractions import Fraction
+import matrix
+from matrix import Matrix, MatrixBatch, MatrixExpression, SparseMatrix, \
+    numpy
+
+
+def cofactor_determinant(rows):
+    # Reference determinant by cofactor expansion along the first row
+    if len(rows) == 1:
+        return rows[0][0]
+    value = 0
+    for i in range(len(rows)):
+        minor = [row[:i] + row[i+1:] for row in rows[1:]]
+        value += (-1)**i*rows[0][i]*cofactor_determinant(minor)
+    return value
+
+
+def naive_product(A, B):
+    # Reference product by the textbook triple loop
+    (m, n), p = A.get_size(), B.get_size()[1]
+    return [[sum(A.get_value(i, k)*B.get_value(k, j) for k in range(1, n+1))
+        for j in range(1, p+1)] for i in range(1, m+1)]
+
+
+class TestOperations(unittest.TestCase):
+    def test_determinant(self):
+        A = Matrix([[1,2,3],[4,5,6],[7,8,9]])
+        B = Matrix([[2,0,1],[1,3,2],[1,1,2]])
+        C = Matrix([[5]])
+        D = Matrix([[0,1],[1,0]])
+        E = Matrix([[1.5,2],[3,4]])
+        self.assertEqual(A.determinant(), 0)
+        self.assertEqual(B.determinant(), 6)
+        self.assertEqual(C.determinant(), 5)
+        self.assertEqual(D.determinant(), -1)
+        self.assertAlmostEqual(E.determinant(), 0.0)
+        self.assertIsInstance(B.determinant(), int)
+        self.assertIsInstance(E.determinant(), float)
+        with self.assertRaises(AssertionError):
+            Matrix([[1,2,3]]).determinant()
+        return
+
+    def test_determinant_reference(self):
+        rng = random.Random(0)
+        for n in range(1, 7):
+            rows = [[rng.randint(-9, 9) for j in range(n)] for i in range(n)]
+            self.assertEqual(Matrix(rows).determinant(),
+                cofactor_determinant(rows))
+            rows = [[rng.uniform(-9, 9) for j in range(n)] for i in range(n)]
+            self.assertAlmostEqual(Matrix(rows).determinant(),
+                cofactor_determinant(rows), places=6)
+        return
+
+    def test_determinant_exact(self):
+        # Upper triangular with a row swap, so the result is known exactly
+        n = 30
+        rows = [[0]*i + [10**12 + i] + [i*j for j in range(n-i-1)]
+            for i in range(n)]
+        rows[0], rows[1] = rows[1], rows[0]
+        expected = -1
+        for i in range(n):
+            expected *= 10**12 + i
+        self.assertEqual(Matrix(rows).determinant(), expected)
+        return
+
+    def test_multiply(self):
+        A = Matrix([[1,2,3],[4,5,6]])
+        B = Matrix([[1,2],[3,4],[5,6]])
+        C = Matrix([[1.5],[2]])
+        self.assertEqual(str(A.matrix_multiply(B)), "22 28\n49 64")
+        self.assertEqual(str(B.matrix_multiply(A)),
+            " 9 12 15\n19 26 33\n29 40 51")
+        self.assertEqual(str(B.matrix_multiply(C)), " 5.5\n12.5\n19.5")
+        with self.assertRaises(AssertionError):
+            A.matrix_multiply(A)
+        return
+
+    def test_multiply_blocked_strassen(self):
+        rng = random.Random(0)
+        blockSize = matrix.MULTIPLY_BLOCK_SIZE
+        threshold = matrix.STRASSEN_THRESHOLD
+        try:
+            # Small settings exercise tiling, padding and several levels of
+            # recursion on odd and rectangular shapes
+            matrix.MULTIPLY_BLOCK_SIZE = 4
+            matrix.STRASSEN_THRESHOLD = 3
+            for m, n, p in [(9,9,9), (17,10,13), (12,31,7)]:
+                A = Matrix([[rng.randint(-9, 9) for j in range(n)]
+                    for i in range(m)])
+                B = Matrix([[rng.randint(-9, 9) for j in range(p)]
+                    for i in range(n)])
+                C = A.matrix_multiply(B)
+                self.assertEqual(C.get_size(), (m, p))
+                self.assertEqual(C.values, naive_product(A, B))
+        finally:
+            matrix.MULTIPLY_BLOCK_SIZE = blockSize
+            matrix.STRASSEN_THRESHOLD = threshold
+        return
+
+    def test_multiply_parallel(self):
+        rng = random.Random(0)
+        threshold = matrix.PARALLEL_THRESHOLD
+        A = Matrix([[rng.randint(-9, 9) for j in range(13)] for i in range(9)])
+        B = Matrix([[rng.random() for j in range(7)] for i in range(13)],
+            compact=True)
+        C = Matrix([[2**40, 1],[1, 2**40]])    # Products overflow 64 bits
+        try:
+            matrix.PARALLEL_THRESHOLD = 1
+            for X, Y in [(A, A.transpose()), (A, B), (C, C)]:
+                Z = X.matrix_multiply(Y, workers=4)
+                self.assertEqual(Z.values, X.matrix_multiply(Y).values)
+                self.assertEqual(Z.is_compact(), X.is_compact())
+        finally:
+            matrix.PARALLEL_THRESHOLD = threshold
+        with self.assertRaises(AssertionError):
+            A.matrix_multiply(B, workers=0)
+        return
+
+    def test_expressions(self):
+        A = Matrix([[1,2,3],[4,5,6]])
+        B = Matrix([[1,2],[3,4],[5,6]])
+        C = Matrix([[1.5,2],[3,4]], compact=True)
+        E = 2*(A @ B) - C.T + A @ B
+        self.assertIsInstance(E, MatrixExpression)
+        self.assertEqual(E.get_size(), (2, 2))
+        self.assertEqual(E.get_value(1, 2), 81)
+        self.assertEqual(E.evaluate().values, [[64.5,81],[145,188]])
+        # Each evaluation gives its own copy of the result
+        F = E.evaluate()
+        F.set_value(1, 1, 0)
+        self.assertIsNot(E.evaluate(), F)
+        self.assertEqual(E.evaluate().values, [[64.5,81],[145,188]])
+        # Results are worked out again once a matrix of the formula changes
+        C.set_value(1, 1, 0.5)
+        self.assertEqual(E.get_value(1, 1), 65.5)
+        self.assertEqual(E.evaluate().values, [[65.5,81],[145,188]])
+        A[0, 0] = 0
+        self.assertEqual(E.get_value(1, 1), 62.5)
+        A[0, 0] = 1
+        D = Matrix([[1,1,1],[1,1,1]])
+        self.assertEqual((A + B.T - 2*D).evaluate().values,
+                         [[0,3,6],[4,7,10]])
+        # Transposes are folded into the product
+        self.assertEqual((A.T @ B.T).evaluate().values,
+            B.matrix_multiply(A).transpose().values)
+        self.assertEqual(((A @ B).T - (B.T @ A.T)).evaluate().values,
+            [[0,0],[0,0]])
+        self.assertEqual((-A.T.T).evaluate().values, [[-1,-2,-3],[-4,-5,-6]])
+        # A matrix on its own evaluates to a copy
+        self.assertIsNot(A.T.T.evaluate(), A)
+        self.assertEqual(A.T.evaluate().values, A.transpose().values)
+        with self.assertRaises(AssertionError):
+            A + B
+        with self.assertRaises(AssertionError):
+            A @ A
+        with self.assertRaises(TypeError):
+            A * B
+        with self.assertRaises(AssertionError):
+            A @ SparseMatrix([[0,1],[0,0],[1,0]])
+        return
+
+    def test_expression_common_subexpressions(self):
+        A = Matrix([[1,2],[3,4]])
+        B = Matrix([[0,1],[1,0]])
+        calls = []
+        multiply = Matrix.matrix_multiply
+        def counted(self, otherMatrix, **options):
+            calls.append(1)
+            return multiply(self, otherMatrix, **options)
+        Matrix.matrix_multiply = counted
+        try:
+            E = (A @ B) + 2*(A @ B) - (B.T @ A.T).T
+            self.assertEqual(E.evaluate().values, [[4,2],[8,6]])
+        finally:
+            Matrix.matrix_multiply = multiply
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(Matrix.linear_combination([2, -1.5], [A, B]).values,
+            [[2,2.5],[4.5,8]])
+        return
+
+    def test_chain_multiply(self):
+        rng = random.Random(0)
+        # Textbook example, whose best plan takes 15125 scalar products
+        dimensions = [30, 35, 15, 5, 10, 20, 25]
+        chain = [Matrix([[rng.randint(-9, 9) for j in range(q)]
+            for i in range(p)]) for p, q in zip(dimensions, dimensions[1:])]
+        plan, flops = Matrix.chain_order(*chain)
+        self.assertEqual(plan, ((1, (2, 3)), ((4, 5), 6)))
+        self.assertEqual(flops, 2*15125)
+        expected = chain[0]
+        for A in chain[1:]:
+            expected = expected.matrix_multiply(A)
+        self.assertEqual(Matrix.chain_multiply(*chain).values,
+            expected.values)
+        E = chain[0] @ chain[1] @ chain[2] @ chain[3] @ chain[4] @ chain[5]
+        self.assertEqual(E.evaluate().values, expected.values)
+        self.assertEqual(Matrix.chain_order(chain[0]), (1, 0))
+        self.assertIsNot(Matrix.chain_multiply(chain[0]), chain[0])
+        with self.assertRaises(AssertionError):
+            Matrix.chain_multiply(chain[0], chain[0])
+        return
+
+    def test_broadcasting(self):
+        threshold = matrix.NUMPY_THRESHOLD
+        try:
+            for useNumpy in (True, False):
+                matrix.NUMPY_THRESHOLD = 1
+                matrix.USE_NUMPY = useNumpy
+                for compact in (False, True):
+                    A = Matrix([[1,2,3],[4,5,6]], compact=compact)
+                    row = Matrix([[1,2,3]], compact=compact)
+                    column = Matrix([[1],[4]], compact=compact)
+                    self.assertEqual(A.subtract(row).values,
+                                     [[0,0,0],[3,3,3]])
+                    self.assertEqual(A.multiply(column).values,
+                                     [[1,2,3],[16,20,24]])
+                    self.assertEqual(A.multiply(A).values,
+                                     [[1,4,9],[16,25,36]])
+                    self.assertEqual(A.subtract(1.5).values,
+                                     [[-0.5,0.5,1.5],[2.5,3.5,4.5]])
+                    self.assertEqual(A.divide(column).values,
+                                     [[1.0,2.0,3.0],[1.0,1.25,1.5]])
+                    self.assertEqual(A.power(row).values,
+                                     [[1,4,27],[4,25,216]])
+                    self.assertEqual(A.compare(3, ">=").values,
+                                     [[0,0,1],[1,1,1]])
+                    self.assertEqual(A.compare(A.transpose().transpose(),
+                                               "==").values,
+                                     [[1,1,1],[1,1,1]])
+                    # Row and column operands broadcast against each other
+                    self.assertEqual(row.subtract(column).values,
+                                     [[0,1,2],[-3,-2,-1]])
+                    self.assertEqual(A.compare(3, "<").is_compact(), True)
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+            matrix.USE_NUMPY = True
+        # Several steps fused into one pass, with broadcast operands
+        A = Matrix([[1,2,3],[4,5,6]])
+        means = Matrix([[2],[5]])
+        self.assertEqual(
+            A.apply(lambda x, mean, scale: (x - mean)/scale, means, 2).values,
+            [[-0.5,0.0,0.5],[-0.5,0.0,0.5]])
+        self.assertEqual(A.apply(abs).values, A.values)
+        # Dtypes promote, and integer quotients become floating point
+        B = Matrix([[2,4]], dtype="int64")
+        self.assertEqual(B.subtract(1).get_dtype(), "int64")
+        self.assertEqual(B.divide(2).get_dtype(), "float64")
+        self.assertEqual(B.compare(B, "!=").get_dtype(), "int64")
+        with self.assertRaises(AssertionError):
+            A.subtract(Matrix([[1,2]]))
+        with self.assertRaises(AssertionError):
+            A.compare(1, "=<")
+        with self.assertRaises(AssertionError):
+            A.multiply("2")
+        # Results that are not numbers are refused, not stored
+        with self.assertRaises(AssertionError):
+            A.multiply(1j)
+        with self.assertRaises(AssertionError):
+            Matrix([[-8,2]]).power(0.5)
+        with self.assertRaises(AssertionError):
+            Matrix([[1,2]], compact=True).apply(lambda x: "s")
+        # Exact numbers give exact results, of the object dtype
+        for compact in (False, True):
+            F = Matrix([[1,2]], compact=compact)
+            G = F.subtract(Fraction(1,3))
+            self.assertEqual(G.values, [[Fraction(2,3),Fraction(5,3)]])
+            self.assertEqual(G.get_dtype(), "object")
+            self.assertEqual(F.divide(Fraction(2)).values,
+                             [[Fraction(1,2),1]])
+            self.assertEqual(F.power(Fraction(2)).values, [[1,4]])
+            self.assertEqual(F.compare(Fraction(3,2), ">").values, [[0,1]])
+        with self.assertRaises(AssertionError):
+            A.subtract(SparseMatrix([[1,0,0],[0,0,1]]))
+        return
+
+    def test_reductions(self):
+        threshold = matrix.NUMPY_THRESHOLD
+        try:
+            for useNumpy in (True, False):
+                matrix.NUMPY_THRESHOLD = 1
+                matrix.USE_NUMPY = useNumpy
+                for compact in (False, True):
+                    A = Matrix([[1,-7,3],[4,5,6]], compact=compact)
+                    self.assertEqual(A.sum(), 12)
+                    self.assertEqual(A.sum(axis=0).values, [[5,-2,9]])
+                    self.assertEqual(A.sum(axis=1).values, [[-3],[15]])
+                    self.assertEqual(A.mean(), 2.0)
+                    self.assertEqual(A.mean(axis=0).values,
+                                     [[2.5,-1.0,4.5]])
+                    self.assertEqual((A.min(), A.max()), (-7, 6))
+                    self.assertEqual(A.min(axis=1).values, [[-7],[4]])
+                    self.assertEqual(A.max(axis=0).values, [[4,5,6]])
+                    self.assertEqual(A.argmax(), (2, 3))
+                    self.assertEqual(A.argmax(axis=0).values, [[2,2,2]])
+                    self.assertEqual(A.argmax(axis=1).values, [[3],[3]])
+                    self.assertAlmostEqual(A.norm(), 136**0.5)
+                    self.assertEqual(A.norm(1), 12)
+                    self.assertEqual(A.norm(math.inf), 15)
+                    self.assertEqual(A.stats(), {"count": 6, "sum": 12,
+                        "mean": 2.0, "min": -7, "max": 6,
+                        "norm": A.norm()})
+                    # Column sums broadcast back against the matrix
+                    self.assertEqual(A.subtract(A.mean(axis=0)).sum(), 0)
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+            matrix.USE_NUMPY = True
+        B = Matrix([[1,2],[3,4]])
+        self.assertEqual(B.trace(), 5)
+        self.assertEqual(B[::-1, :].trace(), 5)
+        with self.assertRaises(AssertionError):
+            Matrix([[1,2]]).trace()
+        with self.assertRaises(AssertionError):
+            B.sum(axis=2)
+        with self.assertRaises(AssertionError):
+            B.norm(2)
+        # Norms are cached until the matrix changes
+        B.norm()
+        B.norm()
+        self.assertEqual(B.cache_info()["hits"], 1)
+        B.set_value(1,1,0)
+        self.assertEqual(B.norm(1), 6)
+        # Compensated sums keep the small terms lost by plain summation
+        C = Matrix.from_flat([1e16,1.0,-1e16,1.0]*50, 200, 1, compact=True)
+        self.assertEqual(C.sum(compensated=True), 100.0)
+        self.assertEqual(C.sum(axis=0, compensated=True).values, [[100.0]])
+        self.assertEqual(C.transpose().sum(axis=1, compensated=True)
+                         .values, [[100.0]])
+        self.assertEqual(C.stats(compensated=True)["sum"], 100.0)
+        # Exact elements stay exact
+        D = Matrix([[Fraction(1,3),1],[2,Fraction(1,6)]], dtype="object")
+        self.assertEqual(D.sum(compensated=True), Fraction(7,2))
+        self.assertEqual(D.mean(axis=0).values,
+                         [[Fraction(7,6),Fraction(7,12)]])
+        # Sums that overflow or meet infinities give what plain sums give
+        inf = math.inf
+        for compact in (False, True):
+            E = Matrix([[1e308,1e308],[inf,1.0]], compact=compact)
+            self.assertEqual(E[0,:].sum(compensated=True), inf)
+            self.assertEqual(E[0,:].mean(compensated=True), inf)
+            self.assertEqual(E.sum(axis=1, compensated=True).values,
+                             [[inf],[inf]])
+            self.assertEqual(E.sum(axis=0, compensated=True).values,
+                             [[inf,1e308]])
+            self.assertEqual(E.stats(compensated=True)["sum"], inf)
+            F = Matrix([[inf,-inf],[math.nan,1.0]], compact=compact)
+            self.assertTrue(math.isnan(F.stats(compensated=True)["sum"]))
+            self.assertTrue(math.isnan(F[0,:].sum(compensated=True)))
+            self.assertTrue(math.isnan(
+                F.sum(axis=0, compensated=True).get_value(1,1)))
+            # Norms are scaled so their squares do not overflow
+            G = Matrix([[1e200,1e200]], compact=compact)
+            self.assertAlmostEqual(G.norm()/1e200, 2**0.5)
+            self.assertEqual(G.stats()["norm"], G.norm())
+        self.assertAlmostEqual(Matrix([[2**600,0]]).stats()["norm"],
+                               float(2**600))
+        return
+
+    def test_cache(self):
+        A = Matrix([[2,1],[1,3]])
+        self.assertEqual(A.determinant(), 5)
+        self.assertEqual(A.determinant(), 5)
+        T = A.transpose()
+        T.set_value(1,1,0)    # Changes to results do not reach the cache
+        self.assertEqual(A.transpose().values, [[2,1],[1,3]])
+        info = A.cache_info()
+        self.assertEqual((info["hits"], info["misses"]), (2, 2))
+        self.assertEqual(info["entries"], ["determinant", "transpose"])
+        # Every mutator starts a new version, dropping the cached results
+        version = info["version"]
+        for change in (lambda: A.set_value(1,1,4),
+                lambda: A.scalar_add(1), lambda: A.scalar_multiply(2),
+                lambda: A.add_row([1,2]), lambda: A.delete_row(3),
+                lambda: A.add_column([0,0]), lambda: A.delete_column(3),
+                lambda: A.add_scaled(A, 1), lambda: A.insert_rows(1, [[1,1]]),
+                lambda: A.delete_rows([1])):
+            A.transpose()
+            change()
+            self.assertEqual(A.cache_info()["entries"], [])
+            self.assertGreater(A.cache_info()["version"], version)
+            version = A.cache_info()["version"]
+        self.assertEqual(A.determinant(), 256)
+        # Views share the version of the storage, in both directions
+        V = A[:, :1]
+        self.assertEqual(V.transpose().values, [[20,8]])
+        A[0, 0] = 1
+        self.assertEqual(V.transpose().values, [[1,8]])
+        self.assertEqual(A.determinant(), 1*16 - 8*8)
+        V[1, 0] = 0
+        self.assertEqual(A.determinant(), 16)
+        A.clear_cache()
+        self.assertEqual(A.cache_info(), {"version": A.cache_info()["version"],
+            "hits": 0, "misses": 0, "entries": []})
+        return
+
+    def test_lu(self):
+        A = Matrix([[2,1,1],[4,-6,0],[-2,7,2]])
+        factors = A.lu()
+        self.assertIs(A.lu(), factors)    # Kept until A changes
+        self.assertEqual(factors.get_size(), (3,3))
+        # Exact for integers, as Matrix.determinant() is
+        self.assertEqual(factors.determinant(), A.determinant())
+        self.assertIsInstance(factors.determinant(), int)
+        L, U, permutation = factors.get_factors()
+        self.assertEqual(permutation, [2,1,3])
+        self.assertEqual(L.matrix_multiply(U).values,
+            A.select(rows=permutation).values)
+        self.assertEqual(factors.solve([5,-2,9]), [1.0,1.0,2.0])
+        self.assertEqual(A.solve([5,-2,9]), [1.0,1.0,2.0])
+        X = factors.solve_many(Matrix([[5,1],[-2,0],[9,0]]))
+        self.assertEqual(X.get_column(1), [1.0,1.0,2.0])
+        self.assertEqual(factors.solve_many([[5,1],[-2,0],[9,0]]).values,
+                         X.values)
+        self.assertEqual(A.matrix_multiply(X).get_column(2), [1.0,0.0,0.0])
+        self.assertEqual(A.matrix_multiply(A.inverse()).values,
+            Matrix.identity(3).values)
+        A.set_value(1, 1, 3)
+        self.assertIsNot(A.lu(), factors)
+        self.assertAlmostEqual(A.lu().determinant(), A.determinant())
+
+        # Larger systems, through NumPy when it is installed and without
+        rng = random.Random(0)
+        n = 40
+        B = Matrix([[rng.uniform(-1, 1) for j in range(n)]
+            for i in range(n)], compact=True)
+        b = [rng.uniform(-1, 1) for i in range(n)]
+        threshold = matrix.NUMPY_THRESHOLD
+        try:
+            matrix.NUMPY_THRESHOLD = 1
+            for useNumpy in (True, False):
+                matrix.USE_NUMPY = useNumpy
+                B.clear_cache()
+                x = B.solve(b)
+                for i in range(n):
+                    self.assertAlmostEqual(
+                        sum(B.get_value(i+1, j+1)*x[j] for j in range(n)),
+                        b[i])
+                self.assertAlmostEqual(B.lu().determinant()
+                    / B.determinant(), 1.0)
+                inverse = B.inverse()
+                self.assertTrue(inverse.is_compact())
+                product = B.matrix_multiply(inverse)
+                for i in range(n):
+                    for j in range(n):
+                        self.assertAlmostEqual(product.get_value(i+1, j+1),
+                            float(i == j))
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+            matrix.USE_NUMPY = True
+
+        # Singular and non-square matrices
+        singular = Matrix([[1,2],[2,4]]).lu()
+        self.assertTrue(singular.is_singular())
+        self.assertEqual(singular.determinant(), 0)
+        singular = Matrix([[1.0,2.0],[2.0,4.0]]).lu()
+        self.assertEqual(str(singular.determinant()), "0.0")    # Not -0.0
+        with self.assertRaises(AssertionError):
+            singular.solve([1,2])
+        with self.assertRaises(AssertionError):
+            Matrix([[1,2,3],[4,5,6]]).lu()
+        with self.assertRaises(AssertionError):
+            factors.solve([1,2])
+        return
+
+    def test_batch(self):
+        A = MatrixBatch([[[1,2],[3,4]], Matrix([[0,1],[1,0]])])
+        B = MatrixBatch.from_flat([1,0,0,1, 2,0,0,2], 2, 2, 2)
+        self.assertEqual(len(A), 2)
+        self.assertEqual(A.get_count(), 2)
+        self.assertEqual(A.get_size(), (2,2))
+        self.assertEqual(str(A), "1 2\n3 4\n\n0 1\n1 0")
+        self.assertEqual(A.matrix_multiply(B).get_matrix(2).values,
+            [[0,2],[2,0]])
+        self.assertEqual(A.matrix_add(B).get_matrix(1).values,
+            [[2,2],[3,5]])
+        self.assertEqual(A.transpose().get_matrix(1).values, [[1,3],[2,4]])
+        self.assertEqual(A.determinant(), [-2,-1])
+        C = A.matrix_multiply(Matrix([[0,1],[1,0]]))    # Same for each
+        self.assertEqual(C.get_matrix(1).values, [[2,1],[4,3]])
+        D = MatrixBatch([[[1,2,3],[4,5,6]]]*3).matrix_multiply(
+            Matrix([[1],[0],[2]]))
+        self.assertEqual(D.get_size(), (2,1))
+        self.assertEqual(D.get_matrix(3).values, [[7],[16]])
+
+        # Every kernel against the same operations on single matrices
+        rng = random.Random(0)
+        threshold = matrix.NUMPY_THRESHOLD
+        try:
+            matrix.NUMPY_THRESHOLD = 1
+            for n in (1, 2, 3, 4, 5):
+                for compact in (False, True):
+                    left = [[[rng.uniform(-5, 5) for j in range(n)]
+                        for i in range(n)] for k in range(6)]
+                    right = [[[rng.randint(-5, 5) for j in range(n)]
+                        for i in range(n)] for k in range(6)]
+                    A = MatrixBatch(left, compact=compact)
+                    B = MatrixBatch(right, compact=compact)
+                    for useNumpy in (True, False):
+                        matrix.USE_NUMPY = useNumpy
+                        products = A.matrix_multiply(B).to_matrices()
+                        sums = A.matrix_add(B).to_matrices()
+                        transposes = A.transpose().to_matrices()
+                        values = A.determinant()
+                        exact = B.determinant()
+                        for k in range(6):
+                            X, Y = Matrix(left[k]), Matrix(right[k])
+                            product = X.matrix_multiply(Y)
+                            for i in range(n):
+                                for j in range(n):
+                                    self.assertAlmostEqual(
+                                        products[k].values[i][j],
+                                        product.values[i][j])
+                            self.assertEqual(sums[k].values,
+                                X.matrix_add(Y).values)
+                            self.assertEqual(transposes[k].values,
+                                X.transpose().values)
+                            self.assertAlmostEqual(values[k],
+                                X.determinant())
+                            self.assertEqual(exact[k], Y.determinant())
+                        self.assertEqual(
+                            A.matrix_multiply(B).is_compact(), compact)
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+            matrix.USE_NUMPY = True
+
+        with self.assertRaises(AssertionError):
+            MatrixBatch([[[1,2]], [[1],[2]]])
+        with self.assertRaises(AssertionError):
+            A.matrix_multiply(MatrixBatch([[[1]]]))
+        with self.assertRaises(AssertionError):
+            D.determinant()
+        return
+
+    def test_profile(self):
+        A = Matrix([[1,2,3],[4,5,6]])
+        B = Matrix([[1,2],[3,4],[5,6]])
+        original = Matrix.matrix_multiply
+        calls = []
+        with matrix.profile(hook=lambda name, call:
+                            calls.append((name, call["depth"]))) as stats:
+            C = A.matrix_multiply(B)
+            C.determinant()
+            A[0:1].transpose()
+            with self.assertRaises(AssertionError):
+                A.matrix_add(B)
+        # The methods are only wrapped while profiling
+        self.assertIs(Matrix.matrix_multiply, original)
+        operations = stats.get_operations()
+        self.assertEqual(operations["Matrix.matrix_multiply"]["calls"], 1)
+        self.assertEqual(operations["Matrix.matrix_multiply"]["flops"],
+            2*2*3*2)
+        self.assertEqual(operations["Matrix.matrix_multiply"]["matrices"], 1)
+        self.assertGreater(operations["Matrix.matrix_multiply"]["bytes"], 0)
+        self.assertEqual(operations["Matrix.determinant"]["flops"], 5)
+        # Views share memory, while transposes (cached, then copied) do not
+        self.assertEqual(operations["Matrix.__getitem__"]["matrices"], 1)
+        self.assertEqual(operations["Matrix.__getitem__"]["bytes"], 0)
+        self.assertEqual(operations["Matrix.transpose"]["matrices"], 2)
+        self.assertEqual(operations["Matrix.copy"]["calls"], 1)
+        # Failed calls are recorded, with no estimate of their arithmetic
+        self.assertEqual(operations["Matrix.matrix_add"]["errors"], 1)
+        self.assertEqual(operations["Matrix.matrix_add"]["flops"], 0)
+        # Calls made within profiled methods count towards them, not twice
+        total = stats.get_total()
+        self.assertEqual(total["calls"], 5)
+        self.assertEqual(total["errors"], 1)
+        self.assertEqual(total["matrices"], 4)
+        self.assertEqual(total["flops"], 24 + 5)
+        self.assertIn(("Matrix.copy", 1), calls)
+        self.assertIn(("Matrix.transpose", 0), calls)
+        self.assertIn("Matrix.matrix_multiply", str(stats))
+
+        # Methods that work in place are estimated from their operands
+        with matrix.profile() as stats:
+            A.copy().scalar_multiply(2)
+            A.copy().add_scaled(A, 3)
+        operations = stats.get_operations()
+        self.assertEqual(operations["Matrix.scalar_multiply"]["flops"], 6)
+        self.assertEqual(operations["Matrix.add_scaled"]["flops"], 12)
+
+        # Results from the cache take no arithmetic, arguments given by
+        # keyword are estimated like the others, as are sparse results
+        E = Matrix([[2,1,0],[1,3,1],[0,1,4]])
+        with matrix.profile() as stats:
+            E.determinant()
+            E.determinant()
+        operations = stats.get_operations()
+        self.assertEqual(operations["Matrix.determinant"]["calls"], 2)
+        self.assertEqual(operations["Matrix.determinant"]["flops"], 18)
+        with matrix.profile() as stats:
+            A.matrix_multiply(otherMatrix=B)
+            A.matrix_add(SparseMatrix([[0,1,0],[0,0,2]]))
+        operations = stats.get_operations()
+        self.assertEqual(operations["Matrix.matrix_multiply"]["flops"], 24)
+        self.assertEqual(operations["Matrix.matrix_add"]["flops"], 6)
+
+        # Hooks subscribe to every call until removed
+        events = []
+        hook = lambda name, call: events.append(name)
+        matrix.add_profile_hook(hook)
+        try:
+            A.scalar_add(1)
+        finally:
+            matrix.remove_profile_hook(hook)
+        count = len(events)
+        A.scalar_add(1)
+        self.assertEqual(events[-1], "Matrix.scalar_add")
+        self.assertEqual(len(events), count)
+        self.assertIs(Matrix.matrix_multiply, original)
+        return
+
+    def test_in_place(self):
+        threshold = matrix.NUMPY_THRESHOLD
+        try:
+            for useNumpy in (True, False):
+                matrix.NUMPY_THRESHOLD = 1
+                matrix.USE_NUMPY = useNumpy
+                A = Matrix([[1,2],[3,4]], compact=True)
+                B = Matrix([[0.5,1],[1,0]], compact=True)
+                C = Matrix.zeros(2, 2, compact=True)
+                self.assertIs(A.matrix_add(A, out=C), C)
+                self.assertEqual(C.values, [[2,4],[6,8]])
+                A.matrix_add(B, out=C)    # Widens the output to fit
+                self.assertEqual(C.values, [[1.5,3],[4,4]])
+                A.matrix_multiply(B, out=C)
+                self.assertEqual(C.values, [[2.5,1],[5.5,3]])
+                C @= B
+                self.assertEqual(C.values, [[2.25,2.5],[5.75,5.5]])
+                A.transpose(out=C)
+                self.assertEqual(C.values, [[1,3],[2,4]])
+                C.transpose(out=C)
+                self.assertEqual(C.values, A.values)
+                D = C
+                C += B
+                C -= 2*A
+                self.assertIs(C, D)
+                self.assertEqual(C.values, [[-0.5,-1],[-2,-4]])
+                C.add_scaled(B, -0.5)
+                self.assertEqual(C.values, [[-0.75,-1.5],[-2.5,-4]])
+                Matrix.linear_combination([1, 2], [A, A], out=C)
+                self.assertEqual(C.values, [[3,6],[9,12]])
+                Matrix.chain_multiply(A, A, B, out=C)
+                self.assertEqual(C.values, [[13.5,7],[29.5,15]])
+                # Outputs and operands may share storage
+                E = Matrix([[1,2,3],[4,5,6],[7,8,9]])
+                E.matrix_add(E[::-1, ::-1], out=E)
+                self.assertEqual(E.values, [[10]*3]*3)
+                E[1:, :2].matrix_add(E[:2, 1:], out=E[:2, 1:])
+                self.assertEqual(E.values, [[10,20,20],[10,20,20],[10,10,10]])
+                F = Matrix([[1,2],[3,4]], compact=True)
+                with self.assertRaises(AssertionError):
+                    F.matrix_add(F, out=Matrix.zeros(3, 2))
+                with self.assertRaises(AssertionError):
+                    F[0].matrix_add(B[0], out=F[1])    # Views cannot widen
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+            matrix.USE_NUMPY = True
+        with self.assertRaises(TypeError):
+            A += 1
+        return
+
+    def test_in_place_allocations(self):
+        n = 32
+        A = Matrix([[float(i + j) for j in range(n)] for i in range(n)],
+            compact=True)
+        B = Matrix([[float(i - j) for j in range(n)] for i in range(n)],
+            compact=True)
+        threshold = matrix.NUMPY_THRESHOLD
+        for useNumpy in (True, False):
+            try:
+                matrix.NUMPY_THRESHOLD = 1
+                matrix.USE_NUMPY = useNumpy
+                C = Matrix.zeros(n, n, compact=True)
+                def step(C):
+                    A.matrix_add(B, out=C)
+                    C -= B
+                    C += B
+                    C.add_scaled(B, 0.5)
+                    A.transpose(out=C)
+                    A.matrix_multiply(B, out=C)
+                tracemalloc.start()
+                for i in range(3):    # Reach the steady state
+                    step(C)
+                before = tracemalloc.get_traced_memory()[0]
+                for i in range(10):
+                    step(C)
+                after = tracemalloc.get_traced_memory()[0]
+                # In the steady state, nothing is left allocated per step
+                self.assertLess(after - before, 8*n)
+                if useNumpy and numpy is not None:
+                    # And NumPy makes no temporary arrays for sums,
+                    # differences and transposes
+                    tracemalloc.reset_peak()
+                    A.matrix_add(B, out=C)
+                    C -= B
+                    A.transpose(out=C)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    self.assertLess(peak - after, 8*n*n//2)
+                if not useNumpy:
+                    # Products written into C only make the packed columns,
+                    # not a whole new product as well
+                    tracemalloc.reset_peak()
+                    A.matrix_multiply(B)
+                    new = tracemalloc.get_traced_memory()[1] - after
+                    tracemalloc.reset_peak()
+                    A.matrix_multiply(B, out=C)
+                    into = tracemalloc.get_traced_memory()[1] - after
+                    self.assertLess(into, 0.75*new)
+            finally:
+                tracemalloc.stop()
+                matrix.NUMPY_THRESHOLD = threshold
+                matrix.USE_NUMPY = True
+        return
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_backend(self):
+        rng = random.Random(0)
+        threshold = matrix.NUMPY_THRESHOLD
+        A = Matrix([[rng.uniform(-9, 9) for j in range(6)] for i in range(6)],
+            compact=True)
+        B = Matrix([[rng.uniform(-9, 9) for j in range(6)] for i in range(6)])
+        C = Matrix([[rng.randint(-9, 9) for j in range(6)] for i in range(6)],
+            compact=True)
+        D = Matrix([[2**62,1],[1,1]], compact=True)
+        results = []
+        try:
+            for useNumpy in (True, False):
+                matrix.NUMPY_THRESHOLD = 1
+                matrix.USE_NUMPY = useNumpy
+                E = D.copy()
+                E.scalar_multiply(4)
+                results.append([A.matrix_multiply(B).values,
+                    A.matrix_add(A).values, C.matrix_multiply(C).values,
+                    C.transpose().values, D.matrix_multiply(D).values,
+                    E.values, A.determinant(), B.determinant(),
+                    C.determinant()])
+        finally:
+            matrix.NUMPY_THRESHOLD = threshold
+            matrix.USE_NUMPY = True
+        fast, slow = results
+        for i, j in zip(fast[0], slow[0]):
+            for x, y in zip(i, j):
+                self.assertAlmostEqual(x, y, places=9)
+        # Integer results, including one which would overflow, are exact
+        self.assertEqual(fast[1:6], slow[1:6])
+        self.assertEqual(fast[5][0][0], 2**64)
+        self.assertAlmostEqual(fast[6], slow[6], places=6)
+        self.assertAlmostEqual(fast[7], slow[7], places=6)
+        self.assertEqual(fast[8], slow[8])
+        self.assertIsInstance(fast[8], int)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,517 @@
+# This is a script to test the storage of the Matrix() object defined in
+# matrix.py (compact arrays, the values view and conversions between them)
+
+import copy
+import math
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from array import array
+from decimal import Decimal
+from fractions import Fraction
+import matrix
+from matrix import Matrix, MatrixBatch, numpy
+
+
+class TestStorage(unittest.TestCase):
+    def test_compact(self):
+        A = Matrix([[1,2,3],[4,5,6]], compact=True)
+        B = Matrix([[1.5,2],[3,4]], compact=True)
+        C = Matrix([[1,2,3],[4,5,6]])
+        self.assertTrue(A.is_compact())
+        self.assertTrue(B.is_compact())
+        self.assertFalse(C.is_compact())
+        self.assertEqual(str(A), str(C))
+        self.assertEqual(B.get_value(2,2), 4.0)
+        self.assertEqual(str(A.transpose()), str(C.transpose()))
+        self.assertEqual(str(A.matrix_add(A)), str(C.matrix_add(C)))
+        self.assertTrue(A.matrix_add(A).is_compact())
+        self.assertFalse(A.matrix_add(C).is_compact())
+        return
+
+    def test_compact_widening(self):
+        A = Matrix([[1,2],[3,4]], compact=True)
+        A.set_value(1,1,0.5)
+        self.assertEqual(A.get_value(1,1), 0.5)
+        self.assertEqual(A.get_value(2,2), 4)
+        A.set_value(1,2,2**70)
+        self.assertEqual(A.get_value(1,2), 2**70)
+        B = Matrix([[1,2],[3,4]], compact=True)
+        B.add_row([5,6.5])
+        self.assertEqual(B.get_value(3,2), 6.5)
+        B.scalar_multiply(2)
+        self.assertEqual(B.get_value(3,2), 13.0)
+        with self.assertRaises(AssertionError):
+            B.set_value(1,1,"hello world")
+        return
+
+    def test_edits(self):
+        A = Matrix([[1,2,3],[4,5,6],[7,8,9]], compact=True)
+        A.delete_column(2)
+        A.delete_row(1)
+        A.add_column([0,0])
+        self.assertEqual(str(A), "4 6 0\n7 9 0")
+        return
+
+    def test_batch_edits(self):
+        for compact in (False, True):
+            A = Matrix([[4*i + j for j in range(4)] for i in range(4)],
+                compact=compact)
+            B = A.select([4,1,1], [2,3])
+            self.assertEqual(B.values, [[13,14],[1,2],[1,2]])
+            self.assertEqual(A.select(columns=[4,3,2,1]).get_row(1),
+                [3,2,1,0])
+            A.delete_rows([3,1,3])
+            self.assertEqual(A.values, [[4,5,6,7],[12,13,14,15]])
+            A.delete_columns(range(2, 4))
+            self.assertEqual(A.values, [[4,7],[12,15]])
+            A.insert_rows(2, [[0,1],[2,3]])
+            self.assertEqual(A.values, [[4,7],[0,1],[2,3],[12,15]])
+            A.insert_columns(1, [[9,9,9,9],[8.5,8,8,8]])
+            self.assertEqual(A.get_row(1), [9,8.5,4,7])
+            self.assertEqual(A.get_column(4), [7,1,3,15])
+            A.add_columns([[1,2,3,4]])
+            self.assertEqual(A.get_row(4), [9,8,12,15,4])
+            self.assertEqual(A.is_compact(), compact)
+            # Editing a view gives it storage of its own
+            V = A[1:3, :2]
+            V.insert_rows(3, [[0,0]])
+            self.assertEqual(V.values, [[9,8],[9,8],[0,0]])
+            self.assertEqual(A.get_size(), (4, 5))
+            with self.assertRaises(AssertionError):
+                A.delete_rows([1,2,3,4])
+            with self.assertRaises(AssertionError):
+                A.delete_columns([6])
+            with self.assertRaises(AssertionError):
+                A.insert_rows(6, [[1,2,3,4,5]])
+            with self.assertRaises(AssertionError):
+                A.insert_columns(1, [[1,2,3]])
+            with self.assertRaises(AssertionError):
+                A.insert_columns(1, [[1,2,3,"hello world"]])
+            with self.assertRaises(AssertionError):
+                A.select([0])
+            self.assertEqual(A.get_size(), (4, 5))
+        return
+
+    def test_values_view(self):
+        A = Matrix([[1,2,3],[4,5,6]], compact=True)
+        self.assertEqual(A.values, [[1,2,3],[4,5,6]])
+        self.assertEqual(A.values[1][2], 6)
+        self.assertEqual(A.values[-1][-1], 6)
+        self.assertEqual(len(A.values), 2)
+        self.assertEqual(len(A.values[0]), 3)
+        A.values[0][0] = 10
+        self.assertEqual(A.get_value(1,1), 10)
+        with self.assertRaises(IndexError):
+            A.values[2]
+        return
+
+    def test_views(self):
+        for compact in (False, True):
+            A = Matrix([[4*i + j for j in range(4)] for i in range(5)],
+                compact=compact)
+            self.assertEqual(A[2, -1], 11)
+            self.assertEqual(A[1].values, [[4,5,6,7]])
+            self.assertEqual(A[:, 1].values, [[1],[5],[9],[13],[17]])
+            V = A[1:4, ::2]
+            self.assertEqual(V.values, [[4,6],[8,10],[12,14]])
+            self.assertEqual(A[::-2, ::-3].values, [[19,16],[11,8],[3,0]])
+            self.assertEqual(V[1:, 1].values, [[10],[14]])
+            # Views share memory with the matrix, in both directions
+            V.scalar_multiply(10)
+            self.assertEqual(A.get_row(2), [40,5,60,7])
+            A.set_value(3,1,1)
+            self.assertEqual(V.get_value(2,1), 1)
+            A[::-1, ::-1][0, :] = 0
+            self.assertEqual(A.get_row(5), [0,0,0,0])
+            A[1:3, 1:3] = A[0:2, 0:2]    # Overlapping blocks
+            self.assertEqual(A[:3].values, [[0,1,2,3],[40,0,1,7],[1,40,5,11]])
+            A[3] = [[1,2,3,4]]
+            self.assertEqual(A.get_row(4), [1,2,3,4])
+            # Arithmetic takes views as operands
+            self.assertEqual(V.matrix_add(V).values,
+                [[80,2],[2,10],[2,6]])
+            self.assertEqual(A[:2, :2].matrix_multiply(A[2:4, 2:4]).values,
+                [[3,4],[200,440]])
+            self.assertEqual(A[:3, :3].determinant(),
+                Matrix([[0,1,2],[40,0,1],[1,40,5]]).determinant())
+            self.assertEqual((A[1:, 2] - A[1:, 3]).evaluate().values,
+                [[-6],[-6],[-1],[0]])
+            # Copies, and views that change size, have storage of their own
+            C = V.copy()
+            C.set_value(1,1,99)
+            self.assertEqual(A.get_value(2,1), 40)
+            V.delete_column(1)
+            V.set_value(1,1,-1)
+            self.assertEqual(A.get_value(2,3), 1)
+            with self.assertRaises(IndexError):
+                A[5, 0]
+            with self.assertRaises(AssertionError):
+                A[2:2]
+            with self.assertRaises(AssertionError):
+                A[1:3, 1:3] = A[0:3, 0:3]
+        # Compact views cannot widen, but the matrix itself can
+        A = Matrix([[1,2],[3,4]], compact=True)
+        with self.assertRaises(AssertionError):
+            A[0].set_value(1,1,0.5)
+        A[0] = 0.5
+        self.assertEqual(A.values, [[0.5,0.5],[3,4]])
+        return
+
+    def test_factories(self):
+        self.assertEqual(str(Matrix.zeros(2,3)), "0 0 0\n0 0 0")
+        self.assertEqual(str(Matrix.full(2,2,7)), "7 7\n7 7")
+        self.assertEqual(str(Matrix.identity(3)), "1 0 0\n0 1 0\n0 0 1")
+        self.assertTrue(Matrix.identity(3, compact=True).is_compact())
+        self.assertEqual(str(Matrix.from_flat(range(6),2,3)),
+            str(Matrix([[0,1,2],[3,4,5]])))
+        self.assertEqual(str(Matrix.from_columns([[1,4],[2,5],[3,6]])),
+            str(Matrix([[1,2,3],[4,5,6]])))
+        A = Matrix.zeros(2,2)
+        A.set_value(1,1,5)
+        self.assertEqual(A.get_value(1,1), 5)
+        self.assertEqual(A.get_value(2,1), 0)
+        with self.assertRaises(AssertionError):
+            Matrix.zeros(0,3)
+        with self.assertRaises(AssertionError):
+            Matrix.from_flat([1,2,3],2,2)
+        with self.assertRaises(AssertionError):
+            Matrix.from_flat([1,2,3,"hello world"],2,2)
+        with self.assertRaises(AssertionError):
+            Matrix.from_columns([[1,2],[3]])
+        return
+
+    def test_from_buffer(self):
+        buffer = array('d', [1,2,3,4,5,6])
+        A = Matrix.from_buffer(buffer, 2, 3)
+        self.assertTrue(A.is_compact())
+        self.assertEqual(A.get_value(2,1), 4.0)
+        # Changes show through in both directions while sharing memory
+        A.set_value(1,1,10)
+        self.assertEqual(buffer[0], 10.0)
+        buffer[5] = 60
+        self.assertEqual(A.get_value(2,3), 60.0)
+        A.scalar_multiply(2)
+        self.assertEqual(buffer[1], 4.0)
+        # Changing the size copies the matrix into memory of its own
+        A.add_row([0,0,0])
+        A.set_value(1,1,0)
+        self.assertEqual(buffer[0], 20.0)
+        B = Matrix.from_buffer(bytearray([1,2,3,4]), 2, 2)
+        self.assertEqual(str(B), "1 2\n3 4")
+        C = Matrix.from_buffer(memoryview(buffer).toreadonly(), 3, 2)
+        self.assertEqual(C.get_value(3,2), 120.0)
+        with self.assertRaises(AssertionError):
+            C.set_value(1,1,0)
+        with self.assertRaises(AssertionError):
+            Matrix.from_buffer(buffer, 4, 4)
+        return
+
+    def test_csv(self):
+        A = Matrix([[1, -2.5, 3], [4, 5, 6e-20], [7, 8, 9]])
+        self.assertEqual(list(A.iter_rows(2)),
+            [[[1, -2.5, 3], [4, 5, 6e-20]], [[7, 8, 9]]])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "a.csv")
+            A.save_csv(path, chunkSize=2)
+            with open(path) as file:
+                self.assertEqual(file.readline(), "1,-2.5,3\n")
+            B = Matrix.load_csv(path, chunkSize=2)
+            self.assertEqual(B.values, A.values)
+            self.assertIsInstance(B.get_value(1, 1), int)
+            # Booleans are written as the integers they equal, and
+            # fractions, which could not be read back, are refused
+            Matrix([[True, 2], [False, 0.5]]).save_csv(path)
+            self.assertEqual(Matrix.load_csv(path).values,
+                             [[1, 2], [0, 0.5]])
+            with self.assertRaises(AssertionError):
+                Matrix([[Fraction(1, 3)]], dtype="object").save_csv(path)
+            with open(path, "w") as file:
+                file.write("1;2\n\n3;4.0\n")
+            C = Matrix.load_csv(path, compact=True, delimiter=";")
+            self.assertEqual(C.values, [[1.0, 2.0], [3.0, 4.0]])
+            self.assertTrue(C.is_compact())
+            with open(path, "w") as file:
+                file.write("1,2\n3,four\n")
+            with self.assertRaises(AssertionError):
+                Matrix.load_csv(path)
+        with self.assertRaises(AssertionError):
+            next(A.iter_rows(0))
+        return
+
+    def test_serialization(self):
+        A = Matrix([[1, 2.5], [2**70, -3]])
+        B = Matrix([[1, 2], [3, 4]], compact=True, validation="trusted")
+        C = Matrix([[1.5, 2.0, float("inf")]])
+        for M in (A, B, C):
+            for N in [Matrix.from_bytes(M.to_bytes()), copy.deepcopy(M)] + \
+                    [pickle.loads(pickle.dumps(M, protocol=i))
+                        for i in (2, 4, 5)]:
+                self.assertEqual(N.values, M.values)
+                self.assertEqual(N.is_compact(), M.is_compact())
+                self.assertEqual([type(i) for i in N.get_row(1)],
+                    [type(i) for i in M.get_row(1)])
+        self.assertEqual(pickle.loads(pickle.dumps(B)).get_validation_policy(),
+            "trusted")
+        data = B.to_bytes()
+        self.assertEqual(len(data), matrix.BINARY_HEADER_SIZE + 4*8)
+        # Data from a machine of the other byte order is swapped back
+        swapped = array('q', data[matrix.BINARY_HEADER_SIZE:])
+        swapped.byteswap()
+        order = b">" if sys.byteorder == "little" else b"<"
+        D = Matrix.from_bytes(data[:8] + order + data[9:32] +
+            swapped.tobytes())
+        self.assertEqual(D.values, B.values)
+        with self.assertRaises(AssertionError):
+            Matrix.from_bytes(b"PYMATRIX")
+        with self.assertRaises(AssertionError):    # Unknown version
+            Matrix.from_bytes(data[:10] + b"\x00" + data[11:])
+        # Booleans written as text come back as the integers they equal
+        E = Matrix.from_bytes(Matrix([[True, 2.5], [False, 2**70]]).to_bytes())
+        self.assertEqual(E.values, [[1, 2.5], [0, 2**70]])
+        self.assertEqual(type(E.get_value(1, 1)), int)
+        # Out-of-band buffers are used in place rather than copied
+        buffers = []
+        data = pickle.dumps(B, protocol=5, buffer_callback=buffers.append)
+        self.assertEqual([i.raw().nbytes for i in buffers], [4*8])
+        shared = bytearray(buffers[0].raw())
+        E = pickle.loads(data, buffers=[shared])
+        E.set_value(1, 1, 10)
+        self.assertEqual(array('q', shared)[0], 10)
+        # Copies do not share storage
+        F = copy.deepcopy(B)
+        F.set_value(1, 1, 0)
+        self.assertEqual(B.get_value(1, 1), 1)
+        return
+
+    def test_mmap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "a.matrix")
+            Matrix([[1,2,3],[4,5,6]]).save_mmap(path)
+            self.assertEqual(os.path.getsize(path),
+                matrix.BINARY_HEADER_SIZE + 6*8)
+            A = Matrix.open_mmap(path)
+            self.assertEqual(A.values, [[1,2,3],[4,5,6]])
+            self.assertIsInstance(A.get_value(1,1), int)
+            with self.assertRaises(AssertionError):
+                A.set_value(1,1,0)
+            # Writes go to the file, unless it is opened copy-on-write
+            B = Matrix.open_mmap(path, "r+")
+            B.set_value(2,3,60)
+            B.flush()
+            C = Matrix.open_mmap(path, "c")
+            C.set_value(1,1,10)
+            self.assertEqual(Matrix.open_mmap(path).get_row(1), [1,2,3])
+            self.assertEqual(Matrix.open_mmap(path).get_row(2), [4,5,60])
+            self.assertEqual(A.matrix_add(B).values, [[2,4,6],[8,10,120]])
+            # New files start out as zeros
+            D = Matrix.open_mmap(path, "w+", 2, 2)
+            self.assertEqual(D.values, [[0.0,0.0],[0.0,0.0]])
+            D.set_value(1,2,1.5)
+            D.flush()
+            self.assertEqual(Matrix.open_mmap(path).get_value(1,2), 1.5)
+            # Values needing wider storage are refused, so that later
+            # writes still reach the file
+            E = Matrix.open_mmap(path, "w+", 2, 2, typecode="q")
+            with self.assertRaises(AssertionError):
+                E.set_value(1,1,2.5)
+            E.set_value(2,2,7)
+            E.flush()
+            self.assertEqual(Matrix.open_mmap(path).values, [[0,0],[0,7]])
+            buffer = array("q", [1,2])
+            with self.assertRaises(AssertionError):
+                Matrix.from_buffer(buffer, 1, 2).set_value(1,1,0.5)
+            del E
+            with open(path, "wb") as file:
+                file.write(b"not a matrix")
+            with self.assertRaises(AssertionError):
+                Matrix.open_mmap(path)
+            del A, B, C, D    # Unmap the file before it is deleted
+        return
+
+    def test_out_of_core(self):
+        A = Matrix([[(3*i + j) % 7 - 3 for j in range(9)] for i in range(11)])
+        B = Matrix([[(i - 2*j) % 5 + 0.5 for j in range(6)] for i in range(9)],
+            compact=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "result.matrix")
+            for useNumpy in (True, False):
+                try:
+                    matrix.USE_NUMPY = useNumpy
+                    # Budgets far smaller than the matrices, for many tiles
+                    C, report = A.tiled_multiply(B, path, memory=600)
+                    self.assertEqual(C.values, A.matrix_multiply(B).values)
+                    self.assertLess(report["tile_size"], 6)
+                    # Integer products that could overflow are doubles
+                    D = Matrix([[2**40,1],[1,2**40]])
+                    E = D.tiled_multiply(D, path)[0]
+                    self.assertEqual(E.values, [[float(j) for j in i]
+                        for i in D.matrix_multiply(D).values])
+                    del E
+                    self.assertEqual(report["bytes_written"], 8*11*6)
+                    self.assertGreater(report["bytes_read"], 8*(99 + 54))
+                    C, report = A.tiled_multiply(A.transpose(), path,
+                        memory=1000)
+                    self.assertEqual(C.values,
+                        A.matrix_multiply(A.transpose()).values)
+                    self.assertEqual(Matrix.open_mmap(path).get_row(1),
+                        C.get_row(1))
+                    C, report = A.tiled_transpose(path, memory=500)
+                    self.assertEqual(C.values, A.transpose().values)
+                    self.assertEqual(report["bytes_read"], 8*99)
+                finally:
+                    matrix.USE_NUMPY = True
+            with self.assertRaises(AssertionError):
+                A.tiled_multiply(A, path)
+            with self.assertRaises(AssertionError):
+                A.tiled_transpose(path, memory=1)
+            del C    # Unmap the file before it is deleted
+        return
+
+    def test_dtypes(self):
+        A = Matrix([[1,2],[3,4]], dtype="int64")
+        B = Matrix([[0.5,2],[3,4]], dtype="float32")
+        C = Matrix([[Fraction(1,3),2],[3,4]], dtype="object")
+        self.assertEqual([A.get_dtype(), B.get_dtype(), C.get_dtype()],
+                         ["int64", "float32", "object"])
+        self.assertEqual(Matrix([[1,2]]).get_dtype(), None)
+        for useNumpy in (False, True):
+            matrix.USE_NUMPY = useNumpy
+            try:
+                # Promotion: same dtype, object over anything, else float64
+                self.assertEqual(A.matrix_add(A).get_dtype(), "int64")
+                self.assertEqual(B.matrix_multiply(B).get_dtype(), "float32")
+                self.assertEqual(A.matrix_add(B).get_dtype(), "float64")
+                self.assertEqual(A.matrix_multiply(C).get_dtype(), "object")
+                self.assertEqual(A.matrix_add(Matrix([[1,2],[3,4]]))
+                                 .get_dtype(), None)
+                self.assertEqual(B.transpose().get_dtype(), "float32")
+                self.assertEqual(B.matrix_add(B).values,
+                                 [[1.0,4.0],[6.0,8.0]])
+                # Object matrices stay exact
+                self.assertEqual(C.matrix_add(C).get_value(1,1),
+                                 Fraction(2,3))
+                self.assertEqual(C.determinant(), Fraction(-14,3))
+            finally:
+                matrix.USE_NUMPY = True
+        # Values that do not fit are refused rather than widening storage
+        with self.assertRaises(AssertionError):
+            A.set_value(1,1,0.5)
+        with self.assertRaises(AssertionError):
+            A.add_row([1.5,2])
+        with self.assertRaises(AssertionError):
+            Matrix([[1.5]], dtype="int64")
+        with self.assertRaises(AssertionError):
+            Matrix([[1]], dtype="int8")
+        self.assertEqual(A.values, [[1,2],[3,4]])
+        B.set_value(1,1,0.1)    # Rounded to the nearest 4 byte float
+        self.assertEqual(B.get_value(1,1), array("f", [0.1])[0])
+        # Float32 takes half the memory of float64
+        F = Matrix.zeros(100, 100, dtype="float32")
+        D = Matrix.zeros(100, 100, dtype="float64")
+        self.assertLess(sys.getsizeof(F._Matrix__data),
+                        0.55*sys.getsizeof(D._Matrix__data))
+        self.assertEqual(F.astype("float64").get_dtype(), "float64")
+        self.assertEqual(Matrix.identity(2, dtype="object").astype("int64")
+                         .values, [[1,0],[0,1]])
+        # Copies, views, pickles and bytes keep the dtype
+        for M in (A, B, C):
+            self.assertEqual(M.copy().get_dtype(), M.get_dtype())
+            self.assertEqual(M[1,:].get_dtype(), M.get_dtype())
+            self.assertEqual(pickle.loads(pickle.dumps(M)).get_dtype(),
+                             M.get_dtype())
+        for M in (A, B, C):
+            N = Matrix.from_bytes(M.to_bytes())
+            self.assertEqual((N.get_dtype(), N.values),
+                             (M.get_dtype(), M.values))
+        # Object matrices are solved exactly, but cannot be saved as machine
+        # numbers
+        self.assertEqual(C.solve([1,0]), [Fraction(-6,7),Fraction(9,14)])
+        self.assertEqual(C.inverse().values,
+                         [[Fraction(-6,7),Fraction(3,7)],
+                          [Fraction(9,14),Fraction(-1,14)]])
+        self.assertEqual(C.inverse().get_dtype(), "object")
+        self.assertEqual(C.lu().determinant(), Fraction(-14,3))
+        L, U, permutation = C.lu().get_factors()
+        self.assertEqual(permutation, [2,1])
+        self.assertEqual(L.matrix_multiply(U).values,
+                         [[3,4],[Fraction(1,3),2]])
+        G = Matrix([[10**400,1],[1,1]], dtype="object")
+        self.assertEqual(G.solve([1,1]), [0,1])
+        with self.assertRaises(AssertionError):
+            C.save_mmap(os.devnull)
+        with self.assertRaises(AssertionError):
+            Matrix([[Decimal("0.5")]], dtype="object").to_bytes()
+        # Every way of making a result keeps the promoted dtype
+        F = Matrix([[1.5,2],[3,5]], dtype="float32")
+        for useNumpy in (False, True):
+            matrix.USE_NUMPY = useNumpy
+            try:
+                self.assertEqual((F @ F + F).evaluate().get_dtype(),
+                                 "float32")
+                self.assertEqual((F*2).evaluate().get_dtype(), "float32")
+                self.assertEqual((A*0.5).evaluate().get_dtype(), "float64")
+                self.assertEqual((A*0.5).evaluate().values,
+                                 [[0.5,1.0],[1.5,2.0]])
+                self.assertEqual(Matrix.linear_combination([1,2], [A,F])
+                                 .get_dtype(), "float64")
+                self.assertEqual(F.inverse().get_dtype(), "float32")
+                self.assertEqual(A.inverse().get_dtype(), "float64")
+            finally:
+                matrix.USE_NUMPY = True
+        batch = MatrixBatch([F, F])
+        self.assertEqual([M.get_dtype() for M in batch.to_matrices()],
+                         ["float32", "float32"])
+        self.assertEqual(batch.transpose().get_matrix(1).get_dtype(),
+                         "float32")
+        self.assertEqual(batch.matrix_add(A).get_matrix(1).get_dtype(),
+                         "float64")
+        self.assertEqual(Matrix.from_columns([[1,3],[2,4]], dtype="int64")
+                         .get_dtype(), "int64")
+        # Complex numbers, float32 overflow and NaN integers are refused
+        with self.assertRaises(AssertionError):
+            Matrix([[1j]], dtype="object")
+        with self.assertRaises(AssertionError):
+            F.set_value(1,1,1e300)
+        with self.assertRaises(AssertionError):
+            Matrix([[1e300]], dtype="float32")
+        with self.assertRaises(AssertionError):
+            Matrix([[math.nan]]).astype("int64")
+        self.assertEqual(F.get_value(1,1), 1.5)
+        return
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_interop(self):
+        A = Matrix([[1.5,2],[3,4]], compact=True)
+        B = Matrix([[1,2],[3,4]])
+        arr = numpy.asarray(A)
+        self.assertEqual(arr.dtype, numpy.float64)
+        self.assertEqual(arr.tolist(), [[1.5,2.0],[3.0,4.0]])
+        arr[0,0] = 10
+        self.assertEqual(A.get_value(1,1), 10.0)
+        self.assertEqual(numpy.asarray(B).tolist(), [[1,2],[3,4]])
+        with self.assertRaises(ValueError):
+            numpy.asarray(B, copy=False)
+        C = Matrix.from_numpy(arr)
+        C.set_value(2,2,0)
+        self.assertEqual(arr[1,1], 0.0)
+        D = Matrix.from_numpy(arr, copy=True)
+        D.set_value(2,1,0)
+        self.assertEqual(arr[1,0], 3.0)
+        E = Matrix.from_numpy(numpy.arange(6).reshape(2,3).T)
+        self.assertEqual(str(E), "0 3\n1 4\n2 5")
+        # Results are no longer cached once NumPy can change the storage
+        X = Matrix([[1,2],[3,4]], compact=True)
+        self.assertEqual(X.determinant(), -2)
+        numpy.asarray(X)[0,0] = 10
+        self.assertEqual(X.determinant(), 34)
+        self.assertEqual(X.cache_info()["entries"], [])
+        F = Matrix.from_numpy(numpy.array([[2**64-1,1]], dtype=numpy.uint64))
+        self.assertEqual(F.get_row(1), [2**64-1,1])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
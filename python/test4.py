@@ -0,0 +1,104 @@
+# This is a script to test the SparseMatrix() object defined in matrix.py,
+# comparing it against the dense Matrix() object, including operations which
+# mix sparse and dense matrices
+
+import random
+import unittest
+import matrix
+from matrix import Matrix, SparseMatrix
+
+
+def random_rows(rng, m, n, density):
+    return [[rng.randint(1, 9) if rng.random() < density else 0
+        for j in range(n)] for i in range(m)]
+
+
+class TestSparseMatrix(unittest.TestCase):
+    def test_basic(self):
+        A = SparseMatrix([[0,0,3],[4,0,0]])
+        B = SparseMatrix.from_coo(3, 3, [(1,1,2), (3,3,1), (1,1,1)])
+        self.assertEqual(str(A), "0 0 3\n4 0 0")
+        self.assertEqual(A.get_size(), (2,3))
+        self.assertEqual(A.count_nonzero(), 2)
+        self.assertEqual(B.get_value(1,1), 3)
+        self.assertEqual(B.get_value(2,2), 0)
+        self.assertAlmostEqual(B.density(), 2/9)
+        B.set_value(2,2,5)
+        B.set_value(1,1,0)
+        self.assertEqual(B.get_value(2,2), 5)
+        self.assertEqual(B.count_nonzero(), 2)
+        self.assertEqual(str(B.to_dense()), "0 0 0\n0 5 0\n0 0 1")
+        self.assertEqual(str(SparseMatrix.from_dense(B.to_dense())), str(B))
+        with self.assertRaises(AssertionError):
+            B.get_value(4,1)
+        with self.assertRaises(AssertionError):
+            B.set_value(1,1,"hello world")
+        with self.assertRaises(AssertionError):
+            SparseMatrix.from_coo(2, 2, [(3,1,1)])
+
+        # Elements which are not stored are zeros of the elements' type
+        C = SparseMatrix([[0.0,1.5]])
+        self.assertEqual(str(C), str(Matrix([[0.0,1.5]])))
+        self.assertIsInstance(C.get_value(1,1), float)
+        self.assertIsInstance(C.transpose().get_value(1,1), float)
+        self.assertIsInstance(C.to_dense().get_value(1,1), float)
+        D = SparseMatrix.from_coo(2, 2, [(1,1,2.5)])
+        self.assertIsInstance(D.matrix_multiply(D).get_value(2,2), float)
+        self.assertIsInstance(A.get_value(1,1), int)
+        return
+
+    def test_edits(self):
+        A = SparseMatrix([[1,0,2],[0,0,0],[0,3,0]])
+        A.add_row([0,0,4])
+        A.add_column([5,0,0,0])
+        A.delete_column(2)
+        A.delete_row(2)
+        self.assertEqual(str(A), "1 2 5\n0 0 0\n0 4 0")
+        A.scalar_multiply(2)
+        self.assertEqual(str(A), " 2  4 10\n 0  0  0\n 0  8  0")
+        A.scalar_multiply(0)
+        self.assertEqual(A.count_nonzero(), 0)
+        with self.assertRaises(AssertionError):
+            A.add_row([1,2])
+        return
+
+    def test_operations(self):
+        rng = random.Random(0)
+        for trial in range(20):
+            m, n, p = rng.randint(1, 8), rng.randint(1, 8), rng.randint(1, 8)
+            a = random_rows(rng, m, n, rng.random()/2)
+            b = random_rows(rng, n, p, rng.random()/2)
+            c = random_rows(rng, m, n, rng.random()/2)
+            A, B, C = Matrix(a), Matrix(b), Matrix(c)
+            product = str(A.matrix_multiply(B))
+            total = str(A.matrix_add(C))
+            sA, sB, sC = SparseMatrix(a), SparseMatrix(b), SparseMatrix(c)
+            self.assertEqual(str(sA.matrix_multiply(sB)), product)
+            self.assertEqual(str(sA.matrix_multiply(B)), product)
+            self.assertEqual(str(A.matrix_multiply(sB)), product)
+            self.assertEqual(str(sA.matrix_add(sC)), total)
+            self.assertEqual(str(sA.matrix_add(C)), total)
+            self.assertEqual(str(A.matrix_add(sC)), total)
+            self.assertEqual(str(sA.transpose()), str(A.transpose()))
+        return
+
+    def test_density(self):
+        identity = SparseMatrix.from_coo(10, 10,
+            [(i, i, 1) for i in range(1, 11)])
+        dense = Matrix.full(10, 10, 1)
+        self.assertIsInstance(identity.matrix_multiply(identity),
+            SparseMatrix)
+        self.assertIsInstance(identity.matrix_add(dense), Matrix)
+        self.assertIsInstance(identity.matrix_multiply(Matrix.identity(10)),
+            SparseMatrix)
+        threshold = matrix.SPARSE_THRESHOLD
+        try:
+            matrix.SPARSE_THRESHOLD = 0.05
+            self.assertIsInstance(identity.matrix_add(identity), Matrix)
+        finally:
+            matrix.SPARSE_THRESHOLD = threshold
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()